@@ -3,14 +3,26 @@ from tkinter import ttk, messagebox, filedialog
 import json
 import os
 import csv
-import math
 import numpy as np
 from datetime import datetime
-from PIL import Image, ImageTk
+from PIL import ImageTk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.patches import Wedge
 from fpdf import FPDF
+from referencia_poblacion import cargar_referencia
+from graficos_salud import dibujar_grafico_barras, dibujar_grafico_medidor, dibujar_grafico_radar
+from cache_miniaturas import INTERVALO_SONDEO_MS, CacheMiniaturas, CargaProgresiva
+from exportacion_columnar import exportar_historial, importar_historial
+import sincronizacion_historial as sincronizacion
+from salud import VERSION_FORMULA, calcular_metricas, clasificar_imc, generar_texto_recomendacion
+from metricas_versionadas import MetricasHistorial, solo_datos
+
+# Color con que se muestra cada clasificacion del IMC
+COLORES_IMC = {"Bajo peso": "blue", "Peso normal": "green", "Sobrepeso": "orange", "Obesidad": "red"}
+
+# Tamaño del avatar de perfil y cantidad de fotos recientes recordadas
+TAMANO_AVATAR = (200, 200)
+MAX_RECIENTES = 10
 
 class CalculadoraSaludApp:
     def __init__(self, raiz):
@@ -19,6 +31,10 @@ class CalculadoraSaludApp:
         self.raiz.geometry("1100x750")
         
         self.cargar_configuracion()
+        self.cache_miniaturas = CacheMiniaturas()
+        self.carga_perfil = None
+        # Las miniaturas de las fotos recientes se generan en segundo plano para abrirlas al instante
+        self.cache_miniaturas.precalentar(self.configuracion["archivos_recientes"], TAMANO_AVATAR, "resize")
         
         # Variables de datos del usuario
         self.peso = tk.DoubleVar(value=70.0)
@@ -27,8 +43,10 @@ class CalculadoraSaludApp:
         self.genero = tk.StringVar(value="Masculino")
         self.nivel_actividad = tk.StringVar(value="Moderado")
         
-        # Historial de mediciones
+        # Historial de mediciones (sólo datos medidos; imc, bmr y calorias salen de la cache de métricas)
         self.historial = []
+        self.metricas = MetricasHistorial()
+        self.sincronizador = None
         self.cargar_historial()
         
         # Configurar estilo
@@ -55,7 +73,9 @@ class CalculadoraSaludApp:
             "tamano_fuente": 12,
             "fuente": "Segoe UI",
             "velocidad_animacion": 0.5,
-            "archivos_recientes": []
+            "archivos_recientes": [],
+            "directorio_sincronizacion": "",
+            "estacion": sincronizacion.estacion_por_defecto()
         }
         try:
             if os.path.exists("health_calc_config.json"):
@@ -153,6 +173,8 @@ class CalculadoraSaludApp:
         
         self.marco_resultados = ttk.Frame(self.pestana_datos_basicos)
         self.marco_resultados.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        self.titulo_resultados = None
+        self.etiquetas_resultados = []
         marco_entrada.columnconfigure(1, weight=1)
     
     def crear_pestana_analisis(self):
@@ -202,6 +224,9 @@ class CalculadoraSaludApp:
         ttk.Button(marco_export, text="Exportar a CSV", command=self.exportar_csv).pack(side=tk.LEFT, padx=5)
         ttk.Button(marco_export, text="Exportar a JSON", command=self.exportar_json).pack(side=tk.LEFT, padx=5)
         ttk.Button(marco_export, text="Exportar a PDF", command=self.exportar_pdf).pack(side=tk.LEFT, padx=5)
+        ttk.Button(marco_export, text="Exportar a Parquet/Arrow", command=self.exportar_columnar).pack(side=tk.LEFT, padx=5)
+        ttk.Button(marco_export, text="Importar Historial", command=self.importar_columnar).pack(side=tk.LEFT, padx=5)
+        ttk.Button(marco_export, text="Sincronizar", command=self.sincronizar_historial).pack(side=tk.LEFT, padx=5)
         ttk.Button(marco_export, text="Borrar Historial", command=self.borrar_historial).pack(side=tk.LEFT, padx=5)
         self.actualizar_arbol_historial()
     def crear_pestana_configuracion(self):
@@ -228,6 +253,18 @@ class CalculadoraSaludApp:
         self.var_velocidad = tk.DoubleVar(value=self.configuracion["velocidad_animacion"])
         ttk.Scale(marco_anim, from_=0.1, to=2.0, variable=self.var_velocidad,
                   command=lambda v: self.actualizar_velocidad(float(v))).pack(fill=tk.X)
+        # Sincronizacion entre estaciones
+        marco_sync = ttk.LabelFrame(self.pestana_configuracion, text="Sincronizacion")
+        marco_sync.pack(fill=tk.X, padx=20, pady=10)
+        ttk.Label(marco_sync, text="Directorio compartido:").pack(anchor=tk.W)
+        self.var_directorio_sync = tk.StringVar(value=self.configuracion["directorio_sincronizacion"])
+        marco_directorio = ttk.Frame(marco_sync)
+        marco_directorio.pack(fill=tk.X)
+        ttk.Entry(marco_directorio, textvariable=self.var_directorio_sync).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Button(marco_directorio, text="Elegir...", command=self.elegir_directorio_sync).pack(side=tk.LEFT, padx=5)
+        ttk.Label(marco_sync, text="Nombre de esta estacion:").pack(anchor=tk.W)
+        self.var_estacion = tk.StringVar(value=self.configuracion["estacion"])
+        ttk.Entry(marco_sync, textvariable=self.var_estacion).pack(fill=tk.X)
         # Boton para guardar configuraciones
         ttk.Button(self.pestana_configuracion, text="Guardar Configuraciones", command=self.guardar_configuraciones).pack(pady=20)
     def crear_pestana_perfil(self):
@@ -267,14 +304,46 @@ class CalculadoraSaludApp:
         """Permite al usuario cargar una foto de perfil."""
         ruta_imagen = filedialog.askopenfilename(filetypes=[("Imagenes", "*.jpg *.jpeg *.png *.bmp")])
         if ruta_imagen:
-            try:
-                imagen = Image.open(ruta_imagen)
-                imagen = imagen.resize((200, 200))
-                self.imagen_perfil = ImageTk.PhotoImage(imagen)
-                self.label_imagen_perfil.config(image=self.imagen_perfil, text="")
-                self.imagen_original = imagen.copy()
-            except Exception as e:
-                messagebox.showerror("Error", f"Error al cargar la imagen: {e}")
+            self.abrir_foto_perfil(ruta_imagen)
+    
+    def abrir_foto_perfil(self, ruta_imagen):
+        """Muestra la foto de perfil usando la cache de miniaturas y la agrega a recientes."""
+        try:
+            if self.carga_perfil is not None:
+                self.carga_perfil.cancelar()
+            self.carga_perfil = CargaProgresiva(self.raiz, ruta_imagen, TAMANO_AVATAR, self.mostrar_foto_perfil,
+                                                modo="resize", cache=self.cache_miniaturas)
+            self.agregar_reciente(ruta_imagen)
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al cargar la imagen: {e}")
+    
+    def mostrar_foto_perfil(self, imagen, final):
+        """Coloca la vista previa o la versión final del avatar en la pestaña de perfil."""
+        if getattr(self, "imagen_perfil", None) is not None and (self.imagen_perfil.width(), self.imagen_perfil.height()) == imagen.size:
+            self.imagen_perfil.paste(imagen)
+        else:
+            self.imagen_perfil = ImageTk.PhotoImage(imagen)
+            self.label_imagen_perfil.config(image=self.imagen_perfil, text="")
+        self.imagen_original = imagen.copy()
+    
+    def agregar_reciente(self, ruta_imagen):
+        """Agregar una foto al principio de la lista de archivos recientes."""
+        recientes = [r for r in self.configuracion["archivos_recientes"] if r != ruta_imagen]
+        self.configuracion["archivos_recientes"] = [ruta_imagen] + recientes[:MAX_RECIENTES - 1]
+        self.guardar_configuracion()
+        self.actualizar_menu_recientes()
+    
+    def actualizar_menu_recientes(self):
+        """Reconstruir el submenú de fotos recientes."""
+        if not hasattr(self, "menu_recientes"):
+            return
+        self.menu_recientes.delete(0, tk.END)
+        recientes = [r for r in self.configuracion["archivos_recientes"] if os.path.exists(r)]
+        if not recientes:
+            self.menu_recientes.add_command(label="(vacío)", state=tk.DISABLED)
+        for ruta in recientes:
+            self.menu_recientes.add_command(label=os.path.basename(ruta),
+                                            command=lambda r=ruta: self.abrir_foto_perfil(r))
     
     def detectar_postura(self):
         """Simular detección de postura y estimación de proporciones."""
@@ -338,52 +407,13 @@ class CalculadoraSaludApp:
             self.text_recomendaciones.insert(tk.END, "Ingrese sus datos personales primero.")
             return
         
-        ultimo = self.historial[-1]
-        imc = ultimo.get("imc", 0)
+        ultimo = self.metricas.ultima(self.historial)
+        imc = ultimo.get("imc") or 0
         edad = ultimo.get("edad", 0)
         genero = ultimo.get("genero", "")
         actividad = ultimo.get("actividad", "")
         
-        recomendacion = ""
-        if imc < 18.5:
-            recomendacion = (
-                f"Su IMC de {imc:.2f} indica bajo peso.\n"
-                "Recomendaciones:\n"
-                "- Consuma alimentos ricos en nutrientes y calorías.\n"
-                "- Realice ejercicios de fuerza para ganar masa muscular.\n"
-                "- Consulte a un nutricionista para un plan personalizado.\n"
-            )
-        elif imc < 25:
-            recomendacion = (
-                f"Su IMC de {imc:.2f} se encuentra en un rango saludable.\n"
-                "Recomendaciones:\n"
-                "- Mantenga una dieta balanceada.\n"
-                "- Continúe con su nivel de actividad física actual.\n"
-                "- Realice chequeos médicos periódicos.\n"
-            )
-        elif imc < 30:
-            recomendacion = (
-                f"Su IMC de {imc:.2f} indica sobrepeso.\n"
-                "Recomendaciones:\n"
-                "- Reduzca el consumo de alimentos procesados y azúcares.\n"
-                "- Aumente su actividad física gradualmente.\n"
-                "- Consuma más frutas, verduras y proteínas magras.\n"
-            )
-        else:
-            recomendacion = (
-                f"Su IMC de {imc:.2f} indica obesidad.\n"
-                "Recomendaciones:\n"
-                "- Es importante consultar a un médico para evaluación.\n"
-                "- Considere un plan de alimentación supervisado.\n"
-                "- Incorpore ejercicio regular adaptado a sus capacidades.\n"
-            )
-        if edad > 50:
-            recomendacion += "\nPara su edad:\n- Realice ejercicios de bajo impacto.\n- Asegure suficiente ingesta de calcio y vitamina D.\n"
-        if genero == "Femenino" and edad > 40:
-            recomendacion += "\nAdicionalmente:\n- Considere exámenes de densidad ósea periódicos.\n"
-        if actividad == "Sedentario":
-            recomendacion += "\nDebido a su bajo nivel de actividad:\n- Comience con caminatas diarias de 15-30 minutos.\n"
-        
+        recomendacion = generar_texto_recomendacion(imc, edad, genero, actividad)
         self.text_recomendaciones.delete("1.0", tk.END)
         self.text_recomendaciones.insert(tk.END, recomendacion)
     
@@ -395,60 +425,51 @@ class CalculadoraSaludApp:
             edad_val = self.edad.get()
             genero_val = self.genero.get()
             actividad_val = self.nivel_actividad.get()
-            imc = peso_val / (altura_val ** 2)
-            if genero_val == "Masculino":
-                bmr = 88.362 + (13.397 * peso_val) + (4.799 * altura_val * 100) - (5.677 * edad_val)
-            else:
-                bmr = 447.593 + (9.247 * peso_val) + (3.098 * altura_val * 100) - (4.330 * edad_val)
-            factores_actividad = {
-                "Sedentario": 1.2,
-                "Ligero": 1.375,
-                "Moderado": 1.55,
-                "Intenso": 1.725,
-                "Muy intenso": 1.9
-            }
-            calorias = bmr * factores_actividad.get(actividad_val, 1.2)
+            imc, bmr, calorias = calcular_metricas(peso_val, altura_val, edad_val, genero_val, actividad_val)
             self.mostrar_resultados(imc, bmr, calorias)
             self.actualizar_grafico()
-            self.agregar_al_historial(imc, bmr, calorias)
+            self.agregar_al_historial()
         except Exception as e:
             messagebox.showerror("Error", f"Error en los cálculos: {str(e)}")
     
     def mostrar_resultados(self, imc, bmr, calorias):
         """Mostrar resultados en el marco de resultados."""
-        for widget in self.marco_resultados.winfo_children():
-            widget.destroy()
-        if imc < 18.5:
-            clasificacion_imc = "Bajo peso"
-            color = "blue"
-        elif 18.5 <= imc < 25:
-            clasificacion_imc = "Peso normal"
-            color = "green"
-        elif 25 <= imc < 30:
-            clasificacion_imc = "Sobrepeso"
-            color = "orange"
-        else:
-            clasificacion_imc = "Obesidad"
-            color = "red"
-        ttk.Label(self.marco_resultados, text="Resultados de Salud", 
-                  font=(self.configuracion["fuente"], self.configuracion["tamano_fuente"] + 2, "bold")
-                  ).pack(anchor=tk.W, pady=5)
+        clasificacion_imc = clasificar_imc(imc)
+        color = COLORES_IMC[clasificacion_imc]
+        # Las etiquetas se crean la primera vez y despues solo se actualiza su texto
+        if self.titulo_resultados is None:
+            self.titulo_resultados = ttk.Label(self.marco_resultados, text="Resultados de Salud")
+            self.titulo_resultados.pack(anchor=tk.W, pady=5)
+        self.titulo_resultados.config(font=(self.configuracion["fuente"], self.configuracion["tamano_fuente"] + 2, "bold"))
         resultados = [
             f"IMC: {imc:.1f} ({clasificacion_imc})",
             f"Metabolismo basal: {bmr:.0f} kcal/dia",
             f"Gasto calórico diario: {calorias:.0f} kcal/dia"
         ]
-        for res in resultados:
-            etiqueta = ttk.Label(self.marco_resultados, text=res)
-            if "IMC" in res:
-                etiqueta.config(foreground=color)
-            etiqueta.pack(anchor=tk.W, pady=5)
+        referencia = cargar_referencia()
+        if referencia is not None:
+            edad, genero = self.edad.get(), self.genero.get()
+            for nombre, metrica, valor in (("IMC", "imc", imc), ("Metabolismo basal", "bmr", bmr), ("Gasto calórico", "calorias", calorias)):
+                if referencia.tabla(metrica) is not None:
+                    percentil = referencia.percentil(metrica, valor, edad, genero)
+                    resultados.append(f"{nombre}: percentil {percentil:.0f} de la población de referencia")
+        while len(self.etiquetas_resultados) < len(resultados):
+            self.etiquetas_resultados.append(ttk.Label(self.marco_resultados))
+        for i, etiqueta in enumerate(self.etiquetas_resultados):
+            if i < len(resultados):
+                # Sólo la primera línea (el IMC y su clasificación) lleva el color de la categoría
+                etiqueta.config(text=resultados[i], foreground=color if i == 0 else "")
+                etiqueta.pack(anchor=tk.W, pady=5)
+            else:
+                etiqueta.pack_forget()
     
     def actualizar_grafico(self):
         """Actualizar el gráfico según el tipo seleccionado."""
         if not self.historial:
             return
-        ultima_entrada = self.historial[-1]
+        ultima_entrada = self.metricas.ultima(self.historial)
+        if ultima_entrada["imc"] is None:
+            return
         tipo = self.tipo_grafico.get()
         self.figura.clear()
         if tipo == "barras":
@@ -461,143 +482,61 @@ class CalculadoraSaludApp:
     
     def crear_grafico_barras(self, datos):
         """Crear gráfico de barras comparativo."""
-        ax = self.figura.add_subplot(111)
-        categorias = ['IMC', 'Metabolismo', 'Calorias']
-        imc_val = datos.get('imc', 0)
-        bmr_val = datos.get('bmr', 0)
-        calorias_val = datos.get('calorias', 0)
-        valores_usuario = [imc_val, bmr_val, calorias_val]
-        rangos_saludables = {
-            'IMC': (18.5, 24.9),
-            'Metabolismo': (1500, 2500),
-            'Calorias': (1800, 3000)
-        }
-        x = np.arange(len(categorias))
-        ancho = 0.35
-        barras = ax.bar(x, valores_usuario, ancho, color='skyblue', label='Tus valores')
-        for i, categoria in enumerate(categorias):
-            bajo, alto = rangos_saludables[categoria]
-            ax.plot([i - ancho/2, i + ancho/2], [bajo, bajo], 'r--', linewidth=1)
-            ax.plot([i - ancho/2, i + ancho/2], [alto, alto], 'r--', linewidth=1)
-            ax.fill_between([i - ancho/2, i + ancho/2], bajo, alto, color='red', alpha=0.1)
-        ax.set_xticks(x)
-        ax.set_xticklabels(categorias)
-        ax.set_title('Comparación con Rangos Saludables')
-        ax.legend([barras, ax.lines[0]], ['Tus valores', 'Rango saludable'])
-        ax.grid(True, linestyle='--', alpha=0.6)
+        dibujar_grafico_barras(self.figura, datos)
     
     def crear_grafico_radar(self, datos):
         """Crear gráfico radar de métricas de salud."""
-        ax = self.figura.add_subplot(111, polar=True)
-        categorias = ['IMC', 'Metabolismo', 'Calorias', 'Edad', 'Peso']
-        imc_val = datos.get('imc', 0)
-        bmr_val = datos.get('bmr', 0)
-        calorias_val = datos.get('calorias', 0)
-        edad_val = datos.get('edad', 0)
-        peso_val = datos.get('peso', 0)
-        valores = [
-            min(imc_val / 40 * 100, 100),
-            min(bmr_val / 3000 * 100, 100),
-            min(calorias_val / 4000 * 100, 100),
-            min(edad_val / 100 * 100, 100),
-            min(peso_val / 150 * 100, 100)
-        ]
-        valores += valores[:1]
-        angulos = np.linspace(0, 2 * np.pi, len(categorias), endpoint=False).tolist()
-        angulos += angulos[:1]
-        ax.plot(angulos, valores, 'o-', linewidth=2, label='Tus valores')
-        ax.fill(angulos, valores, alpha=0.25)
-        ax.plot(angulos, [50] * len(angulos), 'k--', alpha=0.5, label='Promedio')
-        ax.set_thetagrids(np.degrees(angulos[:-1]), categorias)
-        ax.set_yticklabels([])
-        ax.set_title('Análisis Radial de Salud', pad=20)
-        ax.legend(loc='upper right')
-        ax.grid(True)
+        dibujar_grafico_radar(self.figura, datos)
     
     def crear_grafico_medidor(self, datos):
         """Crear medidor semicircular para IMC."""
-        ax = self.figura.add_subplot(111)
-        ax.set_xlim(-1.5, 1.5)
-        ax.set_ylim(-0.1, 1.1)
-        ax.axis('off')
-        imc = datos.get('imc', 0)
-        min_val, max_val = 15, 40
-        zonas = [
-            (15, 18.5, "Bajo peso", "lightblue"),
-            (18.5, 25, "Normal", "lightgreen"),
-            (25, 30, "Sobrepeso", "orange"),
-            (30, 40, "Obesidad", "red")
-        ]
-        for inicio, fin, etiqueta_texto, color in zonas:
-            angulo_inicio = 180 * (inicio - min_val) / (max_val - min_val)
-            angulo_fin = 180 * (fin - min_val) / (max_val - min_val)
-            sector = Wedge((0, 0), 1, angulo_inicio, angulo_fin, width=0.3, color=color, alpha=0.5)
-            ax.add_patch(sector)
-            angulo_medio = (angulo_inicio + angulo_fin) / 2
-            rad = 0.7
-            x = rad * math.cos(math.radians(angulo_medio))
-            y = rad * math.sin(math.radians(angulo_medio))
-            ax.text(x, y, etiqueta_texto, ha='center', va='center', rotation=angulo_medio-90, fontsize=8)
-        for valor in np.linspace(min_val, max_val, 6):
-            angulo = 180 * (valor - min_val) / (max_val - min_val)
-            x_in = 0.7 * math.cos(math.radians(angulo))
-            y_in = 0.7 * math.sin(math.radians(angulo))
-            x_out = 0.8 * math.cos(math.radians(angulo))
-            y_out = 0.8 * math.sin(math.radians(angulo))
-            ax.plot([x_in, x_out], [y_in, y_out], 'k-')
-            ax.text(x_out * 1.1, y_out * 1.1, f"{valor:.0f}", ha='center', va='center', fontsize=8)
-        angulo_aguja = 180 * (imc - min_val) / (max_val - min_val)
-        x_aguja = 0.9 * math.cos(math.radians(angulo_aguja))
-        y_aguja = 0.9 * math.sin(math.radians(angulo_aguja))
-        ax.plot([0, x_aguja], [0, y_aguja], 'r-', linewidth=2)
-        ax.plot(x_aguja, y_aguja, 'ro', markersize=8)
-        ax.text(0, -0.1, f"IMC: {imc:.1f}", ha='center', va='center', fontsize=12, weight='bold')
-        if imc < 18.5:
-            estado = "Bajo peso"
-        elif imc < 25:
-            estado = "Normal"
-        elif imc < 30:
-            estado = "Sobrepeso"
-        else:
-            estado = "Obesidad"
-        ax.text(0, -0.2, f"Clasificación: {estado}", ha='center', va='center', fontsize=10)
+        dibujar_grafico_medidor(self.figura, datos)
     
-    def agregar_al_historial(self, imc, bmr, calorias):
-        """Agregar una nueva entrada al historial."""
-        entrada = {
+    def agregar_al_historial(self):
+        """Agregar una nueva entrada al historial (datos medidos y versión de la fórmula)."""
+        entrada = sincronizacion.nueva_entrada({
             "fecha": datetime.now().strftime("%Y-%m-%d %H:%M"),
             "peso": self.peso.get(),
             "altura": self.altura.get(),
             "edad": self.edad.get(),
             "genero": self.genero.get(),
             "actividad": self.nivel_actividad.get(),
-            "imc": imc,
-            "bmr": bmr,
-            "calorias": calorias
-        }
+            "version_formula": VERSION_FORMULA
+        }, self.configuracion["estacion"])
         self.historial.append(entrada)
         self.guardar_historial()
+        self.anotar_para_sincronizar([entrada])
         self.actualizar_arbol_historial()
     
     def actualizar_arbol_historial(self):
         """Actualizar el Treeview con los datos del historial."""
         for item in self.arbol_historial.get_children():
             self.arbol_historial.delete(item)
-        for i, entrada in enumerate(self.historial):
+        for i, entrada in enumerate(self.metricas.con_metricas(self.historial)):
             fecha = entrada.get("fecha", "Sin Fecha")
             peso = entrada.get("peso", 0)
             altura = entrada.get("altura", 0)
-            imc = entrada.get("imc", 0)
-            bmr = entrada.get("bmr", 0)
-            calorias = entrada.get("calorias", 0)
+            imc = entrada["imc"]
+            bmr = entrada["bmr"]
+            calorias = entrada["calorias"]
+            # Sin métricas todavía: la versión actual de la fórmula se está calculando
             self.arbol_historial.insert("", "end", text=str(i + 1), values=(
                 fecha,
                 peso,
                 altura,
-                f"{imc:.2f}",
-                f"{bmr:.0f}",
-                f"{calorias:.0f}"
+                f"{imc:.2f}" if imc is not None else "...",
+                f"{bmr:.0f}" if bmr is not None else "...",
+                f"{calorias:.0f}" if calorias is not None else "..."
             ))
+        if self.metricas.recalculando():
+            self.raiz.after(INTERVALO_SONDEO_MS, self.revisar_metricas)
+    
+    def revisar_metricas(self):
+        """Refrescar la vista cuando termina el recálculo en segundo plano de las métricas."""
+        if self.metricas.recalculando():
+            self.raiz.after(INTERVALO_SONDEO_MS, self.revisar_metricas)
+        else:
+            self.actualizar_arbol_historial()
     
     def cargar_historial(self):
         """Cargar historial desde archivo."""
@@ -605,14 +544,22 @@ class CalculadoraSaludApp:
             if os.path.exists("health_history.json"):
                 with open("health_history.json", "r") as f:
                     self.historial = json.load(f)
+            # Las mediciones anteriores a la sincronizacion reciben id, timestamp y estacion
+            # Las métricas guardadas por versiones anteriores se descartan: se derivan de los datos
+            for entrada in self.historial:
+                sincronizacion.completar_entrada(entrada, self.configuracion["estacion"])
+                solo_datos(entrada)
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo cargar el historial: {str(e)}")
     
-    def guardar_historial(self):
-        """Guardar historial en archivo."""
+    def guardar_historial(self, reemplazar=False):
+        """Guardar historial en archivo, incorporando lo que otra instancia haya guardado."""
         try:
-            with open("health_history.json", "w") as f:
-                json.dump(self.historial, f, indent=4)
+            # Lo que otra instancia haya guardado con métricas de una versión anterior se reduce a los datos
+            ajenas = sincronizacion.guardar_historial(self.historial, reemplazar=reemplazar,
+                                                      estacion=self.configuracion["estacion"], preparar=solo_datos)
+            if ajenas and hasattr(self, "arbol_historial"):
+                self.actualizar_arbol_historial()
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo guardar el historial: {str(e)}")
     
@@ -620,7 +567,13 @@ class CalculadoraSaludApp:
         """Borrar todo el historial."""
         if messagebox.askyesno("Confirmar", "¿Estas seguro de borrar todo el historial?"):
             self.historial = []
-            self.guardar_historial()
+            self.sincronizador = None
+            # Lo borrado tampoco se publica en el directorio compartido en la próxima sincronización
+            try:
+                sincronizacion.descartar_pendientes()
+            except OSError as e:
+                print(f"Error descartando mediciones pendientes: {e}")
+            self.guardar_historial(reemplazar=True)
             self.actualizar_arbol_historial()
     
     def exportar_csv(self):
@@ -631,7 +584,7 @@ class CalculadoraSaludApp:
                 with open(ruta_archivo, "w", newline="") as f:
                     writer = csv.writer(f)
                     writer.writerow(["Fecha", "Peso (kg)", "Altura (m)", "Edad", "Genero", "Actividad", "IMC", "Metabolismo", "Calorias"])
-                    for entrada in self.historial:
+                    for entrada in self.metricas.con_metricas(self.historial):
                         writer.writerow([
                             entrada.get("fecha", "Sin Fecha"),
                             entrada.get("peso", 0),
@@ -639,9 +592,9 @@ class CalculadoraSaludApp:
                             entrada.get("edad", 0),
                             entrada.get("genero", ""),
                             entrada.get("actividad", ""),
-                            entrada.get("imc", 0),
-                            entrada.get("bmr", 0),
-                            entrada.get("calorias", 0)
+                            entrada["imc"],
+                            entrada["bmr"],
+                            entrada["calorias"]
                         ])
                 messagebox.showinfo("Exito", "Historial exportado a CSV correctamente!")
             except Exception as e:
@@ -653,11 +606,70 @@ class CalculadoraSaludApp:
         if ruta_archivo:
             try:
                 with open(ruta_archivo, "w") as f:
-                    json.dump(self.historial, f, indent=4)
+                    json.dump(self.metricas.con_metricas(self.historial), f, indent=4)
                 messagebox.showinfo("Exito", "Historial exportado a JSON correctamente!")
             except Exception as e:
                 messagebox.showerror("Error", f"No se pudo exportar a JSON: {str(e)}")
     
+    def exportar_columnar(self):
+        """Exportar historial a Parquet o Arrow IPC, segun la extension elegida."""
+        ruta_archivo = filedialog.asksaveasfilename(defaultextension=".parquet", filetypes=[("Parquet", "*.parquet"), ("Arrow IPC", "*.arrow")])
+        if ruta_archivo:
+            try:
+                filas = exportar_historial(self.metricas.con_metricas(self.historial), ruta_archivo)
+                messagebox.showinfo("Exito", f"{filas} mediciones exportadas correctamente!")
+            except Exception as e:
+                messagebox.showerror("Error", f"No se pudo exportar el historial: {str(e)}")
+    
+    def importar_columnar(self):
+        """Importar mediciones desde Parquet o Arrow IPC, sin duplicar las que ya estan en el historial."""
+        ruta_archivo = filedialog.askopenfilename(filetypes=[("Parquet o Arrow", "*.parquet *.arrow")])
+        if ruta_archivo:
+            try:
+                importadas = [solo_datos(sincronizacion.completar_entrada(entrada, self.configuracion["estacion"]))
+                              for entrada in importar_historial(ruta_archivo)]
+                nuevas = sincronizacion.fusionar(self.historial, importadas)
+                self.guardar_historial()
+                self.anotar_para_sincronizar(nuevas)
+                self.actualizar_arbol_historial()
+                messagebox.showinfo("Exito", f"{len(nuevas)} mediciones importadas correctamente!")
+            except Exception as e:
+                messagebox.showerror("Error", f"No se pudo importar el historial: {str(e)}")
+    
+    def anotar_para_sincronizar(self, entradas):
+        """Dejar las mediciones nuevas pendientes de publicar si hay un directorio compartido."""
+        if not self.configuracion["directorio_sincronizacion"]:
+            return
+        try:
+            for entrada in entradas:
+                sincronizacion.registrar_pendiente(entrada)
+        except Exception as e:
+            print(f"Error anotando medicion para sincronizar: {e}")
+    
+    def elegir_directorio_sync(self):
+        directorio = filedialog.askdirectory()
+        if directorio:
+            self.var_directorio_sync.set(directorio)
+    
+    def sincronizar_historial(self):
+        """Publicar las mediciones nuevas y traer las de otras estaciones desde el directorio compartido."""
+        directorio = self.configuracion["directorio_sincronizacion"]
+        if not directorio:
+            messagebox.showwarning("Sincronizacion", "Configure primero un directorio compartido")
+            return
+        try:
+            if self.sincronizador is None:
+                self.sincronizador = sincronizacion.SincronizadorHistorial(directorio, self.configuracion["estacion"])
+            publicadas, recibidas = self.sincronizador.sincronizar(self.historial)
+            for entrada in recibidas:
+                solo_datos(entrada)
+            if recibidas:
+                self.guardar_historial()
+                self.actualizar_arbol_historial()
+            messagebox.showinfo("Sincronizacion", f"{publicadas} mediciones enviadas, {len(recibidas)} recibidas")
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo sincronizar: {str(e)}")
+    
     def exportar_pdf(self):
         """Exportar historial a archivo PDF."""
         ruta_archivo = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("Archivos PDF", "*.pdf")])
@@ -677,13 +689,13 @@ class CalculadoraSaludApp:
                 pdf.cell(25, 10, "Calorias", 1)
                 pdf.ln()
                 pdf.set_font("Arial", size=10)
-                for entrada in self.historial:
+                for entrada in self.metricas.con_metricas(self.historial):
                     pdf.cell(40, 10, entrada.get("fecha", "Sin Fecha"), 1)
                     pdf.cell(20, 10, str(entrada.get("peso", 0)), 1)
                     pdf.cell(20, 10, str(entrada.get("altura", 0)), 1)
-                    pdf.cell(15, 10, f"{entrada.get('imc', 0):.2f}", 1)
-                    pdf.cell(30, 10, f"{entrada.get('bmr', 0):.0f}", 1)
-                    pdf.cell(25, 10, f"{entrada.get('calorias', 0):.0f}", 1)
+                    pdf.cell(15, 10, f"{entrada['imc'] or 0:.2f}", 1)
+                    pdf.cell(30, 10, f"{entrada['bmr'] or 0:.0f}", 1)
+                    pdf.cell(25, 10, f"{entrada['calorias'] or 0:.0f}", 1)
                     pdf.ln()
                 pdf.output(ruta_archivo)
                 messagebox.showinfo("Exito", "Historial exportado a PDF correctamente!")
@@ -722,8 +734,11 @@ class CalculadoraSaludApp:
         self.configuracion.update({
             "tema": self.var_tema.get(),
             "tamano_fuente": self.var_tamano.get(),
-            "velocidad_animacion": self.var_velocidad.get()
+            "velocidad_animacion": self.var_velocidad.get(),
+            "directorio_sincronizacion": self.var_directorio_sync.get(),
+            "estacion": self.var_estacion.get() or sincronizacion.estacion_por_defecto()
         })
+        self.sincronizador = None
         self.guardar_configuracion()
         messagebox.showinfo("Configuracion", "Preferencias guardadas exitosamente!")
     
@@ -782,6 +797,9 @@ class CalculadoraSaludApp:
         menu_archivo = tk.Menu(barra_menu, tearoff=0)
         menu_archivo.add_command(label="Guardar datos", command=self.guardar_datos)
         menu_archivo.add_command(label="Cargar datos", command=self.cargar_datos)
+        self.menu_recientes = tk.Menu(menu_archivo, tearoff=0)
+        menu_archivo.add_cascade(label="Fotos recientes", menu=self.menu_recientes)
+        self.actualizar_menu_recientes()
         menu_archivo.add_separator()
         menu_archivo.add_command(label="Salir", command=self.raiz.quit)
         barra_menu.add_cascade(label="Archivo", menu=menu_archivo)
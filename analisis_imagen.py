@@ -0,0 +1,56 @@
+"""Análisis de una imagen sin interfaz gráfica: filtro de calidad, pose y proporciones.
+
+Lo usan calculo_imagen_v1 y los procesos sin pantalla (autocalibracion,
+vigilar_carpeta), que así no importan Tk. El motor de pose y el filtro de
+calidad se crean la primera vez que se necesitan, uno por proceso.
+"""
+from filtro_calidad import FiltroCalidad
+from motor_pose import BACKEND_POR_DEFECTO, crear_motor
+from planificador import detectar_pose
+from proporciones import CALIBRATION, calculate_proportions_array
+
+# Presupuesto de latencia por análisis en milisegundos (None = sin límite)
+LATENCY_BUDGET_MS = 1500
+
+# Backend de inferencia de pose: "mediapipe" o "onnx" (variable de entorno POSE_BACKEND)
+POSE_BACKEND = BACKEND_POR_DEFECTO
+
+_motor = None
+_filtro = None
+
+
+def motor_pose():
+    """Motor de pose del proceso, creado la primera vez que se usa"""
+    global _motor
+    if _motor is None:
+        _motor = crear_motor(POSE_BACKEND, latency_budget_ms=LATENCY_BUDGET_MS, min_detection_confidence=0.5)
+    return _motor
+
+
+def filtro_calidad():
+    """Filtro de calidad previo a la inferencia (umbrales en calidad.json), uno por proceso"""
+    global _filtro
+    if _filtro is None:
+        _filtro = FiltroCalidad()
+    return _filtro
+
+
+def analyze_image(image, calibration_factors=None, check_quality=True):
+    """Analiza una imagen BGR y devuelve (landmarks, proporciones).
+
+    Con check_quality las fotos borrosas, mal expuestas o sin persona se
+    rechazan con ImagenRechazada antes de llegar al modelo. Una imagen que no
+    se pudo leer o sin postura detectada produce ValueError.
+    """
+    if image is None:
+        raise ValueError("No se pudo leer la imagen")
+    filtro = filtro_calidad()
+    if check_quality:
+        filtro.verificar(image)
+    landmarks, info = detectar_pose(motor_pose(), image)
+    if info:
+        filtro.registrar_inferencia(info['total_ms'])
+    if landmarks is None:
+        raise ValueError("No se detectó postura en la imagen")
+    proportions = calculate_proportions_array(landmarks, calibration_factors or CALIBRATION)
+    return landmarks, {key: float(value) for key, value in proportions.items()}
@@ -0,0 +1,231 @@
+"""Análisis de postura de un archivo de video, cuadro por cuadro, en segmentos paralelos.
+
+Uso:
+    python analisis_video.py VIDEO [--trabajadores N] [--paso 1] [--nivel 1]
+                             [--salida serie.csv] [--resumen resumen.json] [--sesion video.sesion]
+
+El video se divide en segmentos que empiezan en fotogramas clave (según ffprobe;
+sin ffprobe, en partes iguales). Cada segmento se decodifica en su propio
+proceso: se posiciona con CAP_PROP_POS_FRAMES y analiza sus cuadros con
+MediaPipe Pose en modo seguimiento, que entre cuadros consecutivos sólo
+refina la región de la persona en lugar de buscarla de nuevo. Las proporciones
+de todos los segmentos se unen en una serie de tiempo con estadísticas resumen.
+Si el contenedor no informa la cantidad de cuadros, el video se decodifica en
+un solo segmento hasta el final.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+# Segmentos por trabajador: algunos más que procesos para repartir mejor los que tardan más
+SEGMENTOS_POR_TRABAJADOR = 2
+
+# Largo mínimo de un segmento en cuadros (cada uno paga el costo de posicionarse y arrancar el modelo)
+CUADROS_MINIMOS_SEGMENTO = 60
+
+
+def propiedades_video(ruta):
+    captura = cv2.VideoCapture(ruta)
+    if not captura.isOpened():
+        raise ValueError(f"No se pudo abrir el video {ruta}")
+    try:
+        fps = captura.get(cv2.CAP_PROP_FPS) or 30.0
+        cuadros = int(captura.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        captura.release()
+    return fps, cuadros
+
+
+def fotogramas_clave(ruta, fps):
+    """Índices de los fotogramas clave según ffprobe, o None si ffprobe no está disponible o falla"""
+    if shutil.which("ffprobe") is None:
+        return None
+    comando = ["ffprobe", "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+               "-show_entries", "frame=best_effort_timestamp_time", "-of", "csv=p=0", ruta]
+    try:
+        salida = subprocess.run(comando, capture_output=True, text=True, check=True, timeout=120).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    indices = set()
+    for linea in salida.splitlines():
+        try:
+            indices.add(int(round(float(linea.strip().strip(",")) * fps)))
+        except ValueError:
+            continue
+    return sorted(indices) or None
+
+
+def dividir_segmentos(cuadros, cantidad, claves=None):
+    """Divide [0, cuadros) en hasta `cantidad` segmentos (inicio, fin) de largo parecido.
+
+    Con fotogramas clave cada corte se mueve al fotograma clave más cercano, así el
+    posicionamiento del proceso que decodifica el segmento es exacto y barato.
+    """
+    cantidad = max(1, min(cantidad, cuadros // CUADROS_MINIMOS_SEGMENTO or 1))
+    cortes = [round(cuadros * i / cantidad) for i in range(1, cantidad)]
+    if claves:
+        claves = np.asarray([c for c in claves if 0 < c < cuadros])
+        if len(claves):
+            cortes = [int(claves[np.argmin(np.abs(claves - corte))]) for corte in cortes]
+        else:
+            cortes = []
+    limites = [0] + sorted(set(cortes)) + [cuadros]
+    return [(inicio, fin) for inicio, fin in zip(limites, limites[1:]) if fin > inicio]
+
+
+def analizar_segmento(ruta, inicio, fin=None, paso=1, nivel=1):
+    """Analiza los cuadros [inicio, fin) de a `paso` (con fin=None, hasta el final); se ejecuta en un proceso propio.
+
+    Devuelve (índices de cuadro, landmarks (n, 33, 4) con NaN donde no hubo detección).
+    """
+    from motor_pose import MotorPose
+
+    # Modo seguimiento: sólo el primer cuadro (o tras perder a la persona) busca desde cero
+    motor = MotorPose(latency_budget_ms=None, min_visibility=0.0, tiers=(nivel,), static_image_mode=False)
+    captura = cv2.VideoCapture(ruta)
+    captura.set(cv2.CAP_PROP_POS_FRAMES, inicio)
+    indices, landmarks = [], []
+    try:
+        for indice in range(inicio, fin) if fin is not None else itertools.count(inicio):
+            if (indice - inicio) % paso:
+                # grab() avanza sin decodificar la imagen completa
+                if not captura.grab():
+                    break
+                continue
+            correcto, cuadro = captura.read()
+            if not correcto:
+                break
+            detectados = motor.process(cuadro)
+            indices.append(indice)
+            landmarks.append(detectados if detectados is not None else np.full((33, 4), np.nan, dtype=np.float32))
+    finally:
+        captura.release()
+        motor.close()
+    if not landmarks:
+        return np.empty(0, dtype=np.int64), np.empty((0, 33, 4), dtype=np.float32)
+    return np.asarray(indices, dtype=np.int64), np.stack(landmarks).astype(np.float32)
+
+
+def resumir(proporciones, detectados):
+    """Media, desvío, mínimo, máximo y percentiles 5/50/95 de cada proporción en los cuadros con detección"""
+    resumen = {}
+    for clave, valores in proporciones.items():
+        valores = valores[detectados]
+        if len(valores) == 0:
+            resumen[clave] = None
+            continue
+        p5, p50, p95 = np.percentile(valores, [5, 50, 95])
+        resumen[clave] = {
+            "media": float(valores.mean()), "desvio": float(valores.std()),
+            "minimo": float(valores.min()), "maximo": float(valores.max()),
+            "p5": float(p5), "mediana": float(p50), "p95": float(p95)
+        }
+    return resumen
+
+
+def analizar_video(ruta, trabajadores=None, paso=1, nivel=1):
+    """Analiza el video en paralelo y devuelve la serie de tiempo unida y su resumen"""
+    from proporciones import CALIBRATION, calculate_proportions_array
+
+    fps, cuadros = propiedades_video(ruta)
+    trabajadores = trabajadores or os.cpu_count() or 1
+    claves = fotogramas_clave(ruta, fps)
+    if cuadros > 0:
+        segmentos = dividir_segmentos(cuadros, trabajadores * SEGMENTOS_POR_TRABAJADOR, claves)
+    else:
+        # Sin cantidad de cuadros no se puede repartir: un solo segmento hasta que falle la lectura
+        print("El video no informa la cantidad de cuadros: se analiza en un solo segmento")
+        segmentos = [(0, None)]
+
+    inicio = time.perf_counter()
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, min(trabajadores, len(segmentos))), mp_context=contexto) as pool:
+        futuros = [pool.submit(analizar_segmento, ruta, desde, hasta, paso, nivel) for desde, hasta in segmentos]
+        partes = [futuro.result() for futuro in futuros]
+    duracion = time.perf_counter() - inicio
+
+    indices = np.concatenate([parte[0] for parte in partes])
+    landmarks = np.concatenate([parte[1] for parte in partes])
+    detectados = ~np.isnan(landmarks[:, 0, 0])
+    proporciones = calculate_proportions_array(landmarks, CALIBRATION)
+    if cuadros <= 0 and len(indices):
+        # Estimación: con paso > 1 pueden faltar los últimos cuadros salteados
+        cuadros = int(indices[-1]) + 1
+    duracion_video = cuadros / fps if fps else 0.0
+
+    return {
+        "cuadros": indices,
+        "tiempos": indices / fps,
+        "landmarks": landmarks,
+        "proporciones": proporciones,
+        "resumen": {
+            "video": os.path.abspath(ruta),
+            "fps": fps,
+            "cuadros_totales": cuadros,
+            "cuadros_analizados": int(len(indices)),
+            "cuadros_con_deteccion": int(detectados.sum()),
+            "segmentos": len(segmentos),
+            "segmentos_por_fotogramas_clave": claves is not None,
+            "trabajadores": trabajadores,
+            "segundos": duracion,
+            "veces_tiempo_real": duracion_video / duracion if duracion > 0 else None,
+            "proporciones": resumir(proporciones, detectados)
+        }
+    }
+
+
+def guardar_csv(resultado, ruta):
+    claves = list(resultado["proporciones"])
+    with open(ruta, "w") as f:
+        f.write(",".join(["cuadro", "tiempo"] + claves) + "\n")
+        for i, cuadro in enumerate(resultado["cuadros"]):
+            valores = [resultado["proporciones"][clave][i] for clave in claves]
+            f.write(",".join([str(cuadro), f"{resultado['tiempos'][i]:.3f}"]
+                             + ["" if np.isnan(valor) else f"{valor:.5f}" for valor in valores]) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analiza la postura en cada cuadro de un video")
+    parser.add_argument("video")
+    parser.add_argument("--trabajadores", type=int, default=None, help="Procesos (por defecto, todos los núcleos)")
+    parser.add_argument("--paso", type=int, default=1, help="Analizar uno de cada N cuadros")
+    parser.add_argument("--nivel", type=int, default=1, help="Nivel de complejidad de MediaPipe")
+    parser.add_argument("--salida", help="CSV con la serie de tiempo de proporciones")
+    parser.add_argument("--resumen", help="JSON con las estadísticas resumen")
+    parser.add_argument("--sesion", help="Guardar landmarks y proporciones como archivo de sesión")
+    args = parser.parse_args()
+
+    resultado = analizar_video(args.video, args.trabajadores, max(1, args.paso), args.nivel)
+    resumen = resultado["resumen"]
+    print(f"{resumen['cuadros_analizados']} cuadros analizados en {resumen['segmentos']} segmentos, "
+          f"{resumen['cuadros_con_deteccion']} con persona detectada, {resumen['segundos']:.1f} s "
+          f"({resumen['veces_tiempo_real'] or 0:.2f}x tiempo real)")
+    for clave, estadisticas in resumen["proporciones"].items():
+        if estadisticas is not None:
+            print(f"  {clave}: media {estadisticas['media']:.3f}, desvío {estadisticas['desvio']:.3f}, "
+                  f"p5-p95 {estadisticas['p5']:.3f}-{estadisticas['p95']:.3f}")
+
+    if args.salida:
+        guardar_csv(resultado, args.salida)
+    if args.resumen:
+        with open(args.resumen, "w") as f:
+            json.dump(resumen, f, indent=4)
+    if args.sesion:
+        from sesiones import guardar_sesion
+
+        arreglos = {"cuadros": resultado["cuadros"], "landmarks": resultado["landmarks"]}
+        arreglos.update({f"proporcion_{clave}": valores for clave, valores in resultado["proporciones"].items()})
+        guardar_sesion(args.sesion, arreglos, {"video": resumen})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from sincronizacion_historial import bloqueo
+
+# Formato de cada registro: 33 landmarks de MediaPipe x (x, y, z, visibility) en float32
+NUM_LANDMARKS = 33
+NUM_CAMPOS = 4
+TAMANO_REGISTRO = NUM_LANDMARKS * NUM_CAMPOS * np.dtype(np.float32).itemsize
+FORMATO_ARCHIVO = 1
+
+DIRECTORIO_POR_DEFECTO = "landmark_archive"
+
+
+def landmarks_to_array(landmarks):
+    """Convierte la lista de landmarks de MediaPipe en un arreglo (33, 4) float32"""
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks], dtype=np.float32)
+
+
+class ArchivoLandmarks:
+    """Archivo binario de solo-anexado con los landmarks de cada análisis.
+
+    Los landmarks se guardan como registros de tamaño fijo en ``landmarks.f32`` para
+    poder abrirlos con ``np.memmap``. ``indice.json`` guarda cuántos registros están
+    confirmados y ``reportes.jsonl`` los datos de cada análisis (ruta, fecha, proporciones).
+    Los anexados se hacen bajo un bloqueo de archivo, así varios procesos
+    (la interfaz, vigilar_carpeta, pipeline_lotes) pueden compartir el archivo.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_POR_DEFECTO):
+        self.directorio = directorio
+        self.ruta_datos = os.path.join(directorio, "landmarks.f32")
+        self.ruta_indice = os.path.join(directorio, "indice.json")
+        self.ruta_reportes = os.path.join(directorio, "reportes.jsonl")
+        os.makedirs(directorio, exist_ok=True)
+
+    def __len__(self):
+        return self.contar()
+
+    def contar(self):
+        """Número de registros confirmados en el índice y presentes en el archivo de datos"""
+        registros = self.leer_indice()["registros"]
+        if not os.path.exists(self.ruta_datos):
+            return 0
+        return min(registros, os.path.getsize(self.ruta_datos) // TAMANO_REGISTRO)
+
+    def leer_indice(self):
+        indice = {
+            "formato": FORMATO_ARCHIVO,
+            "dtype": "float32",
+            "forma": [NUM_LANDMARKS, NUM_CAMPOS],
+            "registros": 0
+        }
+        if os.path.exists(self.ruta_indice):
+            with open(self.ruta_indice, "r") as f:
+                indice.update(json.load(f))
+        return indice
+
+    def escribir_indice(self, registros, bytes_reportes=None):
+        indice = self.leer_indice()
+        indice["registros"] = registros
+        if bytes_reportes is not None:
+            indice["bytes_reportes"] = bytes_reportes
+        ruta_tmp = self.ruta_indice + ".tmp"
+        with open(ruta_tmp, "w") as f:
+            json.dump(indice, f)
+        os.replace(ruta_tmp, self.ruta_indice)
+
+    def agregar(self, landmarks, reporte=None):
+        """Anexa un análisis y devuelve su número de registro"""
+        return self.agregar_lote(np.asarray(landmarks)[None], [reporte])[0]
+
+    def agregar_lote(self, landmarks, reportes=None):
+        """Anexa varios análisis de una vez y devuelve sus números de registro"""
+        datos = np.ascontiguousarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, NUM_CAMPOS)
+        if reportes is None:
+            reportes = [None] * len(datos)
+        if len(reportes) != len(datos):
+            raise ValueError("Debe haber un reporte por cada conjunto de landmarks")
+
+        with bloqueo(self.ruta_datos):
+            inicio = self.contar()
+            # Se escribe tras el último registro confirmado: cualquier resto de una
+            # escritura interrumpida se sobrescribe y el índice se actualiza al final.
+            fd = os.open(self.ruta_datos, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                os.lseek(fd, inicio * TAMANO_REGISTRO, os.SEEK_SET)
+                os.write(fd, datos.tobytes())
+                os.ftruncate(fd, (inicio + len(datos)) * TAMANO_REGISTRO)
+            finally:
+                os.close(fd)
+
+            with open(self.ruta_reportes, "a+b") as f:
+                # Los reportes de una escritura interrumpida no están confirmados: se descartan
+                f.truncate(self.bytes_confirmados(inicio))
+                f.seek(0, os.SEEK_END)
+                for i, reporte in enumerate(reportes):
+                    entrada = {
+                        "registro": inicio + i,
+                        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    }
+                    entrada.update(reporte or {})
+                    f.write((json.dumps(entrada, default=float) + "\n").encode("utf-8"))
+                bytes_reportes = f.tell()
+
+            self.escribir_indice(inicio + len(datos), bytes_reportes)
+        return list(range(inicio, inicio + len(datos)))
+
+    def bytes_confirmados(self, registros):
+        """Tamaño de reportes.jsonl que corresponde a los `registros` confirmados"""
+        if not os.path.exists(self.ruta_reportes):
+            return 0
+        indice = self.leer_indice()
+        if "bytes_reportes" in indice and indice["registros"] == registros:
+            return min(indice["bytes_reportes"], os.path.getsize(self.ruta_reportes))
+        # Índices anteriores no guardan el tamaño: se busca la primera línea no confirmada
+        posicion = 0
+        with open(self.ruta_reportes, "rb") as f:
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break
+                try:
+                    if json.loads(linea).get("registro", registros) >= registros:
+                        break
+                except ValueError:
+                    pass
+                posicion += len(linea)
+        return posicion
+
+    def cargar(self):
+        """Abre todos los landmarks guardados como un arreglo (N, 33, 4) mapeado en memoria"""
+        registros = self.contar()
+        if registros == 0:
+            return np.empty((0, NUM_LANDMARKS, NUM_CAMPOS), dtype=np.float32)
+        return np.memmap(self.ruta_datos, dtype=np.float32, mode="r",
+                         shape=(registros, NUM_LANDMARKS, NUM_CAMPOS))
+
+    def reportes(self):
+        """Devuelve los reportes confirmados, en orden de registro"""
+        return self.leer_reportes_desde(0)[0]
+
+    def leer_reportes_desde(self, posicion):
+        """Lee los reportes a partir de una posición en bytes de reportes.jsonl.
+
+        Devuelve los reportes confirmados y la posición desde la que continuar la
+        próxima vez, para leer sólo lo agregado desde la última lectura.
+        """
+        indice = self.leer_indice()
+        registros = self.contar()
+        # Lo escrito después del último índice (un anexado en curso o interrumpido) no se lee
+        limite = indice.get("bytes_reportes") if indice["registros"] == registros else None
+        resultado = []
+        if not os.path.exists(self.ruta_reportes):
+            return resultado, posicion
+        with open(self.ruta_reportes, "rb") as f:
+            f.seek(posicion)
+            for linea in f:
+                if not linea.endswith(b"\n") or (limite is not None and posicion + len(linea) > limite):
+                    break
+                try:
+                    entrada = json.loads(linea)
+                except ValueError:
+                    posicion += len(linea)
+                    continue
+                if entrada.get("registro", registros) >= registros:
+                    break
+                resultado.append(entrada)
+                posicion += len(linea)
+        return resultado, posicion
+
+    def recalcular_proporciones(self, calibration_factors, tamano_bloque=100000):
+        """Recalcula las proporciones de todos los registros con otros factores de calibración.
+
+        No decodifica imágenes ni ejecuta inferencia: recorre el archivo mapeado en
+        bloques y aplica la versión vectorizada de ``calculate_proportions``.
+        """
+        from proporciones import calculate_proportions_array
+
+        landmarks = self.cargar()
+        resultado = {}
+        for inicio in range(0, len(landmarks), tamano_bloque):
+            bloque = calculate_proportions_array(landmarks[inicio:inicio + tamano_bloque], calibration_factors)
+            for clave, valores in bloque.items():
+                if clave not in resultado:
+                    resultado[clave] = np.empty(len(landmarks), dtype=np.float32)
+                resultado[clave][inicio:inicio + len(valores)] = valores
+        return resultado
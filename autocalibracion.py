@@ -0,0 +1,234 @@
+"""Ajuste automático de los factores de calibración de calculo_imagen_v1 con medidas de referencia.
+
+El CSV de referencia tiene una columna ``ruta`` (la foto) o ``registro`` (un
+registro del archivo de landmarks) y una columna por cada proporción medida con
+cinta (head_to_body, shoulder_to_waist, ...); las que falten se ignoran. Cada
+foto se infiere una sola vez: sus landmarks quedan en el archivo y los ajustes
+siguientes sólo los leen. La búsqueda evalúa muchos vectores de factores a la
+vez sobre todas las poses con calculate_proportions_array (factores de forma
+(C, 1) contra landmarks (N, 33, 4)): primero una grilla gruesa sobre una
+muestra y después grillas cada vez más finas alrededor del mejor candidato.
+
+Las proporciones son cocientes de distancias, así que multiplicar todos los
+factores por la misma constante no las cambia: 'head' queda fijo en 1.0. El
+factor 'waist' no interviene en ninguna proporción y tampoco se ajusta.
+
+Uso:
+    python autocalibracion.py referencias.csv [--salida calibracion.json] [--pasos 7] [--rondas 40]
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from proporciones import (DEFAULT_CALIBRATION, HEALTHY_PROPORTIONS, RUTA_CALIBRACION,  # noqa: F401
+                          calculate_proportions_array, cargar_calibracion)
+
+# Grupos que se ajustan; el resto queda en 1.0
+GRUPOS_AJUSTABLES = ("shoulders", "hips", "knees", "ankles")
+
+# Rango inicial de cada factor en la grilla gruesa
+RANGO_FACTORES = (0.5, 1.5)
+
+# Poses usadas en la grilla gruesa (las rondas finas usan todas)
+MUESTRA_GRUESA = 1000
+
+# Valores por factor en cada ronda fina: centro y un paso a cada lado
+PASOS_FINOS = 3
+
+# Radio de la grilla fina con el que se da por terminado el ajuste
+TOLERANCIA = 1e-3
+
+# Candidatos x poses evaluados por bloque, para acotar la memoria de los arreglos (C, N, 2)
+ELEMENTOS_POR_BLOQUE = 1_000_000
+
+# Error asignado a los candidatos que dan proporciones indefinidas (distancias nulas)
+ERROR_INVALIDO = 1e6
+
+
+def guardar_calibracion(factores, detalles=None, ruta=RUTA_CALIBRACION):
+    datos = {"factores": factores, "fecha": datetime.now().isoformat()}
+    datos.update(detalles or {})
+    with open(ruta + ".tmp", "w") as f:
+        json.dump(datos, f, indent=4)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def leer_referencias(ruta):
+    """Lee el CSV de referencia: lista de {'ruta' o 'registro', 'medidas': {proporción: valor}}"""
+    referencias = []
+    with open(ruta, "r", newline="") as f:
+        for fila in csv.DictReader(f):
+            medidas = {}
+            for clave in HEALTHY_PROPORTIONS:
+                texto = (fila.get(clave) or "").strip()
+                if texto:
+                    medidas[clave] = float(texto)
+            if not medidas:
+                continue
+            referencia = {"medidas": medidas}
+            if (fila.get("registro") or "").strip():
+                referencia["registro"] = int(fila["registro"])
+            elif (fila.get("ruta") or "").strip():
+                referencia["ruta"] = fila["ruta"].strip()
+            else:
+                continue
+            referencias.append(referencia)
+    return referencias
+
+
+def landmarks_de_referencias(referencias, archivo):
+    """Junta los landmarks de cada referencia, infiriendo sólo las fotos que no estén en el archivo.
+
+    Devuelve (landmarks (N, 33, 4), medidas (N, P) con NaN donde no hay medida,
+    claves de las P proporciones).
+    """
+    from analisis_imagen import analyze_image
+
+    # Último registro guardado de cada foto
+    registros = {}
+    for reporte in archivo.reportes():
+        if reporte.get("image_path") and "registro" in reporte:
+            registros[os.path.abspath(reporte["image_path"])] = reporte["registro"]
+
+    nuevos, rutas_nuevas = [], []
+    for referencia in referencias:
+        ruta = referencia.get("ruta")
+        if ruta is None or os.path.abspath(ruta) in registros or ruta in rutas_nuevas:
+            continue
+        try:
+            landmarks, _ = analyze_image(cv2.imread(ruta), check_quality=False)
+        except Exception as e:
+            print(f"Error analizando {ruta}: {e}")
+            continue
+        nuevos.append(landmarks)
+        rutas_nuevas.append(ruta)
+    if nuevos:
+        reportes = [{"image_path": ruta, "origen": "autocalibracion"} for ruta in rutas_nuevas]
+        for ruta, registro in zip(rutas_nuevas, archivo.agregar_lote(np.stack(nuevos), reportes)):
+            registros[os.path.abspath(ruta)] = registro
+
+    guardados = archivo.cargar()
+    claves = list(HEALTHY_PROPORTIONS)
+    indices, medidas = [], []
+    for referencia in referencias:
+        registro = referencia.get("registro")
+        if registro is None:
+            registro = registros.get(os.path.abspath(referencia["ruta"]))
+        if registro is None or not 0 <= registro < len(guardados):
+            continue
+        indices.append(registro)
+        medidas.append([referencia["medidas"].get(clave, np.nan) for clave in claves])
+    landmarks = np.asarray(guardados[indices], dtype=np.float32) if indices else np.empty((0, 33, 4), np.float32)
+    return landmarks, np.asarray(medidas, dtype=np.float64).reshape(-1, len(claves)), claves
+
+
+def factores_de_candidatos(candidatos):
+    """Diccionario de factores con arreglos (C, 1), listo para calculate_proportions_array"""
+    factores = {grupo: np.ones((len(candidatos), 1)) for grupo in DEFAULT_CALIBRATION}
+    for i, grupo in enumerate(GRUPOS_AJUSTABLES):
+        factores[grupo] = candidatos[:, i:i + 1]
+    return factores
+
+
+def error_candidatos(landmarks, medidas, claves, candidatos):
+    """Error cuadrático relativo medio de cada candidato (C, G) sobre todas las poses y medidas"""
+    medido = ~np.isnan(medidas)
+    referencia = np.where(medido, medidas, 1.0)
+    total_medidas = max(1, int(medido.sum()))
+    errores = np.empty(len(candidatos))
+    por_bloque = max(1, ELEMENTOS_POR_BLOQUE // max(1, len(landmarks)))
+    for inicio in range(0, len(candidatos), por_bloque):
+        bloque = candidatos[inicio:inicio + por_bloque]
+        proporciones = calculate_proportions_array(landmarks, factores_de_candidatos(bloque))
+        suma = np.zeros(len(bloque))
+        for j, clave in enumerate(claves):
+            if not medido[:, j].any():
+                continue
+            relativo = (proporciones[clave] - referencia[:, j]) / referencia[:, j]
+            cuadrado = np.nan_to_num(relativo * relativo, nan=ERROR_INVALIDO, posinf=ERROR_INVALIDO)
+            suma += np.where(medido[:, j], cuadrado, 0.0).sum(axis=1)
+        errores[inicio:inicio + len(bloque)] = suma / total_medidas
+    return errores
+
+
+def grilla(centro, radio, pasos):
+    """Todos los vectores de una grilla de `pasos` valores por grupo alrededor de `centro`"""
+    ejes = [np.linspace(max(0.05, c - radio), c + radio, pasos) for c in centro]
+    return np.stack(np.meshgrid(*ejes, indexing="ij"), axis=-1).reshape(-1, len(centro))
+
+
+def ajustar(landmarks, medidas, claves, pasos=7, rondas=40, muestra=MUESTRA_GRUESA):
+    """Busca los factores que minimizan el error; devuelve (factores, error, candidatos evaluados)"""
+    if len(landmarks) == 0:
+        raise ValueError("No hay poses de referencia para ajustar")
+    # Grilla gruesa sobre una muestra de las poses
+    elegidas = np.arange(len(landmarks))
+    if len(elegidas) > muestra:
+        elegidas = np.random.default_rng(0).choice(elegidas, muestra, replace=False)
+    bajo, alto = RANGO_FACTORES
+    radio = (alto - bajo) / 2
+    candidatos = grilla([(alto + bajo) / 2] * len(GRUPOS_AJUSTABLES), radio, pasos)
+    errores = error_candidatos(landmarks[elegidas], medidas[elegidas], claves, candidatos)
+    mejor = candidatos[np.argmin(errores)]
+    evaluados = len(candidatos)
+
+    # Rondas finas con todas las poses: la grilla se mueve al mejor candidato y
+    # sólo se achica cuando el centro sigue siendo el mejor
+    radio = radio / (pasos - 1)
+    for _ in range(rondas):
+        if radio < TOLERANCIA:
+            break
+        candidatos = np.vstack([mejor[None], grilla(mejor, radio, PASOS_FINOS)])
+        errores = error_candidatos(landmarks, medidas, claves, candidatos)
+        evaluados += len(candidatos)
+        if np.argmin(errores) == 0:
+            radio /= 2
+        else:
+            mejor = candidatos[np.argmin(errores)]
+
+    error = float(error_candidatos(landmarks, medidas, claves, mejor[None])[0])
+    factores = dict(DEFAULT_CALIBRATION)
+    factores.update({grupo: float(valor) for grupo, valor in zip(GRUPOS_AJUSTABLES, mejor)})
+    return factores, error, evaluados
+
+
+def main():
+    from archivo_landmarks import DIRECTORIO_POR_DEFECTO, ArchivoLandmarks
+
+    parser = argparse.ArgumentParser(description="Ajusta los factores de calibración con medidas de referencia")
+    parser.add_argument("referencias", help="CSV con ruta o registro y las proporciones medidas")
+    parser.add_argument("--salida", default=RUTA_CALIBRACION)
+    parser.add_argument("--archivo", default=DIRECTORIO_POR_DEFECTO, help="Directorio del archivo de landmarks")
+    parser.add_argument("--pasos", type=int, default=7, help="Valores por factor en la grilla gruesa")
+    parser.add_argument("--rondas", type=int, default=40, help="Rondas de refinamiento como máximo")
+    args = parser.parse_args()
+
+    archivo = ArchivoLandmarks(args.archivo)
+    referencias = leer_referencias(args.referencias)
+    landmarks, medidas, claves = landmarks_de_referencias(referencias, archivo)
+    print(f"{len(landmarks)} poses de referencia de {len(referencias)} filas")
+
+    inicio = time.perf_counter()
+    factores, error, evaluados = ajustar(landmarks, medidas, claves, args.pasos, args.rondas)
+    duracion = time.perf_counter() - inicio
+    error_inicial = float(error_candidatos(landmarks, medidas, claves, np.ones((1, len(GRUPOS_AJUSTABLES))))[0])
+
+    print(f"{evaluados} candidatos evaluados en {duracion:.1f} s")
+    print(f"Error relativo medio: {np.sqrt(error_inicial) * 100:.2f}% sin calibrar, {np.sqrt(error) * 100:.2f}% ajustado")
+    for grupo in DEFAULT_CALIBRATION:
+        print(f"  {grupo}: {factores[grupo]:.4f}")
+    guardar_calibracion(factores, {
+        "referencias": int(len(landmarks)),
+        "error_cuadratico_relativo": error,
+        "error_sin_calibrar": error_inicial
+    }, args.salida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# Landmarks del cuerpo usados en el vector de la pose: nariz, hombros, codos,
+# muñecas, caderas, rodillas y tobillos (índices de MediaPipe)
+BODY_LANDMARKS = [0, 11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28]
+PROPORTION_KEYS = ['head_to_body', 'shoulder_to_waist', 'arm_to_body', 'leg_to_body', 'waist_to_hip']
+
+# Peso de las proporciones frente a la forma de la pose dentro del vector
+PROPORTION_WEIGHT = 2.0
+
+
+def pose_features(landmarks, calibration_factors=None):
+    """Calcula los vectores de búsqueda (N, 31) para landmarks de forma (N, 33, >=2).
+
+    Cada vector combina las proporciones normalizadas por los valores saludables y
+    las coordenadas de los landmarks del cuerpo centradas en la cadera y escaladas
+    por la longitud del torso, para que no influyan la posición ni el tamaño.
+    """
+    from proporciones import DEFAULT_CALIBRATION, HEALTHY_PROPORTIONS, calculate_proportions_array
+
+    landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 33, np.shape(landmarks)[-1])
+    proportions = calculate_proportions_array(landmarks, calibration_factors or DEFAULT_CALIBRATION)
+    proportion_part = np.stack(
+        [proportions[key] / HEALTHY_PROPORTIONS[key] for key in PROPORTION_KEYS], axis=1
+    ) * PROPORTION_WEIGHT
+
+    points = landmarks[:, BODY_LANDMARKS, :2]
+    hip_center = landmarks[:, [23, 24], :2].mean(axis=1)
+    shoulder_center = landmarks[:, [11, 12], :2].mean(axis=1)
+    torso = np.linalg.norm(shoulder_center - hip_center, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shape_part = (points - hip_center[:, None, :]) / torso[:, None, None]
+    shape_part = shape_part.reshape(len(landmarks), -1)
+
+    features = np.concatenate([proportion_part, shape_part], axis=1).astype(np.float32)
+    return np.nan_to_num(features, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+class IndicePoses:
+    """Índice de vecinos más cercanos sobre las poses guardadas en un ArchivoLandmarks.
+
+    Los vectores se guardan en un arreglo que crece por duplicación de capacidad. Si
+    SciPy está disponible se construye un KD-tree sobre la parte ya indexada y los
+    registros nuevos se buscan por fuerza bruta hasta la siguiente reconstrucción;
+    sin SciPy toda la búsqueda es fuerza bruta vectorizada.
+    """
+
+    def __init__(self, archivo=None, fraccion_reconstruccion=0.1, minimo_reconstruccion=1000):
+        self.archivo = archivo
+        self.fraccion_reconstruccion = fraccion_reconstruccion
+        self.minimo_reconstruccion = minimo_reconstruccion
+        self.vectores = np.empty((0, 0), dtype=np.float32)
+        self.normas = np.empty(0, dtype=np.float32)
+        self.registros = np.empty(0, dtype=np.int64)
+        self.tamano = 0
+        self.arbol = None
+        self.tamano_arbol = 0
+        self.reportes = {}
+        self.posicion_reportes = 0
+
+    def __len__(self):
+        return self.tamano
+
+    def agregar(self, vectores, registros):
+        """Agrega vectores ya calculados con su número de registro en el archivo"""
+        vectores = np.asarray(vectores, dtype=np.float32)
+        registros = np.asarray(registros, dtype=np.int64)
+        if len(vectores) == 0:
+            return
+        necesario = self.tamano + len(vectores)
+        if self.tamano == 0:
+            self.vectores = np.empty((0, vectores.shape[1]), dtype=np.float32)
+        if self.vectores.shape[0] < necesario:
+            capacidad = max(necesario, 2 * self.vectores.shape[0], 1024)
+            vectores_nuevos = np.empty((capacidad, vectores.shape[1]), dtype=np.float32)
+            vectores_nuevos[:self.tamano] = self.vectores[:self.tamano]
+            self.vectores = vectores_nuevos
+            registros_nuevos = np.empty(capacidad, dtype=np.int64)
+            registros_nuevos[:self.tamano] = self.registros[:self.tamano]
+            self.registros = registros_nuevos
+            normas_nuevas = np.empty(capacidad, dtype=np.float32)
+            normas_nuevas[:self.tamano] = self.normas[:self.tamano]
+            self.normas = normas_nuevas
+        self.vectores[self.tamano:necesario] = vectores
+        self.registros[self.tamano:necesario] = registros
+        self.normas[self.tamano:necesario] = (vectores ** 2).sum(axis=1)
+        self.tamano = necesario
+
+        pendientes = self.tamano - self.tamano_arbol
+        if cKDTree is not None and pendientes >= max(self.minimo_reconstruccion,
+                                                     self.fraccion_reconstruccion * self.tamano_arbol):
+            self.arbol = cKDTree(self.vectores[:self.tamano])
+            self.tamano_arbol = self.tamano
+
+    def sincronizar(self, tamano_bloque=100000):
+        """Indexa los registros del archivo que se agregaron desde la última sincronización"""
+        if self.archivo is None:
+            return 0
+        landmarks = self.archivo.cargar()
+        inicio = self.tamano and int(self.registros[self.tamano - 1]) + 1
+        for desde in range(inicio, len(landmarks), tamano_bloque):
+            bloque = landmarks[desde:desde + tamano_bloque]
+            self.agregar(pose_features(bloque), np.arange(desde, desde + len(bloque)))
+        reportes, self.posicion_reportes = self.archivo.leer_reportes_desde(self.posicion_reportes)
+        for reporte in reportes:
+            self.reportes[reporte['registro']] = reporte.get('image_path')
+        return len(landmarks) - inicio
+
+    def buscar(self, landmarks, k=5, excluir=None):
+        """Devuelve hasta k pares (registro, distancia) ordenados de más a menos parecido"""
+        if self.tamano == 0:
+            return []
+        consulta = pose_features(landmarks)[0]
+        buscados = k + (1 if excluir is not None else 0)
+
+        candidatos = []
+        if self.arbol is not None:
+            distancias, posiciones = self.arbol.query(consulta, k=min(buscados, self.tamano_arbol))
+            posiciones = np.atleast_1d(posiciones)
+            distancias = np.atleast_1d(distancias)
+            candidatos.extend(zip(self.registros[posiciones].tolist(), distancias.tolist()))
+
+        # Fuerza bruta sobre lo que el árbol no cubre: |x - q|^2 = |x|^2 - 2 x.q + |q|^2
+        inicio = self.tamano_arbol if self.arbol is not None else 0
+        if inicio < self.tamano:
+            bloque = self.vectores[inicio:self.tamano]
+            cuadrados = self.normas[inicio:self.tamano] - 2 * bloque @ consulta + (consulta ** 2).sum()
+            cantidad = min(buscados, len(bloque))
+            cercanos = np.argpartition(cuadrados, cantidad - 1)[:cantidad]
+            distancias = np.sqrt(np.maximum(cuadrados[cercanos], 0))
+            candidatos.extend(zip(self.registros[inicio + cercanos].tolist(), distancias.tolist()))
+
+        candidatos.sort(key=lambda item: item[1])
+        return [(registro, distancia) for registro, distancia in candidatos if registro != excluir][:k]
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import queue
+import shutil
+import threading
+
+from PIL import Image
+
+DIRECTORIO_CACHE = ".thumbnails"
+
+# Tamaño máximo de la cache en disco; al pasarlo se borran las miniaturas usadas hace más tiempo
+MAX_BYTES_CACHE = 200 * 1024 * 1024
+
+# Cada cuántos milisegundos revisa la interfaz si terminó el refinado en segundo plano
+INTERVALO_SONDEO_MS = 30
+
+
+def ajustar(imagen, tamano, modo, filtro):
+    """Aplica el mismo ajuste de tamaño que usan las aplicaciones.
+
+    modo "thumbnail" conserva la proporción dentro de `tamano` (calculo_imagen_v1);
+    modo "resize" estira exactamente a `tamano` (calculo_imagen_v3 y el avatar de perfil).
+    """
+    if modo == "resize":
+        return imagen.resize(tamano, filtro)
+    imagen = imagen.copy()
+    imagen.thumbnail(tamano, filtro)
+    return imagen
+
+
+def liberar_espacio(entradas, max_bytes):
+    """Borra las entradas usadas hace más tiempo hasta que el total entre en max_bytes.
+
+    entradas es una lista de (ruta de archivo o directorio, bytes, fecha de último uso).
+    Devuelve los bytes que quedan.
+    """
+    total = sum(tamano for _, tamano, _ in entradas)
+    for ruta, tamano, _ in sorted(entradas, key=lambda entrada: entrada[2]):
+        if total <= max_bytes:
+            break
+        try:
+            if os.path.isdir(ruta):
+                shutil.rmtree(ruta)
+            else:
+                os.remove(ruta)
+            total -= tamano
+        except OSError as e:
+            print(f"Error liberando espacio de la cache: {e}")
+    return total
+
+
+def abrir_reducida(ruta, tamano):
+    """Abre la imagen pidiendo al decodificador JPEG que reduzca mientras decodifica.
+
+    ``draft()`` elige la escala DCT (1/2, 1/4 o 1/8) más pequeña que sigue siendo
+    mayor o igual a `tamano`, así que una foto de 20 MP no se decodifica completa.
+    En formatos que no son JPEG no tiene efecto.
+    """
+    imagen = Image.open(ruta)
+    imagen.draft("RGB", tamano)
+    if imagen.mode not in ("RGB", "RGBA", "L"):
+        imagen = imagen.convert("RGB")
+    return imagen
+
+
+class CacheMiniaturas:
+    """Miniaturas ya ajustadas guardadas en disco, con clave ruta + fecha de modificación + tamaño.
+
+    La cache no pasa de max_bytes: cada lectura actualiza la fecha de la
+    miniatura y, al crecer, se borran las que se usaron hace más tiempo.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_CACHE, max_bytes=MAX_BYTES_CACHE):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        # Bytes escritos desde la última limpieza (None: todavía no se revisó el directorio)
+        self.escritos = None
+
+    def ruta_cache(self, ruta, tamano, modo):
+        info = os.stat(ruta)
+        clave = f"{os.path.abspath(ruta)}|{info.st_mtime_ns}|{tamano[0]}x{tamano[1]}|{modo}"
+        return os.path.join(self.directorio, hashlib.sha1(clave.encode("utf-8")).hexdigest() + ".png")
+
+    def obtener(self, ruta, tamano, modo="thumbnail"):
+        """Devuelve la miniatura guardada o None si no existe o la imagen cambió"""
+        try:
+            destino = self.ruta_cache(ruta, tamano, modo)
+            if os.path.exists(destino):
+                imagen = Image.open(destino)
+                imagen.load()
+                # La fecha de modificación hace de fecha de último uso para la limpieza
+                os.utime(destino)
+                return imagen
+        except OSError:
+            pass
+        return None
+
+    def generar(self, ruta, tamano, modo="thumbnail"):
+        """Crea la miniatura con calidad final (LANCZOS) y la guarda en la cache"""
+        imagen = abrir_reducida(ruta, tamano)
+        imagen = ajustar(imagen, tamano, modo, Image.Resampling.LANCZOS)
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            destino = self.ruta_cache(ruta, tamano, modo)
+            imagen.save(destino + ".tmp", format="PNG")
+            os.replace(destino + ".tmp", destino)
+            self.anotar_escritura(os.path.getsize(destino))
+        except OSError as e:
+            print(f"Error guardando miniatura: {e}")
+        return imagen
+
+    def anotar_escritura(self, tamano):
+        # Se revisa el directorio la primera vez y después cada 1/20 del máximo escrito
+        if self.escritos is not None:
+            self.escritos += tamano
+            if self.escritos < self.max_bytes // 20:
+                return
+        self.limpiar()
+
+    def limpiar(self):
+        """Borra las miniaturas usadas hace más tiempo si la cache pasa de max_bytes; devuelve los bytes que quedan"""
+        self.escritos = 0
+        entradas = []
+        try:
+            with os.scandir(self.directorio) as contenido:
+                for entrada in contenido:
+                    if entrada.is_file() and entrada.name.endswith(".png"):
+                        info = entrada.stat()
+                        entradas.append((entrada.path, info.st_size, info.st_mtime))
+        except OSError:
+            return 0
+        return liberar_espacio(entradas, self.max_bytes)
+
+    def precalentar(self, rutas, tamano, modo="thumbnail"):
+        """Genera en segundo plano las miniaturas que falten (por ejemplo, de archivos recientes)"""
+        def trabajar():
+            for ruta in rutas:
+                try:
+                    if os.path.exists(ruta) and self.obtener(ruta, tamano, modo) is None:
+                        self.generar(ruta, tamano, modo)
+                except Exception as e:
+                    print(f"Error generando miniatura de {ruta}: {e}")
+        hilo = threading.Thread(target=trabajar, daemon=True)
+        hilo.start()
+        return hilo
+
+
+class CargaProgresiva:
+    """Muestra primero una vista previa rápida y luego la versión final refinada en segundo plano.
+
+    `al_listo(imagen_pil, final)` se llama siempre en el hilo de Tk: una vez con la
+    vista previa (final=False) y otra con la imagen final (final=True). Si la
+    miniatura ya está en la cache, se llama una sola vez con final=True.
+    """
+
+    def __init__(self, widget, ruta, tamano, al_listo, modo="thumbnail", cache=None):
+        self.widget = widget
+        self.al_listo = al_listo
+        self.cancelada = False
+        self.resultado = queue.Queue()
+        cache = cache or CacheMiniaturas()
+
+        guardada = cache.obtener(ruta, tamano, modo)
+        if guardada is not None:
+            al_listo(guardada, True)
+            return
+
+        # Vista previa: decodificación reducida por draft() y filtro rápido
+        previa = ajustar(abrir_reducida(ruta, tamano), tamano, modo, Image.Resampling.BILINEAR)
+        al_listo(previa, False)
+
+        def refinar():
+            try:
+                self.resultado.put(cache.generar(ruta, tamano, modo))
+            except Exception as e:
+                self.resultado.put(e)
+
+        threading.Thread(target=refinar, daemon=True).start()
+        self.widget.after(INTERVALO_SONDEO_MS, self.revisar)
+
+    def revisar(self):
+        if self.cancelada:
+            return
+        try:
+            final = self.resultado.get_nowait()
+        except queue.Empty:
+            self.widget.after(INTERVALO_SONDEO_MS, self.revisar)
+            return
+        if isinstance(final, Exception):
+            print(f"Error refinando imagen: {final}")
+            return
+        self.al_listo(final, True)
+
+    def cancelar(self):
+        """Descarta el refinado pendiente (por ejemplo, si se cargó otra imagen)"""
+        self.cancelada = True
@@ -5,19 +5,27 @@ import numpy as np
 import mediapipe as mp
 from PIL import Image, ImageTk
 import os
+from archivo_landmarks import ArchivoLandmarks
+from busqueda_poses import IndicePoses
+from planificador import detectar_pose, planificador_compartido
+from filtro_calidad import MOTIVOS
+# Análisis sin interfaz compartido con autocalibracion y vigilar_carpeta
+from analisis_imagen import LATENCY_BUDGET_MS, POSE_BACKEND, analyze_image, filtro_calidad  # noqa: F401
+from cache_miniaturas import CacheMiniaturas, CargaProgresiva
+from sesiones import EXTENSION, TIPOS_ARCHIVO, abrir_sesion, guardar_sesion
+# Proporciones y calibración compartidas con los procesos sin interfaz
+from proporciones import (CALIBRATION, CALIBRATION_GROUPS, DEFAULT_CALIBRATION, HEALTHY_PROPORTIONS,  # noqa: F401
+                          calculate_proportions_array, compare_proportions)
+
+# Hilos de inferencia compartidos con los trabajos por lotes y cada cuánto se revisa el análisis pendiente
+INFERENCE_WORKERS = 2
+ANALYSIS_POLL_MS = 30
 
 # Inicializar MediaPipe
 mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(static_image_mode=True, min_detection_confidence=0.5)
 
-# Proporciones corporales saludables promedio
-HEALTHY_PROPORTIONS = {
-    'head_to_body': 1/7.5,
-    'shoulder_to_waist': 1.6,
-    'arm_to_body': 0.4,
-    'leg_to_body': 0.5,
-    'waist_to_hip': 0.75
-}
+# Filtro de calidad previo a la inferencia, el mismo que usa analyze_image
+quality_gate = filtro_calidad()
 
 class PostureAnalyzer(tk.Tk):
     def __init__(self):
@@ -30,14 +38,19 @@ class PostureAnalyzer(tk.Tk):
         self.image_path = None
         self.landmarks = None
         self.proportions = {}
-        self.calibration_factors = {
-            'head': 1.0,
-            'shoulders': 1.0,
-            'waist': 1.0,
-            'hips': 1.0,
-            'knees': 1.0,
-            'ankles': 1.0
-        }
+        # Factores del último ajuste de autocalibracion.py (calibracion.json), si existe
+        self.calibration_factors = dict(CALIBRATION)
+        
+        self.archive = ArchivoLandmarks()
+        self.archive_record = None
+        self.inference_info = None
+        self.thumbnail_cache = CacheMiniaturas()
+        self.image_load = None
+        self.display_image_pil = None
+        self.similarity_index = IndicePoses(self.archive)
+        self.scheduler = planificador_compartido(INFERENCE_WORKERS, backend=POSE_BACKEND,
+                                                 latency_budget_ms=LATENCY_BUDGET_MS, min_detection_confidence=0.5)
+        self.analysis_job = None
         
         self.create_widgets()
     
@@ -52,6 +65,8 @@ class PostureAnalyzer(tk.Tk):
         
         ttk.Button(btn_frame, text="Cargar Imagen", command=self.load_image_dialog).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="Analizar Postura", command=self.analyze_and_show).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="Guardar Sesión", command=self.save_session_dialog).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="Abrir Sesión", command=self.open_session_dialog).pack(side='left', padx=5)
         
         # Frame para la imagen
         self.image_frame = ttk.LabelFrame(main_frame, text="Imagen")
@@ -80,21 +95,104 @@ class PostureAnalyzer(tk.Tk):
                 messagebox.showerror("Error", f"Error al cargar la imagen: {str(e)}")
     
     def display_image(self, image_path):
-        image = Image.open(image_path)
-        # Redimensionar manteniendo proporción
+        # Redimensionar manteniendo proporción: vista previa inmediata y versión final en segundo plano
         display_size = (600, 400)
-        image.thumbnail(display_size, Image.Resampling.LANCZOS)
+        if self.image_load is not None:
+            self.image_load.cancelar()
+        self.image_load = CargaProgresiva(self, image_path, display_size, self.set_display_image,
+                                          modo="thumbnail", cache=self.thumbnail_cache)
+    
+    def set_display_image(self, image, final):
+        self.display_image_pil = image
+        # Con el mismo tamaño se reutiliza la PhotoImage actual en lugar de crear otra imagen Tk
+        photo = getattr(self.image_label, 'image', None)
+        if photo is not None and (photo.width(), photo.height()) == image.size:
+            photo.paste(image)
+            return
         photo = ImageTk.PhotoImage(image)
         self.image_label.configure(image=photo)
         self.image_label.image = photo
     
+    def save_session_dialog(self):
+        if self.display_image_pil is None:
+            messagebox.showwarning("Advertencia", "Por favor, cargue una imagen primero")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=EXTENSION, filetypes=TIPOS_ARCHIVO)
+        if file_path:
+            try:
+                self.save_session(file_path)
+            except Exception as e:
+                messagebox.showerror("Error", f"Error al guardar la sesión: {str(e)}")
+    
+    def save_session(self, file_path):
+        """Guarda la imagen mostrada, los landmarks, la calibración y las proporciones"""
+        guardar_sesion(file_path, {
+            'display_image': np.asarray(self.display_image_pil.convert("RGB")),
+            'landmarks': self.landmarks
+        }, {
+            'image_path': self.image_path,
+            'calibration_factors': self.calibration_factors,
+            'proportions': self.proportions,
+            'archive_record': self.archive_record,
+            'model': self.inference_info
+        })
+    
+    def open_session_dialog(self):
+        file_path = filedialog.askopenfilename(filetypes=TIPOS_ARCHIVO)
+        if file_path:
+            try:
+                self.open_session(file_path)
+            except Exception as e:
+                messagebox.showerror("Error", f"Error al abrir la sesión: {str(e)}")
+    
+    def open_session(self, file_path):
+        """Restaura un análisis guardado sin decodificar la imagen original ni ejecutar el modelo"""
+        arrays, data = abrir_sesion(file_path)
+        if self.image_load is not None:
+            self.image_load.cancelar()
+        self.image_path = data.get('image_path')
+        self.landmarks = arrays.get('landmarks')
+        self.calibration_factors = dict(DEFAULT_CALIBRATION, **data.get('calibration_factors', {}))
+        self.proportions = data.get('proportions') or {}
+        self.archive_record = data.get('archive_record')
+        self.inference_info = data.get('model')
+        self.set_display_image(Image.fromarray(arrays['display_image']), True)
+        self.show_results(self.generate_report())
+    
     def analyze_and_show(self):
         if not self.image_path:
             messagebox.showwarning("Advertencia", "Por favor, cargue una imagen primero")
             return
             
+        image = cv2.imread(self.image_path)
+        if image is None:
+            messagebox.showerror("Error", "Error en el análisis: No se pudo leer la imagen")
+            return
+        # Sólo cuenta como rechazada si el usuario decide no analizarla
+        quality = quality_gate.evaluar(image, registrar=False)
+        if not quality['apta']:
+            reasons = "\n".join(f"- {MOTIVOS[reason]}" for reason in quality['motivos'])
+            if not messagebox.askyesno("Calidad de imagen",
+                                       f"La imagen probablemente no sirva para el análisis:\n{reasons}\n\n"
+                                       "¿Analizar de todos modos?"):
+                quality_gate.registrar_rechazo(quality)
+                return
+        # El análisis corre en los hilos de inferencia con prioridad interactiva, por
+        # delante de los lotes; la ventana sigue respondiendo mientras tanto
+        if self.analysis_job is not None:
+            self.analysis_job.cancel()
+        self.analysis_job = self.scheduler.enviar("interactivo", detectar_pose, image)
+        self.after(ANALYSIS_POLL_MS, self.check_analysis, self.analysis_job)
+    
+    def check_analysis(self, job):
+        if job is not self.analysis_job or job.cancelled():
+            return
+        if not job.done():
+            self.after(ANALYSIS_POLL_MS, self.check_analysis, job)
+            return
+        self.analysis_job = None
         try:
-            self.analyze_posture()
+            self.apply_analysis(*job.result())
             report = self.generate_report()
             self.show_results(report)
         except Exception as e:
@@ -112,7 +210,24 @@ class PostureAnalyzer(tk.Tk):
             self.results_text.insert(tk.END, f"{key}:\n")
             self.results_text.insert(tk.END, f"  Tu medida: {data['yours']:.3f}\n")
             self.results_text.insert(tk.END, f"  Medida saludable: {data['healthy']:.3f}\n")
-            self.results_text.insert(tk.END, f"  Diferencia: {data['percentage']:.1f}%\n\n")
+            self.results_text.insert(tk.END, f"  Diferencia: {data['percentage']:.1f}%\n")
+            if data.get('percentile') is not None:
+                self.results_text.insert(tk.END, f"  Percentil poblacional: {data['percentile']:.0f}\n")
+            self.results_text.insert(tk.END, "\n")
+        
+        if report.get('model'):
+            model = report['model']
+            if model.get('backend') == 'onnx':
+                self.results_text.insert(tk.END, f"MODELO: ONNX Runtime{' int8' if model.get('int8') else ''} "
+                                                 f"({model['timings_ms']['onnx']:.0f} ms por imagen)\n\n")
+            else:
+                timings = ", ".join(f"nivel {tier}: {ms:.0f} ms" for tier, ms in model['timings_ms'].items())
+                self.results_text.insert(tk.END, f"MODELO: nivel de complejidad {model['tier']} ({timings})\n\n")
+        
+        if report.get('similar'):
+            self.results_text.insert(tk.END, "ANÁLISIS ANTERIORES MÁS PARECIDOS\n\n")
+            for match in report['similar']:
+                self.results_text.insert(tk.END, f"  #{match['record']} {match['image_path']} (distancia {match['distance']:.3f})\n")
 
     # [Mantener los métodos anteriores sin cambios]
     def analyze_posture(self):
@@ -123,48 +238,43 @@ class PostureAnalyzer(tk.Tk):
         image = cv2.imread(self.image_path)
         if image is None:
             raise ValueError("No se pudo leer la imagen")
+        quality_gate.verificar(image)
             
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = pose.process(image_rgb)
-        
-        if not results.pose_landmarks:
+        return self.apply_analysis(*self.scheduler.enviar("interactivo", detectar_pose, image).result())
+    
+    def apply_analysis(self, landmarks, inference_info):
+        """Toma el resultado de la inferencia, calcula las proporciones y lo guarda en el archivo"""
+        if inference_info:
+            quality_gate.registrar_inferencia(inference_info['total_ms'])
+        if landmarks is None:
             raise ValueError("No se detectó postura en la imagen")
             
-        self.landmarks = results.pose_landmarks.landmark
+        self.landmarks = landmarks
+        self.inference_info = inference_info
         self.calculate_proportions()
+        self.store_landmarks()
         return self.proportions
     
+    def store_landmarks(self):
+        """Guarda los landmarks del análisis en el archivo para recargarlos sin inferencia"""
+        try:
+            self.archive_record = self.archive.agregar(self.landmarks, {
+                'image_path': self.image_path,
+                'proportions': self.proportions,
+                'calibration': self.calibration_factors,
+                'model': self.inference_info
+            })
+        except Exception as e:
+            self.archive_record = None
+            print(f"Error guardando landmarks: {e}")
+    
     def calculate_proportions(self):
         """Calcula las proporciones corporales"""
-        if not self.landmarks:
+        if self.landmarks is None:
             return
             
-        # [Resto del método igual que antes]
-        head = self.get_landmark_point(mp_pose.PoseLandmark.NOSE)
-        neck = self.get_landmark_point(mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.RIGHT_SHOULDER)
-        shoulder_left = self.get_landmark_point(mp_pose.PoseLandmark.LEFT_SHOULDER)
-        shoulder_right = self.get_landmark_point(mp_pose.PoseLandmark.RIGHT_SHOULDER)
-        waist = self.get_landmark_point(mp_pose.PoseLandmark.LEFT_HIP, mp_pose.PoseLandmark.RIGHT_HIP)
-        hip_left = self.get_landmark_point(mp_pose.PoseLandmark.LEFT_HIP)
-        hip_right = self.get_landmark_point(mp_pose.PoseLandmark.RIGHT_HIP)
-        knee_left = self.get_landmark_point(mp_pose.PoseLandmark.LEFT_KNEE)
-        knee_right = self.get_landmark_point(mp_pose.PoseLandmark.RIGHT_KNEE)
-        ankle_left = self.get_landmark_point(mp_pose.PoseLandmark.LEFT_ANKLE)
-        ankle_right = self.get_landmark_point(mp_pose.PoseLandmark.RIGHT_ANKLE)
-        
-        # Calcular distancias
-        head_height = self.distance(head, neck)
-        torso_height = self.distance(neck, waist)
-        full_height = self.distance(head, ankle_left)
-        
-        # Calcular proporciones
-        self.proportions = {
-            'head_to_body': head_height / full_height,
-            'shoulder_to_waist': self.distance(shoulder_left, shoulder_right) / self.distance(waist, neck),
-            'arm_to_body': self.distance(shoulder_left, knee_left) / full_height,
-            'leg_to_body': self.distance(waist, ankle_left) / full_height,
-            'waist_to_hip': self.distance(waist, hip_left) / self.distance(hip_left, knee_left)
-        }
+        proportions = calculate_proportions_array(self.landmarks, self.calibration_factors)
+        self.proportions = {key: float(value) for key, value in proportions.items()}
         return self.proportions
 
     def get_landmark_point(self, *landmarks):
@@ -175,24 +285,17 @@ class PostureAnalyzer(tk.Tk):
         for landmark in landmarks:
             lm = self.landmarks[landmark.value]
             factor = self.get_calibration_factor(landmark.value)
-            x += lm.x * factor
-            y += lm.y * factor
+            x += lm[0] * factor
+            y += lm[1] * factor
             count += 1
         
         return (x / count, y / count)
     
     def get_calibration_factor(self, landmark_value):
         """Obtiene el factor de calibración para un landmark específico"""
-        if landmark_value in [mp_pose.PoseLandmark.NOSE.value]:
-            return self.calibration_factors['head']
-        elif landmark_value in [mp_pose.PoseLandmark.LEFT_SHOULDER.value, mp_pose.PoseLandmark.RIGHT_SHOULDER.value]:
-            return self.calibration_factors['shoulders']
-        elif landmark_value in [mp_pose.PoseLandmark.LEFT_HIP.value, mp_pose.PoseLandmark.RIGHT_HIP.value]:
-            return self.calibration_factors['hips']
-        elif landmark_value in [mp_pose.PoseLandmark.LEFT_KNEE.value, mp_pose.PoseLandmark.RIGHT_KNEE.value]:
-            return self.calibration_factors['knees']
-        elif landmark_value in [mp_pose.PoseLandmark.LEFT_ANKLE.value, mp_pose.PoseLandmark.RIGHT_ANKLE.value]:
-            return self.calibration_factors['ankles']
+        group = CALIBRATION_GROUPS.get(landmark_value)
+        if group:
+            return self.calibration_factors[group]
         return 1.0
     
     def distance(self, point1, point2):
@@ -203,19 +306,22 @@ class PostureAnalyzer(tk.Tk):
         """Compara las proporciones con los promedios saludables"""
         if not self.proportions:
             return None
-            
-        comparison = {}
-        for key, value in self.proportions.items():
-            healthy = HEALTHY_PROPORTIONS[key]
-            difference = value - healthy
-            percentage = (difference / healthy) * 100
-            comparison[key] = {
-                'yours': value,
-                'healthy': healthy,
-                'difference': difference,
-                'percentage': percentage
-            }
-        return comparison
+        return compare_proportions(self.proportions)
+    
+    def find_similar(self, k=5):
+        """Busca los análisis guardados cuya pose se parece más a la actual"""
+        if self.landmarks is None:
+            return []
+        try:
+            self.similarity_index.sincronizar()
+            matches = self.similarity_index.buscar(self.landmarks, k=k, excluir=self.archive_record)
+        except Exception as e:
+            print(f"Error buscando poses similares: {e}")
+            return []
+        return [
+            {'record': record, 'distance': distance, 'image_path': self.similarity_index.reportes.get(record)}
+            for record, distance in matches
+        ]
     
     def generate_report(self):
         """Genera un reporte completo del análisis"""
@@ -227,7 +333,10 @@ class PostureAnalyzer(tk.Tk):
             'image_path': self.image_path,
             'proportions': self.proportions,
             'comparison': comparison,
-            'calibration': self.calibration_factors
+            'calibration': self.calibration_factors,
+            'archive_record': self.archive_record,
+            'model': self.inference_info,
+            'similar': self.find_similar()
         }
         return report
 
@@ -4,8 +4,11 @@ from tkinter import messagebox
 from PIL import Image, ImageTk
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from referencia_poblacion import cargar_referencia
+from sesiones import EXTENSION, TIPOS_ARCHIVO, abrir_sesion, guardar_sesion
+from motor_siluetas import silueta
 
 class App:
     def __init__(self, master):
@@ -16,14 +19,18 @@ class App:
         self.imagen_tk = None
         self.proporciones = None
         self.puntos_calibracion = []
+        self.ventana_comparacion = None
+        self.item_imagen = None
 
         # Frame para la imagen
         self.frame_imagen = tk.LabelFrame(master, text="Imagen de Perfil")
         self.frame_imagen.pack(padx=10, pady=10)
 
-        self.label_imagen = tk.Label(self.frame_imagen)
-        self.label_imagen.pack()
-        self.label_imagen.bind("<Button-1>", self.seleccionar_punto_calibracion)
+        # Canvas por capas: la imagen se dibuja una vez y los puntos de calibración
+        # son ítems livianos encima, así cada clic no vuelve a convertir la imagen
+        self.canvas_imagen = tk.Canvas(self.frame_imagen, width=400, height=300, highlightthickness=0)
+        self.canvas_imagen.pack()
+        self.canvas_imagen.bind("<Button-1>", self.seleccionar_punto_calibracion)
 
         # Frame para los botones
         self.frame_botones = tk.Frame(master)
@@ -41,6 +48,12 @@ class App:
         self.btn_calibrar = tk.Button(self.frame_botones, text="Calibrar Manualmente", command=self.iniciar_calibracion, state=tk.DISABLED)
         self.btn_calibrar.pack(side=tk.LEFT, padx=5)
 
+        self.btn_guardar_sesion = tk.Button(self.frame_botones, text="Guardar Sesión", command=self.guardar_sesion, state=tk.DISABLED)
+        self.btn_guardar_sesion.pack(side=tk.LEFT, padx=5)
+
+        self.btn_abrir_sesion = tk.Button(self.frame_botones, text="Abrir Sesión", command=self.abrir_sesion)
+        self.btn_abrir_sesion.pack(side=tk.LEFT, padx=5)
+
         # Frame para información/resultados
         self.frame_resultados = tk.LabelFrame(master, text="Resultados")
         self.frame_resultados.pack(padx=10, pady=10)
@@ -60,38 +73,93 @@ class App:
                 self.proporciones = None
                 self.btn_comparar.config(state=tk.DISABLED)
                 self.btn_calibrar.config(state=tk.NORMAL)
+                self.btn_guardar_sesion.config(state=tk.NORMAL)
                 self.puntos_calibracion = []
+                self.canvas_imagen.delete("punto_calibracion")
             except Exception as e:
                 messagebox.showerror("Error", f"No se pudo cargar la imagen: {e}")
                 self.imagen_original = None
                 self.imagen_tk = None
-                self.label_imagen.config(image=None)
+                self.canvas_imagen.delete("all")
+                self.item_imagen = None
                 self.btn_analizar.config(state=tk.DISABLED)
                 self.btn_comparar.config(state=tk.DISABLED)
                 self.btn_calibrar.config(state=tk.DISABLED)
+                self.btn_guardar_sesion.config(state=tk.DISABLED)
                 self.label_resultados.config(text="Error al cargar la imagen.")
 
+    def guardar_sesion(self):
+        """Guarda la imagen, los puntos de calibración y las proporciones en un archivo de sesión."""
+        if self.imagen_original is None:
+            return
+        ruta = filedialog.asksaveasfilename(defaultextension=EXTENSION, filetypes=TIPOS_ARCHIVO)
+        if ruta:
+            try:
+                guardar_sesion(ruta, {
+                    "imagen": self.imagen_original,
+                    "puntos_calibracion": np.array(self.puntos_calibracion, dtype=np.int32).reshape(-1, 2)
+                }, {"proporciones": self.proporciones})
+            except Exception as e:
+                messagebox.showerror("Error", f"No se pudo guardar la sesión: {e}")
+
+    def abrir_sesion(self):
+        """Reabre una sesión guardada sin volver a leer ni analizar la imagen."""
+        ruta = filedialog.askopenfilename(filetypes=TIPOS_ARCHIVO)
+        if not ruta:
+            return
+        try:
+            arreglos, datos = abrir_sesion(ruta)
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo abrir la sesión: {e}")
+            return
+        self.imagen_original = arreglos["imagen"]
+        self.puntos_calibracion = [(int(x), int(y)) for x, y in arreglos["puntos_calibracion"]]
+        self.proporciones = datos.get("proporciones")
+        self.mostrar_imagen(self.imagen_original)
+        self.canvas_imagen.delete("punto_calibracion")
+        for px, py in self.puntos_calibracion:
+            self.dibujar_punto(px, py)
+        self.btn_analizar.config(state=tk.NORMAL)
+        self.btn_calibrar.config(state=tk.NORMAL)
+        self.btn_guardar_sesion.config(state=tk.NORMAL)
+        self.btn_comparar.config(state=tk.NORMAL if self.proporciones else tk.DISABLED)
+        if self.proporciones:
+            self.label_resultados.config(text=f"Proporción estimada altura/ancho: {self.proporciones['proporcion_altura_ancho']:.2f}")
+        else:
+            self.label_resultados.config(text="Sesión cargada.")
+
     def mostrar_imagen(self, imagen_cv2):
+        """Actualiza la capa base del canvas; los puntos dibujados encima se conservan"""
         imagen_rgb = cv2.cvtColor(imagen_cv2, cv2.COLOR_BGR2RGB)
         imagen_pil = Image.fromarray(imagen_rgb)
+        # Si el tamaño no cambia se reutiliza la PhotoImage en lugar de crear otra imagen Tk
+        if self.imagen_tk is not None and (self.imagen_tk.width(), self.imagen_tk.height()) == imagen_pil.size:
+            self.imagen_tk.paste(imagen_pil)
+            return
         self.imagen_tk = ImageTk.PhotoImage(imagen_pil)
-        self.label_imagen.config(image=self.imagen_tk)
+        self.canvas_imagen.config(width=imagen_pil.width, height=imagen_pil.height)
+        if self.item_imagen is None:
+            self.item_imagen = self.canvas_imagen.create_image(0, 0, anchor=tk.NW, image=self.imagen_tk)
+        else:
+            self.canvas_imagen.itemconfig(self.item_imagen, image=self.imagen_tk)
+        self.canvas_imagen.tag_lower(self.item_imagen)
+
+    def dibujar_punto(self, x, y):
+        self.canvas_imagen.create_oval(x - 5, y - 5, x + 5, y + 5, fill="#00ff00", outline="",
+                                       tags="punto_calibracion")
 
     def detectar_postura_proporciones(self, imagen):
         """Implementación básica de detección de postura y proporciones (similar a la versión no-GUI)."""
         if imagen is None:
             return None
 
-        gray = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
-        _, thresh = cv2.threshold(gray, 128, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        contornos, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        caja, _ = silueta(imagen)
 
         imagen_con_deteccion = imagen.copy()
         proporciones = None
 
-        if contornos:
-            mayor_contorno = max(contornos, key=cv2.contourArea)
-            x, y, w, h = cv2.boundingRect(mayor_contorno)
+        if caja is not None:
+            x, y, w, h = caja
             cv2.rectangle(imagen_con_deteccion, (x, y), (x + w, y + h), (0, 255, 0), 2)
             proporcion_altura_ancho = h / w if w > 0 else 0
             proporciones = {"altura": h, "ancho": w, "proporcion_altura_ancho": proporcion_altura_ancho}
@@ -118,12 +186,21 @@ class App:
         proporcion_detectada = proporciones.get("proporcion_altura_ancho")
 
         if proporcion_detectada is not None:
-            fig, ax = plt.subplots(figsize=(6, 4))
+            titulo = 'Comparación de Proporciones'
+            referencia = cargar_referencia()
+            if referencia is not None and referencia.tabla("proporcion_altura_ancho") is not None:
+                promedio_saludable_altura_ancho = referencia.mediana("proporcion_altura_ancho")
+                percentil = referencia.percentil("proporcion_altura_ancho", proporcion_detectada)
+                titulo += f' (percentil {percentil:.0f})'
+
+            # Figure sin pyplot: pyplot guarda todas las figuras creadas hasta que se cierran
+            fig = Figure(figsize=(6, 4))
+            ax = fig.add_subplot(111)
             bar_labels = ['Detectada', 'Saludable']
             bar_values = [proporcion_detectada, promedio_saludable_altura_ancho]
             ax.bar(bar_labels, bar_values, color=['blue', 'green'])
             ax.set_ylabel('Proporción Altura/Ancho')
-            ax.set_title('Comparación de Proporciones')
+            ax.set_title(titulo)
             return fig
         return None
 
@@ -131,8 +208,13 @@ class App:
         if self.proporciones:
             fig = self.comparar_con_promedios_saludables(self.proporciones)
             if fig:
-                top_level = tk.Toplevel(self.master)
-                top_level.title("Comparación con Promedios")
+                # Se reutiliza la ventana de comparación en lugar de abrir una nueva cada vez
+                if self.ventana_comparacion is None or not self.ventana_comparacion.winfo_exists():
+                    self.ventana_comparacion = tk.Toplevel(self.master)
+                    self.ventana_comparacion.title("Comparación con Promedios")
+                for widget in self.ventana_comparacion.winfo_children():
+                    widget.destroy()
+                top_level = self.ventana_comparacion
                 canvas = FigureCanvasTkAgg(fig, master=top_level)
                 canvas_widget = canvas.get_tk_widget()
                 canvas_widget.pack()
@@ -145,24 +227,22 @@ class App:
     def iniciar_calibracion(self):
         if self.imagen_original is not None:
             self.puntos_calibracion = []
+            self.canvas_imagen.delete("punto_calibracion")
             messagebox.showinfo("Calibración", "Haz clic en puntos clave de la imagen (ej., cabeza, hombros, caderas, pies).")
-            self.label_imagen.config(cursor="crosshair")
+            self.canvas_imagen.config(cursor="crosshair")
             self.master.bind("<KeyRelease>", self.finalizar_calibracion)
         else:
             messagebox.showinfo("Advertencia", "Por favor, carga una imagen primero.")
 
     def seleccionar_punto_calibracion(self, event):
-        if self.imagen_original is not None and self.label_imagen.cget("cursor") == "crosshair":
+        if self.imagen_original is not None and self.canvas_imagen.cget("cursor") == "crosshair":
             x, y = event.x, event.y
             self.puntos_calibracion.append((x, y))
-            imagen_con_puntos = self.imagen_original.copy()
-            for px, py in self.puntos_calibracion:
-                cv2.circle(imagen_con_puntos, (px, py), 5, (0, 255, 0), -1)
-            self.mostrar_imagen(imagen_con_puntos)
+            self.dibujar_punto(x, y)
 
     def finalizar_calibracion(self, event):
-        if event.keysym == 'Return' and self.label_imagen.cget("cursor") == "crosshair":
-            self.label_imagen.config(cursor="")
+        if event.keysym == 'Return' and self.canvas_imagen.cget("cursor") == "crosshair":
+            self.canvas_imagen.config(cursor="")
             self.master.unbind("<KeyRelease>")
             if self.puntos_calibracion:
                 messagebox.showinfo("Calibración", f"Puntos de calibración seleccionados: {self.puntos_calibracion}. La lógica para usar estos puntos aún no está implementada.")
@@ -1,14 +1,32 @@
+import os
 import tkinter as tk
 from tkinter import filedialog
-from PIL import Image, ImageTk
+from PIL import Image
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import mediapipe as mp
+from archivo_landmarks import ArchivoLandmarks
+from referencia_poblacion import cargar_referencia
+from motor_pose import BACKEND_POR_DEFECTO
+from planificador import detectar_pose, planificador_compartido
+from cache_miniaturas import CacheMiniaturas
+from sesiones import EXTENSION, TIPOS_ARCHIVO, abrir_sesion, guardar_sesion
+from visor_piramide import VisorPiramide
 
 mp_pose = mp.solutions.pose
 
+# Presupuesto de latencia por análisis en milisegundos (None = sin límite)
+LATENCY_BUDGET_MS = 1500
+
+# Backend de inferencia de pose: "mediapipe" o "onnx" (variable de entorno POSE_BACKEND)
+POSE_BACKEND = BACKEND_POR_DEFECTO
+
+# Hilos de inferencia compartidos con los trabajos por lotes y cada cuánto se revisa el análisis pendiente
+INFERENCE_WORKERS = 2
+ANALYSIS_POLL_MS = 30
+
 class PostureAnalyzerApp:
     def __init__(self, root):
         self.root = root
@@ -17,13 +35,21 @@ class PostureAnalyzerApp:
         # Variables
         self.image_path = None
         self.landmarks = []
-        self.draggable_points = []
+        self.point_items = []
         self.calibration_mode = False
         self.healthy_avg = {
             'hombros': 0.25,    # Proporción promedio saludable (25% de la altura)
             'cintura': 0.5,     # 50% de la altura
             'cadera': 0.55      # 55% de la altura
         }
+        self.archive = ArchivoLandmarks()
+        self.thumbnail_cache = CacheMiniaturas()
+        self.scheduler = planificador_compartido(INFERENCE_WORKERS, backend=POSE_BACKEND,
+                                                 latency_budget_ms=LATENCY_BUDGET_MS, min_detection_confidence=0.5)
+        self.analysis_job = None
+        self.inference_info = None
+        self.comparison_figure = None
+        self.comparison_canvas = None
         
         # GUI Elements
         self.create_widgets()
@@ -45,9 +71,21 @@ class PostureAnalyzerApp:
         self.btn_compare = tk.Button(top_frame, text="Mostrar Comparación", command=self.show_comparison)
         self.btn_compare.pack(side=tk.LEFT, padx=5)
         
+        self.btn_save_session = tk.Button(top_frame, text="Guardar Sesión", command=self.save_session)
+        self.btn_save_session.pack(side=tk.LEFT, padx=5)
+        
+        self.btn_open_session = tk.Button(top_frame, text="Abrir Sesión", command=self.open_session)
+        self.btn_open_session.pack(side=tk.LEFT, padx=5)
+        
         # Canvas para imagen
         self.canvas = tk.Canvas(self.root, width=600, height=500)
         self.canvas.pack(pady=10)
+        # Un solo binding para todos los puntos arrastrables (un tag_bind por punto crea
+        # un comando Tcl nuevo en cada calibración que no se libera al borrar el punto)
+        self.canvas.tag_bind('draggable', '<B1-Motion>', self.drag_current_point)
+        # Zoom con la rueda y desplazamiento con el botón derecho; los landmarks se
+        # guardan en coordenadas de la imagen completa y el visor los lleva al canvas
+        self.viewer = VisorPiramide(self.canvas, al_cambiar=self.update_points, cache=self.thumbnail_cache)
         
         # Frame para gráfico
         self.chart_frame = tk.Frame(self.root)
@@ -59,41 +97,132 @@ class PostureAnalyzerApp:
             self.show_image()
             
     def show_image(self):
-        self.img = Image.open(self.image_path)
-        self.img = self.img.resize((600, 500), Image.Resampling.LANCZOS)
-        self.tkimg = ImageTk.PhotoImage(self.img)
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.tkimg)
+        # El análisis de la foto anterior no se dibuja sobre la nueva: los landmarks
+        # aparecen cuando check_analysis entrega los de esta imagen
+        self.reset_analysis()
+        # Vista previa de la cache de miniaturas y pirámide de teselas para el zoom en segundo plano
+        self.viewer.cargar(self.image_path)
+
+    def reset_analysis(self):
+        # Descarta el análisis pendiente y el resultado de la imagen anterior
+        if self.analysis_job is not None:
+            self.analysis_job.cancel()
+            self.analysis_job = None
+        self.landmarks = []
+        self.inference_info = None
+        if hasattr(self, 'proporciones'):
+            del self.proporciones
+        self.draw_landmarks()
         
     def process_image(self):
-        with mp_pose.Pose(static_image_mode=True, min_detection_confidence=0.5) as pose:
-            image = cv2.imread(self.image_path)
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            results = pose.process(image_rgb)
-            
-            if results.pose_landmarks:
-                self.landmarks = self.extract_landmarks(results, image.shape)
-                self.draw_landmarks(image)
-                self.calculate_proportions()
+        image = cv2.imread(self.image_path)
+        # La inferencia corre en los hilos compartidos con prioridad interactiva, sobre
+        # el recorte de la persona; los landmarks vuelven en coordenadas de la imagen completa
+        if self.analysis_job is not None:
+            self.analysis_job.cancel()
+        self.analysis_job = self.scheduler.enviar("interactivo", detectar_pose, image)
+        self.root.after(ANALYSIS_POLL_MS, self.check_analysis, self.analysis_job, image)
+        
+    def check_analysis(self, job, image):
+        if job is not self.analysis_job or job.cancelled():
+            return
+        if not job.done():
+            self.root.after(ANALYSIS_POLL_MS, self.check_analysis, job, image)
+            return
+        self.analysis_job = None
+        try:
+            landmarks, self.inference_info = job.result()
+        except Exception as e:
+            print(f"Error en el análisis: {e}")
+            return
+        
+        if landmarks is not None:
+            self.landmarks = self.extract_landmarks(landmarks, image.shape)
+            self.draw_landmarks()
+            self.calculate_proportions()
+            self.store_landmarks(landmarks)
                 
-    def extract_landmarks(self, results, img_shape):
-        landmarks = []
-        for lm in results.pose_landmarks.landmark:
-            x = int(lm.x * img_shape[1])
-            y = int(lm.y * img_shape[0])
-            landmarks.append((x, y))
-        return landmarks
+    def extract_landmarks(self, landmarks, img_shape):
+        result = []
+        for lm in landmarks:
+            x = int(lm[0] * img_shape[1])
+            y = int(lm[1] * img_shape[0])
+            result.append((x, y))
+        return result
     
-    def draw_landmarks(self, image):
-        h, w = image.shape[:2]
-        for point in self.landmarks:
-            cv2.circle(image, point, 5, (0,255,0), -1)
-        
-        # Convertir a formato Tkinter
-        img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        self.img = Image.fromarray(img).resize((600, 500))
-        self.tkimg = ImageTk.PhotoImage(self.img)
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.tkimg)
+    def store_landmarks(self, landmarks):
+        # Guardar los landmarks normalizados para poder recargar el análisis sin inferencia
+        try:
+            self.archive.agregar(landmarks, {
+                'image_path': self.image_path,
+                'proportions': getattr(self, 'proporciones', None),
+                'model': self.inference_info
+            })
+        except Exception as e:
+            print(f"Error guardando landmarks: {e}")
+    
+    def draw_landmarks(self):
+        # Un ítem del canvas por landmark, encima de las teselas; en calibración se pueden arrastrar
+        self.canvas.delete('landmark')
+        if self.calibration_mode:
+            color, tags = 'red', ('landmark', 'draggable')
+        else:
+            color, tags = '#00ff00', ('landmark',)
+        self.point_items = [self.canvas.create_oval(0, 0, 0, 0, fill=color, outline='', tags=tags)
+                            for _ in self.landmarks]
+        self.update_points()
+    
+    def update_points(self):
+        # Después de cada zoom o desplazamiento sólo se mueven los puntos ya creados
+        for item, (x, y) in zip(self.point_items, self.landmarks):
+            cx, cy = self.viewer.imagen_a_canvas(x, y)
+            self.canvas.coords(item, cx-5, cy-5, cx+5, cy+5)
         
+    def save_session(self):
+        # Vista previa, landmarks en coordenadas de la imagen completa (incluidos los ajustes arrastrados) y proporciones
+        if self.viewer.previa is None:
+            return
+        path = filedialog.asksaveasfilename(defaultextension=EXTENSION, filetypes=TIPOS_ARCHIVO)
+        if not path:
+            return
+        try:
+            guardar_sesion(path, {
+                'display_image': np.asarray(self.viewer.previa.convert("RGB")),
+                'landmarks': np.array(self.landmarks, dtype=np.int32).reshape(-1, 2)
+            }, {
+                'image_path': self.image_path,
+                'image_size': list(self.viewer.tamano),
+                'proporciones': getattr(self, 'proporciones', None),
+                'model': self.inference_info
+            })
+        except Exception as e:
+            print(f"Error guardando sesión: {e}")
+    
+    def open_session(self):
+        path = filedialog.askopenfilename(filetypes=TIPOS_ARCHIVO)
+        if not path:
+            return
+        try:
+            arrays, data = abrir_sesion(path)
+        except Exception as e:
+            print(f"Error abriendo sesión: {e}")
+            return
+        if self.calibration_mode:
+            self.toggle_calibration()
+        self.image_path = data.get('image_path')
+        self.landmarks = [(int(x), int(y)) for x, y in arrays['landmarks']]
+        self.inference_info = data.get('model')
+        if data.get('proporciones'):
+            self.proporciones = data['proporciones']
+        elif hasattr(self, 'proporciones'):
+            del self.proporciones
+        # Con la foto original disponible se vuelve a tener zoom; si no, sólo la vista previa guardada
+        if self.image_path and os.path.exists(self.image_path):
+            self.viewer.cargar(self.image_path)
+        else:
+            self.viewer.mostrar_previa(Image.fromarray(np.array(arrays['display_image'])), data.get('image_size'))
+        self.draw_landmarks()
+    
     def calculate_proportions(self):
         if len(self.landmarks) >= 25:
             # Calcular proporciones relativas
@@ -110,56 +239,61 @@ class PostureAnalyzerApp:
     
     def toggle_calibration(self):
         self.calibration_mode = not self.calibration_mode
-        if self.calibration_mode:
-            self.enable_calibration()
-        else:
-            self.disable_calibration()
+        self.draw_landmarks()
     
-    def enable_calibration(self):
-        self.draggable_points = []
-        for i, (x, y) in enumerate(self.landmarks):
-            point = self.canvas.create_oval(x-5, y-5, x+5, y+5, fill='red', tags=f"point_{i}")
-            self.draggable_points.append(point)
-            self.canvas.tag_bind(point, '<B1-Motion>', lambda e, idx=i: self.drag_point(e, idx))
+    def drag_current_point(self, event):
+        current = self.canvas.find_withtag('current')
+        if current and current[0] in self.point_items:
+            self.drag_point(event, self.point_items.index(current[0]))
     
     def drag_point(self, event, idx):
-        x, y = event.x, event.y
-        self.landmarks[idx] = (x, y)
-        self.canvas.coords(self.draggable_points[idx], x-5, y-5, x+5, y+5)
+        # La posición del canvas se lleva a la imagen completa: con zoom el ajuste es más fino
+        x, y = self.viewer.canvas_a_imagen(event.x, event.y)
+        self.landmarks[idx] = (int(round(x)), int(round(y)))
+        self.canvas.coords(self.point_items[idx], event.x-5, event.y-5, event.x+5, event.y+5)
         self.calculate_proportions()
     
-    def disable_calibration(self):
-        for point in self.draggable_points:
-            self.canvas.delete(point)
-        self.draggable_points = []
-        self.draw_landmarks(cv2.imread(self.image_path))
-    
     def show_comparison(self):
         if hasattr(self, 'proporciones'):
-            # Crear gráfico comparativo
-            fig = plt.figure(figsize=(8,4))
+            # Crear gráfico comparativo: la figura y su canvas se crean una vez y se redibujan
+            if self.comparison_figure is None:
+                self.comparison_figure = Figure(figsize=(8,4))
+                self.comparison_canvas = FigureCanvasTkAgg(self.comparison_figure, master=self.chart_frame)
+                self.comparison_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+            fig = self.comparison_figure
+            fig.clear()
+            ax = fig.add_subplot(111)
             categories = list(self.proporciones.keys())
             user_values = [self.proporciones[c] for c in categories]
             avg_values = [self.healthy_avg[c] for c in categories]
             
+            # Con población de referencia se compara contra su mediana y se muestra el percentil
+            reference = cargar_referencia()
+            percentiles = [None] * len(categories)
+            if reference is not None:
+                for i, c in enumerate(categories):
+                    if reference.tabla(c) is not None:
+                        avg_values[i] = reference.mediana(c)
+                        percentiles[i] = reference.percentil(c, user_values[i])
+            
             x = np.arange(len(categories))
             bar_width = 0.35
             
-            plt.bar(x - bar_width/2, user_values, bar_width, label='Usuario')
-            plt.bar(x + bar_width/2, avg_values, bar_width, label='Promedio Saludable')
+            ax.bar(x - bar_width/2, user_values, bar_width, label='Usuario')
+            ax.bar(x + bar_width/2, avg_values, bar_width, label='Promedio Saludable')
             
-            plt.xticks(x, categories)
-            plt.ylabel('Proporciones')
-            plt.title('Comparación con Promedios Saludables')
-            plt.legend()
+            for i, percentile in enumerate(percentiles):
+                if percentile is not None:
+                    ax.text(x[i] - bar_width/2, user_values[i], f"P{percentile:.0f}", ha='center', va='bottom')
             
-            # Mostrar en Tkinter
-            for widget in self.chart_frame.winfo_children():
-                widget.destroy()
+            ax.set_xticks(x)
+            ax.set_xticklabels(categories)
+            ax.set_ylabel('Proporciones')
+            ax.set_title('Comparación con Promedios Saludables')
+            ax.legend()
             
-            canvas = FigureCanvasTkAgg(fig, master=self.chart_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+            # Mostrar en Tkinter
+            self.comparison_canvas.draw()
 
 if __name__ == "__main__":
     root = tk.Tk()
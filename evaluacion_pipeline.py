@@ -0,0 +1,291 @@
+"""Evaluación de velocidad contra precisión del pipeline de postura.
+
+Uso:
+    python evaluacion_pipeline.py CARPETA [--escalas 0,1280,640] [--niveles 0,1,2]
+                                  [--recorte si,no] [--backends mediapipe,onnx]
+                                  [--modelo-onnx pose_landmark.onnx] [--hilos 1,2] [--int8 no,si]
+                                  [--salida resultados.json] [--comparar resultados_anteriores.json]
+
+CARPETA contiene imágenes etiquetadas: junto a cada ``foto.jpg`` hay un
+``foto.json`` con {"landmarks": [[x, y, z, visibility], ...]} (33 landmarks
+normalizados, como los de MediaPipe). Cada configuración (lado mayor de la
+imagen reducida, inferencia sobre el recorte de la persona o no, nivel de
+complejidad del modelo) corre en un proceso propio para medir su memoria pico,
+y se reporta el error de cada proporción de calculate_proportions frente a las
+calculadas con los landmarks reales, junto con imágenes por segundo.
+
+Con el backend ONNX las configuraciones varían en hilos intra-op y pesos int8
+en lugar del nivel de complejidad, y las imágenes se infieren por lotes. Para
+comparar backends que usan distinta cantidad de hilos se reportan también las
+imágenes por segundo de CPU (rendimiento por núcleo) y los núcleos usados.
+"""
+import argparse
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+EXTENSIONES = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def cargar_conjunto(carpeta, limite=None):
+    """Devuelve [(ruta de la imagen, landmarks reales (33, 4))] de las imágenes que tienen etiqueta"""
+    muestras = []
+    for ruta in sorted(glob.glob(os.path.join(carpeta, "*"))):
+        base, extension = os.path.splitext(ruta)
+        if extension.lower() not in EXTENSIONES or not os.path.exists(base + ".json"):
+            continue
+        with open(base + ".json", "r") as f:
+            etiqueta = json.load(f)
+        landmarks = np.zeros((33, 4), dtype=np.float32)
+        reales = np.asarray(etiqueta["landmarks"], dtype=np.float32)
+        landmarks[:, :reales.shape[1]] = reales[:, :4]
+        if reales.shape[1] < 4:
+            landmarks[:, 3] = 1.0
+        muestras.append((ruta, landmarks))
+    return muestras[:limite] if limite else muestras
+
+
+def reducir(imagen, lado_maximo):
+    """Reduce la imagen para que su lado mayor no pase de lado_maximo (0 o None = tamaño original)"""
+    if not lado_maximo:
+        return imagen
+    alto, ancho = imagen.shape[:2]
+    escala = lado_maximo / max(alto, ancho)
+    if escala >= 1.0:
+        return imagen
+    return cv2.resize(imagen, (int(ancho * escala), int(alto * escala)), interpolation=cv2.INTER_AREA)
+
+
+def memoria_pico_mb():
+    """Memoria residente pico del proceso en MB (ru_maxrss está en KB en Linux y en bytes en macOS)"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if os.uname().sysname == "Darwin" else pico / 1024
+
+
+def nombre_configuracion(configuracion):
+    escala = configuracion["escala"] or "original"
+    recorte = "recorte" if configuracion["recorte"] else "completa"
+    if configuracion.get("backend", "mediapipe") == "onnx":
+        int8 = " int8" if configuracion["int8"] else ""
+        return f"onnx escala={escala} {recorte} hilos={configuracion['hilos'] or 'auto'}{int8}"
+    return f"escala={escala} {recorte} nivel={configuracion['nivel']}"
+
+
+def crear_motor_evaluacion(configuracion):
+    from motor_pose import MotorOnnx, MotorPose
+
+    if configuracion.get("backend", "mediapipe") == "onnx":
+        return MotorOnnx(configuracion["modelo"], intra_op_threads=configuracion["hilos"] or None,
+                         int8=configuracion["int8"], batch_size=configuracion["lote"])
+    return MotorPose(latency_budget_ms=None, min_visibility=0.0, tiers=(configuracion["nivel"],))
+
+
+def evaluar_configuracion(configuracion, muestras):
+    """Corre una configuración sobre todas las muestras; se ejecuta en un proceso nuevo"""
+    from proporciones import DEFAULT_CALIBRATION, calculate_proportions_array
+    from recorte_persona import detectar_lote_con_recorte
+
+    motor = crear_motor_evaluacion(configuracion)
+    lote = configuracion.get("lote", 1)
+
+    def detectar(imagenes):
+        imagenes = [reducir(imagen, configuracion["escala"]) for imagen in imagenes]
+        if configuracion["recorte"]:
+            return [landmarks for landmarks, _ in detectar_lote_con_recorte(motor.process_batch, imagenes)]
+        return motor.process_batch(imagenes)
+
+    # La primera inferencia carga el modelo; no se cuenta en los tiempos
+    if muestras:
+        detectar([cv2.imread(muestras[0][0])] * lote)
+    if getattr(motor, "unavailable", None):
+        raise RuntimeError(f"el nivel {configuracion['nivel']} no está disponible")
+
+    tracemalloc.start()
+    tiempo = tiempo_cpu = 0.0
+    predichos, reales = [], []
+    fallos = intentadas = 0
+    for primera in range(0, len(muestras), lote):
+        imagenes, etiquetas = [], []
+        for ruta, landmarks_reales in muestras[primera:primera + lote]:
+            imagen = cv2.imread(ruta)
+            if imagen is None:
+                fallos += 1
+                continue
+            imagenes.append(imagen)
+            etiquetas.append(landmarks_reales)
+        if not imagenes:
+            continue
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        detectados = detectar(imagenes)
+        tiempo += time.perf_counter() - inicio
+        # process_time suma el tiempo de CPU de todos los hilos del proceso
+        tiempo_cpu += time.process_time() - inicio_cpu
+        intentadas += len(imagenes)
+        for landmarks, landmarks_reales in zip(detectados, etiquetas):
+            if landmarks is None:
+                fallos += 1
+                continue
+            predichos.append(landmarks)
+            reales.append(landmarks_reales)
+    _, pico_tracemalloc = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    motor.close()
+
+    errores = {}
+    error_landmarks = None
+    if predichos:
+        predichos, reales = np.stack(predichos), np.stack(reales)
+        proporciones = calculate_proportions_array(predichos, DEFAULT_CALIBRATION)
+        esperadas = calculate_proportions_array(reales, DEFAULT_CALIBRATION)
+        errores = {clave: float(np.mean(np.abs(proporciones[clave] - esperadas[clave]))) for clave in proporciones}
+        error_landmarks = float(np.mean(np.linalg.norm(predichos[..., :2] - reales[..., :2], axis=-1)))
+
+    return {
+        "configuracion": configuracion,
+        "nombre": nombre_configuracion(configuracion),
+        "imagenes": len(muestras),
+        "fallos": fallos,
+        "error_proporciones": errores,
+        "error_medio": float(np.mean(list(errores.values()))) if errores else None,
+        "error_landmarks": error_landmarks,
+        "imagenes_por_segundo": intentadas / tiempo if tiempo > 0 else None,
+        "ms_por_imagen": tiempo * 1000 / intentadas if intentadas else None,
+        "imagenes_por_nucleo": intentadas / tiempo_cpu if tiempo_cpu > 0 else None,
+        "nucleos_usados": tiempo_cpu / tiempo if tiempo > 0 else None,
+        "memoria_pico_mb": memoria_pico_mb(),
+        "tracemalloc_pico_mb": pico_tracemalloc / (1024 * 1024)
+    }
+
+
+def evaluar(configuraciones, muestras):
+    """Evalúa cada configuración en un proceso recién creado, para que la memoria pico sea sólo la suya"""
+    contexto = multiprocessing.get_context("spawn")
+    resultados = []
+    for configuracion in configuraciones:
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+            try:
+                resultado = pool.submit(evaluar_configuracion, configuracion, muestras).result()
+            except Exception as e:
+                print(f"Error evaluando {nombre_configuracion(configuracion)}: {e}")
+                continue
+        resultados.append(resultado)
+        print(f"{resultado['nombre']}: listo")
+    return resultados
+
+
+def frontera_pareto(resultados):
+    """Marca 'pareto' en los resultados que ninguna otra configuración supera en error, velocidad y memoria a la vez"""
+    def metricas(resultado):
+        return (resultado["error_medio"], -resultado["imagenes_por_segundo"], resultado["memoria_pico_mb"] or 0)
+
+    validos = [r for r in resultados if r["error_medio"] is not None and r["imagenes_por_segundo"]]
+    for resultado in resultados:
+        resultado["pareto"] = False
+    for resultado in validos:
+        propias = metricas(resultado)
+        resultado["pareto"] = not any(
+            all(a <= b for a, b in zip(metricas(otro), propias)) and metricas(otro) != propias
+            for otro in validos if otro is not resultado
+        )
+    return resultados
+
+
+def imprimir_tabla(resultados):
+    claves = sorted({clave for r in resultados for clave in r["error_proporciones"]})
+    encabezado = f"{'':2}{'configuracion':46}{'img/s':>8}{'img/s/nuc':>10}{'nucleos':>8}{'ms':>8}{'MB':>8}"
+    encabezado += f"{'fallos':>7}{'error':>8}"
+    encabezado += "".join(f"{clave[:12]:>13}" for clave in claves)
+    print(encabezado)
+    for r in sorted(resultados, key=lambda r: -(r["imagenes_por_segundo"] or 0)):
+        fila = f"{'*' if r.get('pareto') else ' ':2}{r['nombre']:46}"
+        fila += f"{r['imagenes_por_segundo'] or 0:8.2f}{r.get('imagenes_por_nucleo') or 0:10.2f}"
+        fila += f"{r.get('nucleos_usados') or 0:8.2f}{r['ms_por_imagen'] or 0:8.1f}{r['memoria_pico_mb'] or 0:8.0f}"
+        fila += f"{r['fallos']:7d}{r['error_medio'] if r['error_medio'] is not None else float('nan'):8.4f}"
+        fila += "".join(f"{r['error_proporciones'].get(clave, float('nan')):13.4f}" for clave in claves)
+        print(fila)
+    print("* = frontera de Pareto (nadie es a la vez más preciso, más rápido y más liviano)")
+    print("img/s/nuc = imágenes por segundo de CPU; nucleos = tiempo de CPU / tiempo real")
+
+
+def comparar(resultados, ruta_anterior):
+    """Imprime, por configuración, cuánto cambiaron el error y la velocidad respecto de una corrida anterior"""
+    with open(ruta_anterior, "r") as f:
+        anteriores = {r["nombre"]: r for r in json.load(f)["resultados"]}
+    print(f"\nComparación con {ruta_anterior}:")
+    for r in resultados:
+        previo = anteriores.get(r["nombre"])
+        if previo is None or r["error_medio"] is None or previo["error_medio"] is None:
+            continue
+        cambio_error = r["error_medio"] - previo["error_medio"]
+        cambio_velocidad = (r["imagenes_por_segundo"] / previo["imagenes_por_segundo"] - 1) * 100
+        print(f"  {r['nombre']:46} error {cambio_error:+.4f}  velocidad {cambio_velocidad:+.1f}%")
+
+
+def lista(texto, convertir):
+    return [convertir(valor) for valor in texto.split(",") if valor != ""]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide error de proporciones, velocidad y memoria por configuración")
+    parser.add_argument("carpeta", help="Carpeta con imágenes y sus landmarks reales (foto.jpg + foto.json)")
+    parser.add_argument("--escalas", default="0,1280,640", help="Lados mayores a probar (0 = original)")
+    parser.add_argument("--recorte", default="si,no", help="Inferir sobre el recorte de la persona (si, no o si,no)")
+    parser.add_argument("--niveles", default="0,1,2", help="Niveles de complejidad de MediaPipe")
+    parser.add_argument("--backends", default="mediapipe", help="Backends a comparar (mediapipe, onnx o mediapipe,onnx)")
+    parser.add_argument("--modelo-onnx", default="pose_landmark.onnx", help="Modelo de landmarks para el backend ONNX")
+    parser.add_argument("--hilos", default="1", help="Hilos intra-op de ONNX Runtime a probar (0 = automático)")
+    parser.add_argument("--int8", default="no", help="Pesos cuantizados int8 con ONNX (si, no o no,si)")
+    parser.add_argument("--lote", type=int, default=8, help="Imágenes por lote con ONNX")
+    parser.add_argument("--limite", type=int, help="Usar sólo las primeras N imágenes")
+    parser.add_argument("--salida", default="evaluacion_resultados.json")
+    parser.add_argument("--comparar", help="Resultados JSON de una corrida anterior")
+    args = parser.parse_args()
+
+    muestras = cargar_conjunto(args.carpeta, args.limite)
+    if not muestras:
+        raise SystemExit("No se encontraron imágenes con landmarks reales")
+
+    backends = lista(args.backends, str)
+    configuraciones = []
+    for escala, recorte in itertools.product(lista(args.escalas, int), lista(args.recorte, lambda v: v == "si")):
+        if "mediapipe" in backends:
+            configuraciones.extend({"backend": "mediapipe", "escala": escala, "recorte": recorte, "nivel": nivel}
+                                   for nivel in lista(args.niveles, int))
+        if "onnx" in backends:
+            configuraciones.extend(
+                {"backend": "onnx", "escala": escala, "recorte": recorte, "modelo": os.path.abspath(args.modelo_onnx),
+                 "hilos": hilos, "int8": int8, "lote": args.lote}
+                for hilos, int8 in itertools.product(lista(args.hilos, int), lista(args.int8, lambda v: v == "si")))
+    resultados = frontera_pareto(evaluar(configuraciones, muestras))
+    imprimir_tabla(resultados)
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+    with open(args.salida, "w") as f:
+        json.dump({
+            "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "carpeta": os.path.abspath(args.carpeta),
+            "imagenes": len(muestras),
+            "resultados": resultados
+        }, f, indent=4)
+    print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Exportación e importación columnar (Parquet y Arrow IPC) del historial y de los reportes de postura.
+
+Uso:
+    python exportacion_columnar.py historial --salida historial.parquet
+    python exportacion_columnar.py reportes --archivo landmark_archive --salida reportes.arrow
+    python exportacion_columnar.py importar reportes.parquet --archivo otro_archive
+
+La extensión decide el formato: ``.parquet`` se comprime con zstd y ``.arrow`` /
+``.feather`` (Arrow IPC) con lz4. Los datos se escriben por lotes de registros,
+así que nunca se arma en memoria más de un lote a la vez.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from archivo_landmarks import NUM_CAMPOS, NUM_LANDMARKS
+
+# Filas por lote de registros
+TAMANO_LOTE = 65536
+
+FORMATO_FECHA_HISTORIAL = "%Y-%m-%d %H:%M"
+FORMATO_FECHA_REPORTE = "%Y-%m-%d %H:%M:%S"
+
+VALORES_LANDMARKS = NUM_LANDMARKS * NUM_CAMPOS
+
+if pa is not None:
+    ESQUEMA_HISTORIAL = pa.schema([
+        ("fecha", pa.timestamp("s")),
+        ("peso", pa.float64()),
+        ("altura", pa.float64()),
+        ("edad", pa.int32()),
+        ("genero", pa.string()),
+        ("actividad", pa.string()),
+        ("imc", pa.float64()),
+        ("bmr", pa.float64()),
+        ("calorias", pa.float64()),
+        ("id", pa.string()),
+        ("timestamp", pa.float64()),
+        ("estacion", pa.string()),
+        ("version_formula", pa.int32()),
+        ("version_metricas", pa.int32())
+    ])
+
+    # Las proporciones son un mapa porque v1 y v3 calculan claves distintas
+    ESQUEMA_REPORTES = pa.schema([
+        ("registro", pa.int64()),
+        ("fecha", pa.timestamp("s")),
+        ("image_path", pa.string()),
+        ("person", pa.int32()),
+        ("proportions", pa.map_(pa.string(), pa.float32())),
+        ("landmarks", pa.list_(pa.float32(), VALORES_LANDMARKS))
+    ])
+
+
+def verificar_pyarrow():
+    if pa is None:
+        raise RuntimeError("Se necesita pyarrow para exportar a Parquet o Arrow (pip install pyarrow)")
+
+
+def formato_desde_ruta(ruta):
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == ".parquet":
+        return "parquet"
+    if extension in (".arrow", ".feather", ".ipc"):
+        return "ipc"
+    raise ValueError(f"Extensión no soportada: {extension} (use .parquet o .arrow)")
+
+
+def fechas_a_arrow(fechas, formato):
+    # Las fechas que no tienen el formato esperado quedan como nulas
+    return pc.strptime(pa.array(fechas, pa.string()), format=formato, unit="s", error_is_null=True)
+
+
+def escribir_lotes(ruta, esquema, lotes):
+    """Escribe los lotes en Parquet (zstd) o Arrow IPC (lz4) según la extensión; devuelve las filas escritas"""
+    verificar_pyarrow()
+    formato = formato_desde_ruta(ruta)
+    filas = 0
+    ruta_tmp = ruta + ".tmp"
+    if formato == "parquet":
+        escritor = pq.ParquetWriter(ruta_tmp, esquema, compression="zstd")
+    else:
+        escritor = ipc.new_file(ruta_tmp, esquema, options=ipc.IpcWriteOptions(compression="lz4"))
+    try:
+        for lote in lotes:
+            escritor.write_batch(lote)
+            filas += lote.num_rows
+    finally:
+        escritor.close()
+    os.replace(ruta_tmp, ruta)
+    return filas
+
+
+def leer_tabla(ruta, columnas=None):
+    """Lee un archivo Parquet o Arrow IPC como pyarrow.Table (los IPC se abren mapeados en memoria)"""
+    verificar_pyarrow()
+    if formato_desde_ruta(ruta) == "parquet":
+        return pq.read_table(ruta, columns=columnas)
+    with pa.memory_map(ruta, "r") as fuente:
+        tabla = ipc.open_file(fuente).read_all()
+    return tabla.select(columnas) if columnas else tabla
+
+
+def fechas_a_texto(columna, formato):
+    # Parquet guarda los timestamp en milisegundos; se vuelve a segundos para que %S no agregue fracciones
+    return pc.strftime(columna.cast(pa.timestamp("s")), format=formato)
+
+
+def filas_desde_tabla(tabla):
+    """Convierte una tabla en lista de diccionarios columna por columna (mucho más rápido que Table.to_pylist)"""
+    nombres = tabla.column_names
+    columnas = [tabla.column(nombre).to_pylist() for nombre in nombres]
+    return [dict(zip(nombres, valores)) for valores in zip(*columnas)]
+
+
+def lotes_historial(historial, tamano_lote=TAMANO_LOTE):
+    """Convierte la lista de entradas del historial en lotes con el esquema tipado"""
+    for inicio in range(0, len(historial), tamano_lote):
+        bloque = historial[inicio:inicio + tamano_lote]
+        columnas = {campo.name: [entrada.get(campo.name) for entrada in bloque] for campo in ESQUEMA_HISTORIAL}
+        arreglos = []
+        for campo in ESQUEMA_HISTORIAL:
+            valores = columnas[campo.name]
+            if campo.name == "fecha":
+                arreglos.append(fechas_a_arrow(valores, FORMATO_FECHA_HISTORIAL))
+            else:
+                arreglos.append(pa.array(valores, campo.type))
+        yield pa.RecordBatch.from_arrays(arreglos, schema=ESQUEMA_HISTORIAL)
+
+
+def exportar_historial(historial, ruta, tamano_lote=TAMANO_LOTE):
+    """Exporta el historial de mediciones (lista de diccionarios) a Parquet o Arrow IPC"""
+    verificar_pyarrow()
+    return escribir_lotes(ruta, ESQUEMA_HISTORIAL, lotes_historial(historial, tamano_lote))
+
+
+def importar_historial(ruta):
+    """Lee un historial exportado y lo devuelve como lista de entradas, igual que health_history.json.
+
+    Las columnas imc, bmr y calorias vienen incluidas; quien guarde las entradas
+    en el historial debe quitarlas con metricas_versionadas.solo_datos.
+    """
+    tabla = leer_tabla(ruta)
+    if "fecha" in tabla.column_names:
+        indice = tabla.column_names.index("fecha")
+        tabla = tabla.set_column(indice, "fecha", fechas_a_texto(tabla.column("fecha"), FORMATO_FECHA_HISTORIAL))
+    return filas_desde_tabla(tabla)
+
+
+def lotes_reportes(reportes, landmarks, tamano_lote=TAMANO_LOTE):
+    """Arma lotes de reportes de postura; la columna de landmarks se construye sin copiar por fila.
+
+    landmarks es el arreglo (N, 33, 4) del archivo (puede ser un np.memmap) indexado por 'registro'.
+    """
+    for inicio in range(0, len(reportes), tamano_lote):
+        bloque = reportes[inicio:inicio + tamano_lote]
+        registros = np.array([reporte['registro'] for reporte in bloque], dtype=np.int64)
+        valores = np.ascontiguousarray(landmarks[registros], dtype=np.float32).reshape(-1)
+        proporciones = [
+            list((reporte.get('proportions') or {}).items()) if isinstance(reporte.get('proportions'), dict) else None
+            for reporte in bloque
+        ]
+        yield pa.RecordBatch.from_arrays([
+            pa.array(registros),
+            fechas_a_arrow([reporte.get('fecha') for reporte in bloque], FORMATO_FECHA_REPORTE),
+            pa.array([reporte.get('image_path') for reporte in bloque], pa.string()),
+            pa.array([reporte.get('person') for reporte in bloque], pa.int32()),
+            pa.array(proporciones, ESQUEMA_REPORTES.field("proportions").type),
+            pa.FixedSizeListArray.from_arrays(pa.array(valores), VALORES_LANDMARKS)
+        ], schema=ESQUEMA_REPORTES)
+
+
+def exportar_reportes(archivo, ruta, desde=0, tamano_lote=TAMANO_LOTE):
+    """Exporta los reportes del archivo de landmarks (proporciones y landmarks) a Parquet o Arrow IPC"""
+    verificar_pyarrow()
+    reportes = [reporte for reporte in archivo.reportes() if reporte['registro'] >= desde]
+    return escribir_lotes(ruta, ESQUEMA_REPORTES, lotes_reportes(reportes, archivo.cargar(), tamano_lote))
+
+
+def importar_reportes(ruta):
+    """Lee reportes exportados; devuelve (lista de reportes sin landmarks, landmarks (N, 33, 4) float32)"""
+    tabla = leer_tabla(ruta)
+    columna = tabla.column("landmarks").combine_chunks()
+    landmarks = columna.flatten().to_numpy(zero_copy_only=False).reshape(-1, NUM_LANDMARKS, NUM_CAMPOS)
+
+    tabla = tabla.drop_columns(["landmarks"])
+    indice = tabla.column_names.index("fecha")
+    tabla = tabla.set_column(indice, "fecha", fechas_a_texto(tabla.column("fecha"), FORMATO_FECHA_REPORTE))
+    reportes = filas_desde_tabla(tabla)
+    for reporte in reportes:
+        if reporte['proportions'] is not None:
+            reporte['proportions'] = dict(reporte['proportions'])
+        if reporte['person'] is None:
+            del reporte['person']
+    return reportes, landmarks
+
+
+def importar_reportes_a_archivo(ruta, archivo):
+    """Agrega los reportes exportados a un archivo de landmarks; devuelve los nuevos números de registro"""
+    reportes, landmarks = importar_reportes(ruta)
+    for reporte in reportes:
+        reporte['registro_origen'] = reporte.pop('registro')
+    return archivo.agregar_lote(landmarks, reportes)
+
+
+def main():
+    from archivo_landmarks import DIRECTORIO_POR_DEFECTO, ArchivoLandmarks
+
+    parser = argparse.ArgumentParser(description="Exporta o importa historial y reportes en Parquet / Arrow")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    historial = sub.add_parser("historial", help="Exporta health_history.json")
+    historial.add_argument("--entrada", default="health_history.json")
+    historial.add_argument("--salida", default="historial.parquet")
+
+    reportes = sub.add_parser("reportes", help="Exporta los reportes del archivo de landmarks")
+    reportes.add_argument("--archivo", default=DIRECTORIO_POR_DEFECTO)
+    reportes.add_argument("--salida", default="reportes.parquet")
+    reportes.add_argument("--desde", type=int, default=0, help="Primer número de registro a incluir")
+
+    importar = sub.add_parser("importar", help="Agrega reportes exportados a un archivo de landmarks")
+    importar.add_argument("entrada")
+    importar.add_argument("--archivo", default=DIRECTORIO_POR_DEFECTO)
+    args = parser.parse_args()
+
+    if args.comando == "historial":
+        from metricas_versionadas import MetricasHistorial
+
+        with open(args.entrada, "r") as f:
+            filas = exportar_historial(MetricasHistorial().con_metricas(json.load(f)), args.salida)
+        print(f"{filas} mediciones exportadas a {args.salida}")
+    elif args.comando == "reportes":
+        filas = exportar_reportes(ArchivoLandmarks(args.archivo), args.salida, args.desde)
+        print(f"{filas} reportes exportados a {args.salida}")
+    else:
+        registros = importar_reportes_a_archivo(args.entrada, ArchivoLandmarks(args.archivo))
+        print(f"{len(registros)} reportes importados en {args.archivo}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Filtro de calidad previo a la inferencia: descarta en pocos milisegundos las fotos que no sirven.
+
+Sobre una versión reducida de la imagen se mide la nitidez (varianza del
+laplaciano), la exposición (brillo medio y fracción de píxeles saturados en
+negro o en blanco) y si hay una silueta de persona (el mismo análisis de
+contornos de calculo_imagen_v2). Los umbrales se pueden cambiar en
+``calidad.json``; los contadores del filtro estiman cuánto tiempo de
+inferencia se ahorró con las imágenes rechazadas.
+"""
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from recorte_persona import detectar_region_persona
+
+RUTA_UMBRALES = "calidad.json"
+
+# Lado mayor de la imagen reducida sobre la que se hacen las mediciones
+TAMANO_ANALISIS = 256
+
+UMBRALES_POR_DEFECTO = {
+    # Varianza del laplaciano en la imagen reducida; menos es una foto movida o desenfocada
+    "nitidez_minima": 30.0,
+    "brillo_minimo": 35.0,
+    "brillo_maximo": 225.0,
+    # Fracción máxima de píxeles casi negros (< 10) o casi blancos (> 245)
+    "saturados_maximo": 0.5,
+    # Confianza mínima de la silueta de la persona (0 desactiva la comprobación)
+    "silueta_minima": 0.2
+}
+
+MOTIVOS = {
+    "borrosa": "la imagen está movida o desenfocada",
+    "oscura": "la imagen está subexpuesta",
+    "clara": "la imagen está sobreexpuesta",
+    "sin_persona": "no se encontró la silueta de una persona"
+}
+
+
+class ImagenRechazada(ValueError):
+    """La imagen no pasó el filtro de calidad; `evaluacion` tiene las mediciones"""
+
+    def __init__(self, evaluacion):
+        self.evaluacion = evaluacion
+        super().__init__("Imagen no apta: " + ", ".join(MOTIVOS[m] for m in evaluacion["motivos"]))
+
+    def __reduce__(self):
+        # Para que llegue completa desde un proceso trabajador
+        return ImagenRechazada, (self.evaluacion,)
+
+
+def cargar_umbrales(ruta=RUTA_UMBRALES):
+    umbrales = dict(UMBRALES_POR_DEFECTO)
+    if os.path.exists(ruta):
+        try:
+            with open(ruta, "r") as f:
+                umbrales.update(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Error cargando umbrales de calidad: {e}")
+    return umbrales
+
+
+def reducir(imagen, tamano=TAMANO_ANALISIS):
+    """Reduce con un submuestreo previo por saltos, para que una foto de 20 MP no cueste decenas de ms"""
+    alto, ancho = imagen.shape[:2]
+    salto = max(1, max(alto, ancho) // (2 * tamano))
+    if salto > 1:
+        imagen = imagen[::salto, ::salto]
+        alto, ancho = imagen.shape[:2]
+    escala = tamano / max(alto, ancho)
+    if escala >= 1.0:
+        return np.ascontiguousarray(imagen)
+    return cv2.resize(imagen, (max(1, int(ancho * escala)), max(1, int(alto * escala))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def evaluar_calidad(imagen, umbrales=None):
+    """Mide la imagen BGR y devuelve {'apta', 'motivos', 'nitidez', 'brillo', ..., 'ms'}"""
+    umbrales = umbrales or UMBRALES_POR_DEFECTO
+    inicio = time.perf_counter()
+    pequena = reducir(imagen)
+    gris = cv2.cvtColor(pequena, cv2.COLOR_BGR2GRAY) if pequena.ndim == 3 else pequena
+
+    nitidez = float(cv2.Laplacian(gris, cv2.CV_32F).var())
+    histograma = np.bincount(gris.ravel(), minlength=256)
+    total = float(gris.size)
+    brillo = float(np.dot(histograma, np.arange(256)) / total)
+    oscuros = float(histograma[:10].sum() / total)
+    claros = float(histograma[246:].sum() / total)
+
+    motivos = []
+    if nitidez < umbrales["nitidez_minima"]:
+        motivos.append("borrosa")
+    if brillo < umbrales["brillo_minimo"] or oscuros > umbrales["saturados_maximo"]:
+        motivos.append("oscura")
+    elif brillo > umbrales["brillo_maximo"] or claros > umbrales["saturados_maximo"]:
+        motivos.append("clara")
+
+    silueta = None
+    if umbrales["silueta_minima"] > 0 and pequena.ndim == 3:
+        _, silueta = detectar_region_persona(pequena)
+        if silueta < umbrales["silueta_minima"]:
+            motivos.append("sin_persona")
+
+    return {
+        "apta": not motivos,
+        "motivos": motivos,
+        "nitidez": nitidez,
+        "brillo": brillo,
+        "oscuros": oscuros,
+        "claros": claros,
+        "silueta": silueta,
+        "ms": (time.perf_counter() - inicio) * 1000
+    }
+
+
+class FiltroCalidad:
+    """Aplica evaluar_calidad y lleva la cuenta de rechazos y del tiempo de inferencia ahorrado.
+
+    Con modo="marcar" las imágenes malas no se rechazan: sólo se cuentan y se
+    devuelve la evaluación para advertir al usuario.
+    """
+
+    def __init__(self, umbrales=None, modo="rechazar"):
+        self.umbrales = umbrales or cargar_umbrales()
+        self.modo = modo
+        self.cerrojo = threading.Lock()
+        self.evaluadas = 0
+        self.rechazadas = 0
+        self.por_motivo = {motivo: 0 for motivo in MOTIVOS}
+        self.ms_filtro = 0.0
+        self.inferencias = 0
+        self.ms_inferencia = 0.0
+
+    def evaluar(self, imagen, registrar=True):
+        """Evalúa la imagen y cuenta el tiempo del filtro.
+
+        Con registrar=False una imagen no apta no se cuenta como rechazada: quien
+        llama decide (por ejemplo tras preguntar al usuario) y usa registrar_rechazo.
+        """
+        evaluacion = evaluar_calidad(imagen, self.umbrales)
+        with self.cerrojo:
+            self.evaluadas += 1
+            self.ms_filtro += evaluacion["ms"]
+        if registrar:
+            self.registrar_rechazo(evaluacion)
+        return evaluacion
+
+    def registrar_rechazo(self, evaluacion):
+        """Cuenta una imagen no apta que finalmente no llegó a la inferencia"""
+        if evaluacion["apta"]:
+            return
+        with self.cerrojo:
+            self.rechazadas += 1
+            for motivo in evaluacion["motivos"]:
+                self.por_motivo[motivo] += 1
+
+    def verificar(self, imagen):
+        """Lanza ImagenRechazada si la imagen no es apta y el modo es 'rechazar'; devuelve la evaluación"""
+        evaluacion = self.evaluar(imagen)
+        if not evaluacion["apta"] and self.modo == "rechazar":
+            raise ImagenRechazada(evaluacion)
+        return evaluacion
+
+    def registrar_inferencia(self, ms):
+        """Anota la duración de una inferencia real, para estimar lo que cuesta cada imagen rechazada"""
+        with self.cerrojo:
+            self.inferencias += 1
+            self.ms_inferencia += ms
+
+    def contadores(self):
+        with self.cerrojo:
+            media_inferencia = self.ms_inferencia / self.inferencias if self.inferencias else None
+            ahorrado = self.rechazadas * media_inferencia if media_inferencia is not None else None
+            return {
+                "evaluadas": self.evaluadas,
+                "rechazadas": self.rechazadas,
+                "por_motivo": dict(self.por_motivo),
+                "ms_filtro_medio": self.ms_filtro / self.evaluadas if self.evaluadas else None,
+                "ms_inferencia_medio": media_inferencia,
+                # Lo que hubieran costado las rechazadas menos lo que costó filtrar todas
+                "ms_ahorrados": ahorrado - self.ms_filtro if ahorrado is not None else None
+            }
+
+    def resumen(self):
+        c = self.contadores()
+        if not c["evaluadas"]:
+            return "Filtro de calidad: sin imágenes evaluadas"
+        motivos = ", ".join(f"{motivo} {n}" for motivo, n in c["por_motivo"].items() if n)
+        texto = (f"Filtro de calidad: {c['rechazadas']} de {c['evaluadas']} rechazadas"
+                 f"{' (' + motivos + ')' if motivos else ''}, {c['ms_filtro_medio']:.1f} ms por imagen")
+        # Balance neto: puede ser negativo si filtrar todas costó más que las inferencias evitadas
+        if c["ms_ahorrados"] is not None and c["ms_ahorrados"] >= 0:
+            texto += f", balance neto {c['ms_ahorrados'] / 1000:.1f} s de inferencia ahorrados"
+        elif c["ms_ahorrados"] is not None:
+            texto += f", balance neto: el filtro costó {-c['ms_ahorrados'] / 1000:.1f} s más de lo que ahorró"
+        return texto
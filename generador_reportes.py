@@ -0,0 +1,295 @@
+"""Generador de reportes PDF sin pantalla, uno por análisis de postura.
+
+Uso:
+    python generador_reportes.py --archivo landmark_archive --salida reportes_pdf [--historial health_history.json] [--trabajadores N]
+
+Cada PDF incluye la imagen con los landmarks superpuestos, el gráfico de
+comparación de proporciones, la proporción altura/ancho de la silueta frente a
+la saludable (el gráfico de calculo_imagen_v2) y, con --historial, el medidor de
+IMC y el gráfico radar de la última medición del historial hasta la fecha del
+análisis.
+"""
+import argparse
+import bisect
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from fpdf import FPDF
+
+from graficos_salud import dibujar_grafico_medidor, dibujar_grafico_radar
+from motor_siluetas import silueta
+from referencia_poblacion import cargar_referencia
+
+# Lado mayor de la imagen con landmarks incrustada en el PDF
+TAMANO_IMAGEN = 800
+DPI_GRAFICOS = 100
+
+# Proporción altura/ancho saludable cuando no hay población de referencia (la misma que usa v2)
+ALTURA_ANCHO_SALUDABLE = 1.6
+
+# Estado de cada proceso trabajador: figuras reutilizables y directorio temporal
+_plantillas = {}
+_directorio_temporal = None
+
+
+def iniciar_trabajador():
+    """Prepara una vez por proceso las fuentes y las figuras que se reutilizan en cada reporte"""
+    global _directorio_temporal
+    from matplotlib import font_manager
+    font_manager.findfont("DejaVu Sans")
+    for nombre, tamano in (("comparacion", (7, 4)), ("altura_ancho", (6, 4)), ("medidor", (6, 4)), ("radar", (5, 5))):
+        figura = Figure(figsize=tamano, dpi=DPI_GRAFICOS)
+        FigureCanvasAgg(figura)
+        _plantillas[nombre] = figura
+    _directorio_temporal = tempfile.mkdtemp(prefix="reportes_")
+    # Los trabajadores del pool terminan con os._exit, que no corre atexit; los Finalize con
+    # exitpriority sí se ejecutan al salir, tanto en los trabajadores como en el proceso principal
+    Finalize(None, shutil.rmtree, args=(_directorio_temporal,), kwargs={"ignore_errors": True}, exitpriority=0)
+
+
+def texto_pdf(texto):
+    # Las fuentes base de FPDF sólo admiten latin-1
+    return str(texto).encode("latin-1", "replace").decode("latin-1")
+
+
+def dibujar_comparacion_proporciones(figura, comparacion):
+    """Barras de proporciones del usuario frente a las saludables, como show_comparison de v3"""
+    ax = figura.add_subplot(111)
+    categorias = list(comparacion.keys())
+    usuario = [comparacion[c]['yours'] for c in categorias]
+    saludable = [comparacion[c]['healthy'] for c in categorias]
+    x = np.arange(len(categorias))
+    ancho = 0.35
+    ax.bar(x - ancho/2, usuario, ancho, label='Usuario')
+    ax.bar(x + ancho/2, saludable, ancho, label='Promedio Saludable')
+    for i, c in enumerate(categorias):
+        if comparacion[c].get('percentile') is not None:
+            ax.text(x[i] - ancho/2, usuario[i], f"P{comparacion[c]['percentile']:.0f}", ha='center', va='bottom')
+    ax.set_xticks(x)
+    ax.set_xticklabels(categorias, rotation=15)
+    ax.set_ylabel('Proporciones')
+    ax.set_title('Comparación con Promedios Saludables')
+    ax.legend()
+
+
+def dibujar_comparacion_altura_ancho(figura, proporcion):
+    """Barras de la proporción altura/ancho detectada frente a la saludable, como comparar_con_promedios_saludables de v2"""
+    ax = figura.add_subplot(111)
+    saludable = ALTURA_ANCHO_SALUDABLE
+    titulo = 'Comparación de Proporciones'
+    referencia = cargar_referencia()
+    if referencia is not None and referencia.tabla("proporcion_altura_ancho") is not None:
+        saludable = referencia.mediana("proporcion_altura_ancho")
+        titulo += f' (percentil {referencia.percentil("proporcion_altura_ancho", proporcion):.0f})'
+    ax.bar(['Detectada', 'Saludable'], [proporcion, saludable], color=['blue', 'green'])
+    ax.set_ylabel('Proporción Altura/Ancho')
+    ax.set_title(titulo)
+
+
+def renderizar_grafico(nombre, dibujar, datos):
+    """Dibuja sobre la figura plantilla del proceso y la guarda como imagen temporal.
+
+    Se usa JPEG porque FPDF lo incrusta sin decodificarlo, mientras que un PNG con
+    transparencia se procesa píxel a píxel en Python.
+    """
+    figura = _plantillas[nombre]
+    figura.clear()
+    dibujar(figura, datos)
+    ruta = os.path.join(_directorio_temporal, f"{nombre}.jpg")
+    figura.savefig(ruta, dpi=DPI_GRAFICOS, format="jpg", pil_kwargs={"quality": 90})
+    return ruta
+
+
+def leer_imagen(reporte):
+    """Imagen del análisis reducida a TAMANO_IMAGEN, o None si no se puede leer"""
+    import cv2
+
+    imagen = cv2.imread(reporte.get('image_path') or "")
+    if imagen is None:
+        return None
+    alto, ancho = imagen.shape[:2]
+    escala = min(1.0, TAMANO_IMAGEN / max(alto, ancho))
+    if escala < 1.0:
+        imagen = cv2.resize(imagen, (int(ancho * escala), int(alto * escala)), interpolation=cv2.INTER_AREA)
+    return imagen
+
+
+def proporcion_altura_ancho(imagen):
+    """Alto / ancho de la caja de la silueta, como la mide v2 (None si no hay contorno)"""
+    caja, _ = silueta(imagen)
+    if caja is None or caja[2] <= 0:
+        return None
+    return caja[3] / caja[2]
+
+
+def renderizar_landmarks(imagen, reporte):
+    """Guarda una copia de la imagen con los landmarks del reporte dibujados y devuelve su ruta"""
+    import cv2
+
+    imagen = imagen.copy()
+    alto, ancho = imagen.shape[:2]
+    for x, y in np.asarray(reporte.get('landmarks') or np.empty((0, 2)))[:, :2]:
+        cv2.circle(imagen, (int(x * ancho), int(y * alto)), 4, (0, 255, 0), -1)
+    ruta = os.path.join(_directorio_temporal, "landmarks.jpg")
+    cv2.imwrite(ruta, imagen)
+    return ruta
+
+
+def generar_pdf(reporte, ruta_salida):
+    """Genera el PDF de un análisis; se ejecuta dentro de un proceso trabajador"""
+    if not _plantillas:
+        iniciar_trabajador()
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(190, 10, txt="Reporte de Postura", ln=1, align="C")
+    pdf.set_font("Arial", size=9)
+    pdf.cell(190, 6, txt=texto_pdf(f"Imagen: {reporte.get('image_path', '')}"), ln=1)
+    if reporte.get('fecha'):
+        pdf.cell(190, 6, txt=texto_pdf(f"Fecha: {reporte['fecha']}"), ln=1)
+    if reporte.get('bbox'):
+        pdf.cell(190, 6, txt=texto_pdf(f"Persona en {reporte['bbox']}"), ln=1)
+    pdf.ln(3)
+
+    pdf.set_font("Arial", "B", 10)
+    for titulo, ancho in (("Proporcion", 50), ("Tu medida", 35), ("Saludable", 35), ("Diferencia", 35), ("Percentil", 35)):
+        pdf.cell(ancho, 8, titulo, 1)
+    pdf.ln()
+    pdf.set_font("Arial", size=10)
+    comparacion = reporte.get('comparison') or {}
+    for clave, datos in comparacion.items():
+        percentil = datos.get('percentile')
+        pdf.cell(50, 8, texto_pdf(clave), 1)
+        pdf.cell(35, 8, f"{datos['yours']:.3f}", 1)
+        pdf.cell(35, 8, f"{datos['healthy']:.3f}", 1)
+        pdf.cell(35, 8, f"{datos['percentage']:.1f}%", 1)
+        pdf.cell(35, 8, f"{percentil:.0f}" if percentil is not None else "-", 1)
+        pdf.ln()
+    pdf.ln(4)
+
+    imagen = leer_imagen(reporte)
+    if imagen is not None:
+        pdf.image(renderizar_landmarks(imagen, reporte), x=10, w=90)
+    if comparacion:
+        pdf.image(renderizar_grafico("comparacion", dibujar_comparacion_proporciones, comparacion), x=10, w=180)
+    proporcion = proporcion_altura_ancho(imagen) if imagen is not None else None
+    if proporcion is not None:
+        pdf.image(renderizar_grafico("altura_ancho", dibujar_comparacion_altura_ancho, proporcion), x=10, w=150)
+
+    salud = reporte.get('salud')
+    if salud:
+        pdf.add_page()
+        pdf.image(renderizar_grafico("medidor", dibujar_grafico_medidor, salud), x=10, w=150)
+        pdf.image(renderizar_grafico("radar", dibujar_grafico_radar, salud), x=10, w=120)
+
+    pdf.output(ruta_salida)
+    return ruta_salida
+
+
+def _generar(tarea):
+    reporte, ruta_salida = tarea
+    try:
+        return generar_pdf(reporte, ruta_salida), None
+    except Exception as e:
+        return ruta_salida, str(e)
+
+
+def generar_reportes(reportes, directorio_salida, trabajadores=None):
+    """Genera un PDF por reporte repartiendo el trabajo en un pool de procesos.
+
+    Devuelve la lista de (ruta del PDF, error o None) en el mismo orden.
+    """
+    os.makedirs(directorio_salida, exist_ok=True)
+    tareas = []
+    for i, reporte in enumerate(reportes):
+        nombre = f"reporte_{reporte.get('registro', i):06d}"
+        if reporte.get('person'):
+            nombre += f"_persona{reporte['person']}"
+        tareas.append((reporte, os.path.join(directorio_salida, nombre + ".pdf")))
+
+    trabajadores = trabajadores or os.cpu_count() or 1
+    bloque = max(1, len(tareas) // (trabajadores * 4))
+    with ProcessPoolExecutor(max_workers=trabajadores, initializer=iniciar_trabajador) as pool:
+        return list(pool.map(_generar, tareas, chunksize=bloque))
+
+
+def reportes_desde_archivo(archivo, desde=0):
+    """Arma los reportes a partir del archivo de landmarks, sin volver a ejecutar inferencia"""
+    from proporciones import compare_proportions
+
+    landmarks = archivo.cargar()
+    reportes = []
+    for entrada in archivo.reportes():
+        registro = entrada['registro']
+        if registro < desde or not entrada.get('proportions'):
+            continue
+        reporte = dict(entrada)
+        proporciones = entrada['proportions']
+        if 'head_to_body' in proporciones:
+            reporte['comparison'] = compare_proportions(proporciones)
+        reporte['landmarks'] = np.asarray(landmarks[registro]).tolist()
+        reportes.append(reporte)
+    return reportes
+
+
+def asignar_salud(reportes, historial, metricas):
+    """Agrega a cada reporte 'salud' con la última medición del historial hasta su fecha.
+
+    Los reportes sin fecha usan la última medición. Las métricas salen de las
+    columnas por versión de `metricas` (MetricasHistorial), sin recalcular cada entrada.
+    """
+    _, columnas = metricas.columnas(historial)
+    # Mediciones con métricas, ordenadas por fecha ("%Y-%m-%d %H:%M" se ordena como texto)
+    indices = sorted((i for i in range(len(historial)) if columnas["imc"][i] == columnas["imc"][i]),
+                     key=lambda i: historial[i].get("fecha", ""))
+    fechas = [historial[i].get("fecha", "") for i in indices]
+    for reporte in reportes:
+        fecha = reporte.get("fecha")
+        posicion = bisect.bisect_right(fechas, fecha) if fecha else len(fechas)
+        if posicion == 0:
+            continue
+        i = indices[posicion - 1]
+        salud = dict(historial[i])
+        for clave, valores in columnas.items():
+            salud[clave] = float(valores[i])
+        reporte["salud"] = salud
+    return reportes
+
+
+def main():
+    from archivo_landmarks import DIRECTORIO_POR_DEFECTO, ArchivoLandmarks
+
+    parser = argparse.ArgumentParser(description="Genera un PDF por cada análisis guardado")
+    parser.add_argument("--archivo", default=DIRECTORIO_POR_DEFECTO)
+    parser.add_argument("--salida", default="reportes_pdf")
+    parser.add_argument("--desde", type=int, default=0, help="Primer número de registro a incluir")
+    parser.add_argument("--historial", help="Historial de salud (health_history.json) para el medidor y el radar")
+    parser.add_argument("--trabajadores", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    reportes = reportes_desde_archivo(ArchivoLandmarks(args.archivo), args.desde)
+    if args.historial:
+        from metricas_versionadas import MetricasHistorial
+        from sincronizacion_historial import leer_historial
+
+        historial = leer_historial(args.historial)
+        asignar_salud(reportes, historial, MetricasHistorial())
+        print(f"{sum('salud' in reporte for reporte in reportes)} reportes con datos de salud de {args.historial}")
+    resultados = generar_reportes(reportes, args.salida, args.trabajadores)
+    errores = [(ruta, error) for ruta, error in resultados if error]
+    for ruta, error in errores:
+        print(f"{ruta}: {error}")
+    print(f"{len(resultados) - len(errores)} reportes generados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import math
+
+import numpy as np
+from matplotlib.patches import Wedge
+
+from referencia_poblacion import cargar_referencia
+
+# Funciones de dibujo de los gráficos de salud sobre una figura de Matplotlib cualquiera,
+# usadas tanto por la interfaz Tk como por el generador de reportes sin pantalla.
+
+
+def dibujar_grafico_barras(figura, datos):
+    """Crear gráfico de barras comparativo."""
+    ax = figura.add_subplot(111)
+    categorias = ['IMC', 'Metabolismo', 'Calorias']
+    imc_val = datos.get('imc', 0)
+    bmr_val = datos.get('bmr', 0)
+    calorias_val = datos.get('calorias', 0)
+    valores_usuario = [imc_val, bmr_val, calorias_val]
+    rangos_saludables = {
+        'IMC': (18.5, 24.9),
+        'Metabolismo': (1500, 2500),
+        'Calorias': (1800, 3000)
+    }
+    # Con población de referencia el rango es el intervalo entre sus percentiles 10 y 90
+    referencia = cargar_referencia()
+    if referencia is not None:
+        edad, genero = datos.get('edad'), datos.get('genero')
+        for categoria, metrica in (('IMC', 'imc'), ('Metabolismo', 'bmr'), ('Calorias', 'calorias')):
+            if referencia.tabla(metrica, edad, genero) is not None:
+                rangos_saludables[categoria] = (referencia.valor_en_percentil(metrica, 10, edad, genero),
+                                                referencia.valor_en_percentil(metrica, 90, edad, genero))
+    x = np.arange(len(categorias))
+    ancho = 0.35
+    barras = ax.bar(x, valores_usuario, ancho, color='skyblue', label='Tus valores')
+    for i, categoria in enumerate(categorias):
+        bajo, alto = rangos_saludables[categoria]
+        ax.plot([i - ancho/2, i + ancho/2], [bajo, bajo], 'r--', linewidth=1)
+        ax.plot([i - ancho/2, i + ancho/2], [alto, alto], 'r--', linewidth=1)
+        ax.fill_between([i - ancho/2, i + ancho/2], bajo, alto, color='red', alpha=0.1)
+    ax.set_xticks(x)
+    ax.set_xticklabels(categorias)
+    ax.set_title('Comparación con Rangos Saludables')
+    ax.legend([barras, ax.lines[0]], ['Tus valores', 'Rango saludable'])
+    ax.grid(True, linestyle='--', alpha=0.6)
+
+
+def dibujar_grafico_radar(figura, datos):
+    """Crear gráfico radar de métricas de salud."""
+    ax = figura.add_subplot(111, polar=True)
+    categorias = ['IMC', 'Metabolismo', 'Calorias', 'Edad', 'Peso']
+    imc_val = datos.get('imc', 0)
+    bmr_val = datos.get('bmr', 0)
+    calorias_val = datos.get('calorias', 0)
+    edad_val = datos.get('edad', 0)
+    peso_val = datos.get('peso', 0)
+    valores = [
+        min(imc_val / 40 * 100, 100),
+        min(bmr_val / 3000 * 100, 100),
+        min(calorias_val / 4000 * 100, 100),
+        min(edad_val / 100 * 100, 100),
+        min(peso_val / 150 * 100, 100)
+    ]
+    valores += valores[:1]
+    angulos = np.linspace(0, 2 * np.pi, len(categorias), endpoint=False).tolist()
+    angulos += angulos[:1]
+    ax.plot(angulos, valores, 'o-', linewidth=2, label='Tus valores')
+    ax.fill(angulos, valores, alpha=0.25)
+    ax.plot(angulos, [50] * len(angulos), 'k--', alpha=0.5, label='Promedio')
+    ax.set_thetagrids(np.degrees(angulos[:-1]), categorias)
+    ax.set_yticklabels([])
+    ax.set_title('Análisis Radial de Salud', pad=20)
+    ax.legend(loc='upper right')
+    ax.grid(True)
+
+
+def dibujar_grafico_medidor(figura, datos):
+    """Crear medidor semicircular para IMC."""
+    ax = figura.add_subplot(111)
+    ax.set_xlim(-1.5, 1.5)
+    ax.set_ylim(-0.1, 1.1)
+    ax.axis('off')
+    imc = datos.get('imc', 0)
+    min_val, max_val = 15, 40
+    zonas = [
+        (15, 18.5, "Bajo peso", "lightblue"),
+        (18.5, 25, "Normal", "lightgreen"),
+        (25, 30, "Sobrepeso", "orange"),
+        (30, 40, "Obesidad", "red")
+    ]
+    for inicio, fin, etiqueta_texto, color in zonas:
+        angulo_inicio = 180 * (inicio - min_val) / (max_val - min_val)
+        angulo_fin = 180 * (fin - min_val) / (max_val - min_val)
+        sector = Wedge((0, 0), 1, angulo_inicio, angulo_fin, width=0.3, color=color, alpha=0.5)
+        ax.add_patch(sector)
+        angulo_medio = (angulo_inicio + angulo_fin) / 2
+        rad = 0.7
+        x = rad * math.cos(math.radians(angulo_medio))
+        y = rad * math.sin(math.radians(angulo_medio))
+        ax.text(x, y, etiqueta_texto, ha='center', va='center', rotation=angulo_medio-90, fontsize=8)
+    for valor in np.linspace(min_val, max_val, 6):
+        angulo = 180 * (valor - min_val) / (max_val - min_val)
+        x_in = 0.7 * math.cos(math.radians(angulo))
+        y_in = 0.7 * math.sin(math.radians(angulo))
+        x_out = 0.8 * math.cos(math.radians(angulo))
+        y_out = 0.8 * math.sin(math.radians(angulo))
+        ax.plot([x_in, x_out], [y_in, y_out], 'k-')
+        ax.text(x_out * 1.1, y_out * 1.1, f"{valor:.0f}", ha='center', va='center', fontsize=8)
+    angulo_aguja = 180 * (imc - min_val) / (max_val - min_val)
+    x_aguja = 0.9 * math.cos(math.radians(angulo_aguja))
+    y_aguja = 0.9 * math.sin(math.radians(angulo_aguja))
+    ax.plot([0, x_aguja], [0, y_aguja], 'r-', linewidth=2)
+    ax.plot(x_aguja, y_aguja, 'ro', markersize=8)
+    ax.text(0, -0.1, f"IMC: {imc:.1f}", ha='center', va='center', fontsize=12, weight='bold')
+    if imc < 18.5:
+        estado = "Bajo peso"
+    elif imc < 25:
+        estado = "Normal"
+    elif imc < 30:
+        estado = "Sobrepeso"
+    else:
+        estado = "Obesidad"
+    ax.text(0, -0.2, f"Clasificación: {estado}", ha='center', va='center', fontsize=10)
@@ -0,0 +1,201 @@
+"""Métricas derivadas del historial de salud (imc, bmr, calorias) calculadas a demanda por versión de fórmula.
+
+El historial guarda sólo los datos medidos (peso, altura, edad, genero,
+actividad) y la versión de la fórmula vigente al medir. Las columnas derivadas
+se calculan vectorizadas con salud.calcular_metricas_arreglos y se guardan por
+VERSION_FORMULA en ``health_metrics_cache.npz``, alineadas por id con el
+historial (que sólo crece por el final). Al cambiar la fórmula no se reescribe
+el historial: la versión nueva se calcula en segundo plano y, mientras tanto,
+las vistas y exportaciones siguen leyendo la última versión completa.
+"""
+import os
+import threading
+
+import numpy as np
+
+from salud import VERSION_FORMULA, calcular_metricas_arreglos
+
+RUTA_CACHE = "health_metrics_cache.npz"
+
+DERIVADAS = ("imc", "bmr", "calorias")
+
+# Con menos entradas por calcular que esto se calculan al momento en lugar de en segundo plano
+UMBRAL_SEGUNDO_PLANO = 5000
+
+# Entradas calculadas y no guardadas a partir de las cuales se reescribe la cache;
+# por debajo, recalcularlas al abrir cuesta menos que reescribir el .npz en cada medición
+PENDIENTES_GUARDADO = 1000
+
+
+def solo_datos(entrada):
+    """Quita de la entrada las métricas derivadas (guardadas por versiones anteriores o traídas de una exportación)"""
+    for clave in DERIVADAS + ("version_metricas",):
+        entrada.pop(clave, None)
+    return entrada
+
+
+def calcular_columnas(entradas):
+    """Columnas derivadas de una lista de entradas, en una sola pasada vectorizada"""
+    if not entradas:
+        return {clave: np.empty(0) for clave in DERIVADAS}
+    imc, bmr, calorias = calcular_metricas_arreglos(
+        [float(entrada.get("peso") or 0) for entrada in entradas],
+        [float(entrada.get("altura") or 0) for entrada in entradas],
+        [int(entrada.get("edad") or 0) for entrada in entradas],
+        [entrada.get("genero", "") for entrada in entradas],
+        [entrada.get("actividad", "") for entrada in entradas]
+    )
+    return {"imc": imc, "bmr": bmr, "calorias": calorias}
+
+
+class MetricasHistorial:
+    """Cache por versión de fórmula de las columnas derivadas del historial.
+
+    Cada versión guarda los ids de las entradas que cubre (un prefijo del
+    historial) y un arreglo por métrica. `columnas` completa la versión actual
+    al momento si faltan pocas entradas; si falta todo un historial grande la
+    calcula en un hilo y devuelve la última versión completa, con NaN en las
+    entradas que esa versión no cubre.
+    """
+
+    def __init__(self, ruta_cache=RUTA_CACHE):
+        self.ruta_cache = ruta_cache
+        self.cerrojo = threading.Lock()
+        self.versiones = {}
+        # Entradas de cada versión que ya están en el archivo de cache
+        self.guardadas = {}
+        self.hilo = None
+        self.cargar_cache()
+
+    def cargar_cache(self):
+        if not os.path.exists(self.ruta_cache):
+            return
+        try:
+            with np.load(self.ruta_cache, allow_pickle=False) as datos:
+                version = int(datos["version"])
+                self.versiones[version] = {"ids": list(datos["ids"]),
+                                           **{clave: datos[clave].copy() for clave in DERIVADAS}}
+                self.guardadas[version] = len(self.versiones[version]["ids"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error cargando la cache de métricas: {e}")
+
+    def guardar_cache(self, version):
+        with self.cerrojo:
+            datos = self.versiones.get(version)
+            if datos is None:
+                return
+            ids = np.array(datos["ids"], dtype=str)
+            columnas = {clave: datos[clave] for clave in DERIVADAS}
+        try:
+            with open(self.ruta_cache + ".tmp", "wb") as f:
+                np.savez(f, version=version, ids=ids, **columnas)
+            os.replace(self.ruta_cache + ".tmp", self.ruta_cache)
+            self.guardadas = {version: len(ids)}
+        except OSError as e:
+            print(f"Error guardando la cache de métricas: {e}")
+
+    def cubiertas(self, version, historial):
+        """Cuántas entradas del principio del historial cubre la versión (0 si el historial cambió)"""
+        datos = self.versiones.get(version)
+        if datos is None:
+            return 0
+        ids = datos["ids"]
+        # El historial sólo crece por el final: alcanza con comparar el primer y el último id cubiertos
+        if not ids or len(ids) > len(historial) or historial[0].get("id") != ids[0] \
+                or historial[len(ids) - 1].get("id") != ids[-1]:
+            return 0
+        return len(ids)
+
+    def recalculando(self):
+        return self.hilo is not None and self.hilo.is_alive()
+
+    def completar(self, version, historial, desde):
+        """Calcula las entradas desde `desde` y las agrega a la versión"""
+        nuevas = historial[desde:]
+        columnas = calcular_columnas(nuevas)
+        with self.cerrojo:
+            anterior = self.versiones.get(version) if desde else None
+            if anterior is None:
+                self.versiones[version] = {"ids": [entrada.get("id") for entrada in nuevas], **columnas}
+            else:
+                anterior["ids"] = anterior["ids"][:desde] + [entrada.get("id") for entrada in nuevas]
+                for clave in DERIVADAS:
+                    anterior[clave] = np.concatenate([anterior[clave][:desde], columnas[clave]])
+            # Las versiones viejas sólo sirven hasta que la actual está completa
+            for vieja in [v for v in self.versiones if v != version]:
+                del self.versiones[vieja]
+
+    def recalcular_en_segundo_plano(self, historial):
+        if self.recalculando():
+            return
+        copia = list(historial)
+
+        def trabajar():
+            try:
+                self.completar(VERSION_FORMULA, copia, 0)
+                self.guardar_cache(VERSION_FORMULA)
+            except Exception as e:
+                print(f"Error recalculando métricas: {e}")
+
+        self.hilo = threading.Thread(target=trabajar, daemon=True)
+        self.hilo.start()
+
+    def columnas(self, historial):
+        """(versión, {métrica: arreglo alineado con el historial}) de la versión actual o de la última completa"""
+        cubiertas = self.cubiertas(VERSION_FORMULA, historial)
+        faltan = len(historial) - cubiertas
+        if faltan and (cubiertas or faltan < UMBRAL_SEGUNDO_PLANO) and not self.recalculando():
+            self.completar(VERSION_FORMULA, historial, cubiertas)
+            if len(historial) - self.guardadas.get(VERSION_FORMULA, 0) >= PENDIENTES_GUARDADO:
+                self.guardar_cache(VERSION_FORMULA)
+        elif faltan:
+            self.recalcular_en_segundo_plano(historial)
+
+        with self.cerrojo:
+            candidatas = [(self.cubiertas(version, historial), version) for version in self.versiones]
+            cubiertas, version = max(candidatas, default=(0, VERSION_FORMULA))
+            resultado = {}
+            for clave in DERIVADAS:
+                columna = np.full(len(historial), np.nan)
+                if cubiertas:
+                    columna[:cubiertas] = self.versiones[version][clave][:cubiertas]
+                resultado[clave] = columna
+        return version, resultado
+
+    def ultima(self, historial):
+        """Copia de la última entrada con sus métricas de la fórmula vigente, o None si el historial está vacío.
+
+        Sólo calcula esa entrada (o la toma de la cache): no arma las columnas del historial completo.
+        """
+        if not historial:
+            return None
+        completa = dict(historial[-1])
+        with self.cerrojo:
+            cubiertas = self.cubiertas(VERSION_FORMULA, historial)
+            datos = self.versiones.get(VERSION_FORMULA)
+            if cubiertas == len(historial):
+                valores = {clave: float(datos[clave][cubiertas - 1]) for clave in DERIVADAS}
+            else:
+                valores = None
+        if valores is None:
+            valores = {clave: float(columna[0]) for clave, columna in calcular_columnas([completa]).items()}
+        for clave, valor in valores.items():
+            completa[clave] = None if valor != valor else valor
+        completa["version_metricas"] = VERSION_FORMULA
+        return completa
+
+    def con_metricas(self, historial, desde=0):
+        """Copias de las entradas desde `desde` con las métricas de la versión vigente, para vistas y exportaciones"""
+        version, columnas = self.columnas(historial)
+        inicio = range(len(historial))[desde:].start
+        columnas = {clave: valores[inicio:].tolist() for clave, valores in columnas.items()}
+        entradas = []
+        for i, entrada in enumerate(historial[desde:]):
+            completa = dict(entrada)
+            for clave in DERIVADAS:
+                valor = columnas[clave][i]
+                # NaN: la entrada todavía no tiene métricas en ninguna versión
+                completa[clave] = None if valor != valor else valor
+            completa["version_metricas"] = version
+            entradas.append(completa)
+        return entradas
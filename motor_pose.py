@@ -0,0 +1,318 @@
+import os
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+from archivo_landmarks import landmarks_to_array
+from recorte_persona import visibilidad_cuerpo
+
+mp_pose = mp.solutions.pose
+
+# Niveles de model_complexity de MediaPipe Pose, del más rápido al más preciso
+NIVELES = (0, 1, 2)
+
+# Peso de la medición nueva en el promedio móvil de tiempos por nivel
+SUAVIZADO = 0.3
+
+# Resultados recientes por nivel usados para decidir si conviene saltarlo
+VENTANA_EXITOS = 20
+
+# Cada cuántas llamadas se vuelven a probar los niveles que se venían saltando por fallar,
+# para que unas pocas imágenes malas no los dejen afuera toda la sesión
+REPROBAR_CADA = 25
+
+BACKENDS = ("mediapipe", "onnx")
+
+# Backend y modelo ONNX usados por las aplicaciones (se pueden cambiar sin tocar el código)
+BACKEND_POR_DEFECTO = os.environ.get("POSE_BACKEND", "mediapipe")
+MODELO_ONNX = os.environ.get("POSE_ONNX_MODEL", "pose_landmark.onnx")
+
+# Salida del modelo ONNX: por landmark x, y, z (en píxeles de la entrada), visibilidad y presencia
+# (logits), como el modelo de landmarks de BlazePose exportado a ONNX
+VALORES_POR_LANDMARK = 5
+NUM_LANDMARKS = 33
+
+# Imágenes por llamada a la sesión ONNX cuando el modelo acepta lotes de tamaño variable
+TAMANO_LOTE = 8
+
+
+class BackendPose:
+    """Interfaz común de los backends de inferencia de pose.
+
+    process recibe una imagen BGR y devuelve landmarks (33, 4) normalizados o None;
+    process_batch hace lo mismo con una lista de imágenes. Los detalles de la
+    última inferencia (backend, nivel, tiempos) quedan en last_info.
+    """
+    backend = None
+
+    def process(self, image):
+        raise NotImplementedError
+
+    def process_batch(self, images):
+        return [self.process(image) for image in images]
+
+    def close(self):
+        pass
+
+
+class MotorPose(BackendPose):
+    """Ejecuta MediaPipe Pose eligiendo el nivel de complejidad según un presupuesto de latencia.
+
+    Empieza por el nivel más liviano que cabe en el presupuesto y sólo sube a uno
+    más pesado cuando la visibilidad de los landmarks del cuerpo es baja y el tiempo
+    estimado del siguiente nivel todavía cabe en lo que queda del presupuesto. Los
+    niveles que fallan casi siempre se saltan, y los que no se pueden cargar (por
+    ejemplo, modelos que no están descargados) se descartan. Cada REPROBAR_CADA
+    llamadas se prueban igual, para que su historial se actualice.
+    """
+    backend = "mediapipe"
+
+    def __init__(self, latency_budget_ms=None, min_visibility=0.6, tiers=NIVELES,
+                 static_image_mode=True, min_detection_confidence=0.5):
+        self.latency_budget_ms = latency_budget_ms
+        self.min_visibility = min_visibility
+        self.tiers = list(tiers)
+        self.static_image_mode = static_image_mode
+        self.min_detection_confidence = min_detection_confidence
+        self.models = {}
+        self.unavailable = set()
+        self.mean_ms = {}
+        self.recent_success = {tier: [] for tier in self.tiers}
+        self.calls = 0
+        self.last_info = None
+
+    def model(self, tier):
+        if tier not in self.models:
+            self.models[tier] = mp_pose.Pose(static_image_mode=self.static_image_mode,
+                                             model_complexity=tier,
+                                             min_detection_confidence=self.min_detection_confidence)
+        return self.models[tier]
+
+    def success_rate(self, tier):
+        recent = self.recent_success[tier]
+        return sum(recent) / len(recent) if recent else 1.0
+
+    def candidate_tiers(self):
+        """Niveles a probar en orden: se saltan los que no caben en el presupuesto o casi siempre fallan"""
+        tiers = [tier for tier in self.tiers if tier not in self.unavailable]
+        if self.latency_budget_ms is not None:
+            fitting = [tier for tier in tiers if self.mean_ms.get(tier, 0) <= self.latency_budget_ms]
+            tiers = fitting or tiers[:1]
+        self.calls += 1
+        if self.calls % REPROBAR_CADA == 0:
+            return tiers
+        reliable = [tier for tier in tiers if self.success_rate(tier) >= 0.3]
+        start = reliable[0] if reliable else tiers[0] if tiers else None
+        return [tier for tier in tiers if start is not None and tier >= start]
+
+    def process(self, image):
+        """Detecta la pose en una imagen BGR; devuelve landmarks (33, 4) o None.
+
+        El nivel usado y los tiempos quedan en last_info.
+        """
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        start = time.perf_counter()
+        timings = {}
+        best, best_tier, best_visibility = None, None, -1.0
+
+        for tier in self.candidate_tiers():
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if timings and self.latency_budget_ms is not None:
+                if elapsed_ms + self.mean_ms.get(tier, 0) > self.latency_budget_ms:
+                    break
+            try:
+                model = self.model(tier)
+            except Exception as e:
+                print(f"Nivel de complejidad {tier} no disponible: {e}")
+                self.unavailable.add(tier)
+                continue
+
+            tier_start = time.perf_counter()
+            results = model.process(image_rgb)
+            tier_ms = (time.perf_counter() - tier_start) * 1000
+            timings[tier] = tier_ms
+            previous = self.mean_ms.get(tier)
+            self.mean_ms[tier] = tier_ms if previous is None else (1 - SUAVIZADO) * previous + SUAVIZADO * tier_ms
+
+            landmarks = landmarks_to_array(results.pose_landmarks.landmark) if results.pose_landmarks else None
+            visibility = visibilidad_cuerpo(landmarks) if landmarks is not None else 0.0
+            passed = visibility >= self.min_visibility
+            self.recent_success[tier] = (self.recent_success[tier] + [passed])[-VENTANA_EXITOS:]
+            if landmarks is not None and visibility > best_visibility:
+                best, best_tier, best_visibility = landmarks, tier, visibility
+            if passed:
+                break
+
+        self.last_info = {
+            'backend': self.backend,
+            'tier': best_tier,
+            'visibility': best_visibility if best is not None else None,
+            'timings_ms': timings,
+            'total_ms': (time.perf_counter() - start) * 1000,
+            'latency_budget_ms': self.latency_budget_ms
+        }
+        return best
+
+    def close(self):
+        for model in self.models.values():
+            model.close()
+        self.models = {}
+
+
+def cuantizar_int8(model_path):
+    """Devuelve la ruta de una copia del modelo con pesos int8, generándola si no existe o está desactualizada"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    base, extension = os.path.splitext(model_path)
+    quantized_path = f"{base}.int8{extension}"
+    if not os.path.exists(quantized_path) or os.path.getmtime(quantized_path) < os.path.getmtime(model_path):
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+class MotorOnnx(BackendPose):
+    """Ejecuta un modelo de landmarks de pose con ONNX Runtime en CPU, por lotes.
+
+    Cada imagen se reduce con bandas (letterbox) al tamaño de entrada del modelo,
+    las imágenes de un lote se apilan en un único tensor y se ejecutan en una sola
+    llamada. intra_op_threads es la cantidad de hilos dentro de cada operador
+    (None = los que decida ONNX Runtime) e inter_op_threads la de operadores en
+    paralelo. Con int8=True se usa una copia del modelo con pesos cuantizados.
+    presence_logit indica si la salida de presencia es un logit (True) o ya una
+    probabilidad (False); con None se decide una sola vez con el primer lote y
+    queda fija para el modelo, así todos los lotes se interpretan igual.
+    """
+    backend = "onnx"
+
+    def __init__(self, model_path=MODELO_ONNX, intra_op_threads=None, inter_op_threads=1, int8=False,
+                 batch_size=TAMANO_LOTE, min_presence=0.5, presence_logit=None):
+        if ort is None:
+            raise RuntimeError("onnxruntime no está instalado (pip install onnxruntime)")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"No se encontró el modelo ONNX {model_path}")
+        self.model_path = cuantizar_int8(model_path) if int8 else model_path
+        self.int8 = int8
+        self.min_presence = min_presence
+        self.presence_logit = presence_logit
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        if inter_op_threads and inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        self.session = ort.InferenceSession(self.model_path, sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        shape = list(model_input.shape)
+        # Entrada NHWC (como BlazePose) o NCHW; las dimensiones simbólicas llegan como texto
+        self.channels_last = shape[-1] == 3
+        self.input_size = (shape[1], shape[2]) if self.channels_last else (shape[2], shape[3])
+        self.fixed_batch = isinstance(shape[0], int)
+        self.batch_size = shape[0] if self.fixed_batch else batch_size
+        self.buffer = None
+        self.last_info = None
+
+    def prepare(self, image, slot):
+        """Copia la imagen reducida con bandas en la posición `slot` del lote; devuelve (x, y, ancho, alto) útiles"""
+        input_h, input_w = self.input_size
+        h, w = image.shape[:2]
+        scale = min(input_w / w, input_h / h)
+        new_w, new_h = max(1, round(w * scale)), max(1, round(h * scale))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        resized = cv2.cvtColor(cv2.resize(image, (new_w, new_h), interpolation=interpolation), cv2.COLOR_BGR2RGB)
+        x0, y0 = (input_w - new_w) // 2, (input_h - new_h) // 2
+        target = self.buffer[slot]
+        target.fill(0)
+        np.multiply(resized, 1.0 / 255.0, out=target[y0:y0 + new_h, x0:x0 + new_w], casting="unsafe")
+        return x0, y0, new_w, new_h
+
+    def decode(self, raw, presence, area):
+        """Convierte la salida de una imagen a landmarks (33, 4) normalizados a la imagen original, o None"""
+        if presence is not None and presence < self.min_presence:
+            return None
+        x0, y0, new_w, new_h = area
+        values = raw.reshape(-1, VALORES_POR_LANDMARK)[:NUM_LANDMARKS]
+        landmarks = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+        landmarks[:, 0] = (values[:, 0] - x0) / new_w
+        landmarks[:, 1] = (values[:, 1] - y0) / new_h
+        landmarks[:, 2] = values[:, 2] / new_w
+        landmarks[:, 3] = 1.0 / (1.0 + np.exp(-np.clip(values[:, 3], -30, 30)))
+        return landmarks
+
+    def run(self, images):
+        count = len(images)
+        input_h, input_w = self.input_size
+        batch = self.batch_size if self.fixed_batch else count
+        if self.buffer is None or len(self.buffer) < batch:
+            self.buffer = np.zeros((batch, input_h, input_w, 3), dtype=np.float32)
+        areas = [self.prepare(image, slot) for slot, image in enumerate(images)]
+        tensor = self.buffer[:batch]
+        if not self.channels_last:
+            tensor = np.ascontiguousarray(tensor.transpose(0, 3, 1, 2))
+        outputs = [output.reshape(len(tensor), -1) for output in self.session.run(None, {self.input_name: tensor})]
+        # Landmarks: la primera salida con lugar para los 33 puntos; presencia: la primera con un solo valor
+        raw = next(output for output in outputs if output.shape[1] >= NUM_LANDMARKS * VALORES_POR_LANDMARK)
+        presence = next((output[:count, 0] for output in outputs if output.shape[1] == 1), None)
+        if presence is not None:
+            # Algunas exportaciones devuelven la presencia como logit: se decide con el primer lote
+            if self.presence_logit is None:
+                self.presence_logit = bool(presence.min() < 0 or presence.max() > 1)
+            if self.presence_logit:
+                presence = 1.0 / (1.0 + np.exp(-np.clip(presence, -30, 30)))
+        return [self.decode(raw[i], None if presence is None else float(presence[i]), areas[i])
+                for i in range(count)]
+
+    def process_batch(self, images):
+        """Detecta la pose en una lista de imágenes BGR con una llamada al modelo por lote"""
+        start = time.perf_counter()
+        results = []
+        for first in range(0, len(images), self.batch_size):
+            results.extend(self.run(images[first:first + self.batch_size]))
+        total_ms = (time.perf_counter() - start) * 1000
+        found = [landmarks for landmarks in results if landmarks is not None]
+        self.last_info = {
+            'backend': self.backend,
+            'tier': None,
+            'visibility': visibilidad_cuerpo(found[-1]) if found else None,
+            'timings_ms': {'onnx': total_ms / max(1, len(images))},
+            'total_ms': total_ms,
+            'latency_budget_ms': None,
+            'batch_size': len(images),
+            'int8': self.int8
+        }
+        return results
+
+    def process(self, image):
+        return self.process_batch([image])[0]
+
+    def close(self):
+        self.session = None
+        self.buffer = None
+
+
+def crear_motor(backend=BACKEND_POR_DEFECTO, model_path=MODELO_ONNX, intra_op_threads=None, inter_op_threads=1,
+                int8=False, batch_size=TAMANO_LOTE, presence_logit=None, **mediapipe_options):
+    """Crea el backend de inferencia pedido; si ONNX no se puede usar, sigue con MediaPipe"""
+    if backend == "onnx":
+        try:
+            return MotorOnnx(model_path, intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads,
+                             int8=int8, batch_size=batch_size, presence_logit=presence_logit)
+        except Exception as e:
+            print(f"Backend ONNX no disponible, se usa MediaPipe: {e}")
+    elif backend != "mediapipe":
+        print(f"Backend de pose desconocido '{backend}', se usa MediaPipe")
+    return MotorPose(**mediapipe_options)
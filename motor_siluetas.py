@@ -0,0 +1,181 @@
+"""Detección de la silueta de la persona sin modelo ni interfaz gráfica, para una imagen o muchas.
+
+Es el análisis de calculo_imagen_v2: umbral de Otsu, contornos externos y la
+caja del contorno de mayor área. Con lado_maximo el contorno se busca sobre una
+máscara reducida (y las fotos en disco se decodifican ya reducidas), lo que
+alcanza para revisar rápido un archivo grande de fotos. El análisis por lotes
+reparte las imágenes en hilos: OpenCV libera el GIL mientras trabaja.
+
+Uso:
+    python motor_siluetas.py CARPETA_O_FOTOS... [--hilos N] [--lado-maximo 256] [--salida siluetas.csv]
+"""
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+
+EXTENSIONES = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Reducciones que el decodificador de OpenCV hace mientras decodifica
+LECTURA_REDUCIDA = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def silueta(imagen, lado_maximo=None):
+    """Caja (x, y, ancho, alto) y área del mayor contorno, en píxeles de la imagen recibida.
+
+    Con lado_maximo el umbral y los contornos se calculan sobre una versión reducida
+    y el resultado se lleva de vuelta a la escala original. Devuelve (None, 0.0)
+    si no hay contornos.
+    """
+    alto, ancho = imagen.shape[:2]
+    escala = min(1.0, lado_maximo / max(alto, ancho)) if lado_maximo else 1.0
+    if escala < 1.0:
+        imagen = cv2.resize(imagen, (max(1, int(ancho * escala)), max(1, int(alto * escala))),
+                            interpolation=cv2.INTER_AREA)
+
+    gray = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY) if imagen.ndim == 3 else imagen
+    _, thresh = cv2.threshold(gray, 128, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    contornos, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contornos:
+        return None, 0.0
+
+    mayor_contorno = max(contornos, key=cv2.contourArea)
+    x, y, w, h = cv2.boundingRect(mayor_contorno)
+    area = cv2.contourArea(mayor_contorno)
+    if escala == 1.0:
+        return (x, y, w, h), float(area)
+    caja = (int(x / escala), int(y / escala), int(np.ceil(w / escala)), int(np.ceil(h / escala)))
+    return caja, float(area / (escala * escala))
+
+
+def leer_reducida(ruta, lado_maximo=None):
+    """Lee la foto pidiendo al decodificador la mayor reducción que deja el lado mayor >= lado_maximo.
+
+    Devuelve (imagen BGR o None, factor de reducción aplicado).
+    """
+    factor = 1
+    if lado_maximo:
+        try:
+            with Image.open(ruta) as imagen:
+                lado = max(imagen.size)
+        except OSError:
+            lado = 0
+        for candidato in (8, 4, 2):
+            if lado // candidato >= lado_maximo:
+                factor = candidato
+                break
+    imagen = cv2.imread(ruta, LECTURA_REDUCIDA.get(factor, cv2.IMREAD_COLOR))
+    return imagen, factor
+
+
+def _analizar_uno(elemento, lado_maximo):
+    factor = 1
+    if isinstance(elemento, str):
+        imagen, factor = leer_reducida(elemento, lado_maximo)
+    else:
+        imagen = elemento
+    if imagen is None:
+        return None, 0.0, None
+    caja, area = silueta(imagen, lado_maximo)
+    forma = (imagen.shape[0] * factor, imagen.shape[1] * factor)
+    if caja is None or factor == 1:
+        return caja, area, forma
+    return tuple(valor * factor for valor in caja), area * factor * factor, forma
+
+
+def analizar_lote(imagenes, hilos=None, lado_maximo=None):
+    """Analiza una lista de imágenes BGR o rutas en un grupo de hilos.
+
+    Devuelve un diccionario de arreglos, uno por imagen y en el mismo orden: x, y,
+    ancho, alto, area, proporcion_altura_ancho (alto / ancho), alto_imagen,
+    ancho_imagen, encontrada (hay contorno) y legible (se pudo leer).
+    """
+    hilos = hilos or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        resultados = list(pool.map(lambda elemento: _analizar_uno(elemento, lado_maximo), imagenes,
+                                   chunksize=max(1, len(imagenes) // (hilos * 4))))
+
+    cantidad = len(resultados)
+    cajas = np.zeros((cantidad, 4), dtype=np.int64)
+    formas = np.zeros((cantidad, 2), dtype=np.int64)
+    areas = np.zeros(cantidad, dtype=np.float64)
+    encontrada = np.zeros(cantidad, dtype=bool)
+    legible = np.zeros(cantidad, dtype=bool)
+    for i, (caja, area, forma) in enumerate(resultados):
+        if forma is not None:
+            legible[i] = True
+            formas[i] = forma
+        if caja is not None:
+            encontrada[i] = True
+            cajas[i] = caja
+            areas[i] = area
+
+    ancho, alto = cajas[:, 2].astype(np.float64), cajas[:, 3].astype(np.float64)
+    proporcion = np.divide(alto, ancho, out=np.zeros(cantidad), where=ancho > 0)
+    return {
+        "x": cajas[:, 0], "y": cajas[:, 1], "ancho": cajas[:, 2], "alto": cajas[:, 3],
+        "area": areas, "proporcion_altura_ancho": proporcion,
+        "alto_imagen": formas[:, 0], "ancho_imagen": formas[:, 1],
+        "encontrada": encontrada, "legible": legible
+    }
+
+
+def estadisticas(resultado):
+    """Media, desvío y percentiles de las medidas de las siluetas encontradas"""
+    encontradas = resultado["encontrada"]
+    resumen = {"imagenes": int(len(encontradas)), "encontradas": int(encontradas.sum()),
+               "ilegibles": int((~resultado["legible"]).sum())}
+    if not encontradas.any():
+        return resumen
+    alto_relativo = resultado["alto"][encontradas] / resultado["alto_imagen"][encontradas]
+    for nombre, valores in (("proporcion_altura_ancho", resultado["proporcion_altura_ancho"][encontradas]),
+                            ("alto_relativo", alto_relativo)):
+        p5, p50, p95 = np.percentile(valores, [5, 50, 95])
+        resumen[nombre] = {"media": float(valores.mean()), "desvio": float(valores.std()),
+                           "p5": float(p5), "mediana": float(p50), "p95": float(p95)}
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Revisión rápida de siluetas (sin modelo) para muchas fotos")
+    parser.add_argument("rutas", nargs="+", help="Carpetas o fotos")
+    parser.add_argument("--hilos", type=int, default=None)
+    parser.add_argument("--lado-maximo", type=int, default=256, help="Lado mayor de la máscara (0 = original)")
+    parser.add_argument("--salida", help="CSV con la caja de la silueta de cada foto")
+    args = parser.parse_args()
+
+    rutas = []
+    for ruta in args.rutas:
+        if os.path.isdir(ruta):
+            rutas.extend(sorted(r for r in glob.glob(os.path.join(ruta, "*")) if r.lower().endswith(EXTENSIONES)))
+        else:
+            rutas.append(ruta)
+
+    inicio = time.perf_counter()
+    resultado = analizar_lote(rutas, args.hilos, args.lado_maximo or None)
+    duracion = time.perf_counter() - inicio
+
+    resumen = estadisticas(resultado)
+    print(f"{resumen['encontradas']} siluetas en {resumen['imagenes']} fotos ({resumen['ilegibles']} ilegibles), "
+          f"{len(rutas) / duracion if duracion > 0 else 0:.0f} fotos/s")
+    for nombre in ("proporcion_altura_ancho", "alto_relativo"):
+        if nombre in resumen:
+            datos = resumen[nombre]
+            print(f"  {nombre}: media {datos['media']:.2f}, desvío {datos['desvio']:.2f}, "
+                  f"p5-p95 {datos['p5']:.2f}-{datos['p95']:.2f}")
+
+    if args.salida:
+        columnas = ("x", "y", "ancho", "alto", "area", "proporcion_altura_ancho", "encontrada")
+        with open(args.salida, "w") as f:
+            f.write("ruta," + ",".join(columnas) + "\n")
+            for i, ruta in enumerate(rutas):
+                f.write(ruta + "," + ",".join(str(resultado[columna][i]) for columna in columnas) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Análisis de fotos grupales: un reporte por cada persona detectada.
+
+Uso:
+    python multi_persona.py FOTO [--trabajadores N] [--salida reportes.json]
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from motor_pose import BACKEND_POR_DEFECTO, crear_motor
+from proporciones import CALIBRATION, calculate_proportions_array, compare_proportions
+from recorte_persona import expandir_region, reproyectar_landmarks, visibilidad_cuerpo
+
+# Lado mayor de la imagen reducida sobre la que corre el detector de personas
+TAMANO_DETECCION = 640
+
+# Solapamiento máximo (IoU) entre dos cajas antes de considerarlas la misma persona
+IOU_MAXIMO = 0.3
+
+# Modelo de pose de cada proceso trabajador
+_motor = None
+
+
+def detectar_personas_hog(imagen, tamano=TAMANO_DETECCION):
+    """Detecta personas con el descriptor HOG de OpenCV sobre una versión reducida"""
+    alto, ancho = imagen.shape[:2]
+    escala = min(1.0, tamano / max(alto, ancho))
+    pequena = cv2.resize(imagen, (int(ancho * escala), int(alto * escala)), interpolation=cv2.INTER_AREA)
+
+    hog = cv2.HOGDescriptor()
+    hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+    cajas, pesos = hog.detectMultiScale(pequena, winStride=(8, 8), padding=(8, 8), scale=1.05)
+    if len(cajas) == 0:
+        return []
+
+    cajas = [[int(v / escala) for v in caja] for caja in cajas]
+    pesos = [float(p) for p in np.ravel(pesos)]
+    conservadas = cv2.dnn.NMSBoxes(cajas, pesos, 0.0, IOU_MAXIMO)
+    return [tuple(cajas[i]) for i in np.ravel(conservadas)]
+
+
+def detectar_personas_silueta(imagen, fraccion_minima=0.02, tamano=TAMANO_DETECCION):
+    """Respaldo sin detector: cada silueta externa suficientemente grande es una persona"""
+    alto, ancho = imagen.shape[:2]
+    escala = min(1.0, tamano / max(alto, ancho))
+    pequena = cv2.resize(imagen, (int(ancho * escala), int(alto * escala)), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(pequena, cv2.COLOR_BGR2GRAY)
+    _, thresh = cv2.threshold(gray, 128, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    contornos, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    area_total = float(pequena.shape[0] * pequena.shape[1])
+    regiones = []
+    for contorno in contornos:
+        x, y, w, h = cv2.boundingRect(contorno)
+        if fraccion_minima <= (w * h) / area_total <= 0.9 and h > w:
+            regiones.append((int(x / escala), int(y / escala), int(w / escala), int(h / escala)))
+    return regiones
+
+
+def detectar_personas(imagen):
+    """Devuelve las cajas (x, y, ancho, alto) de todas las personas, ordenadas de izquierda a derecha"""
+    regiones = detectar_personas_hog(imagen) or detectar_personas_silueta(imagen)
+    return sorted(regiones, key=lambda region: region[0])
+
+
+def iniciar_trabajador():
+    """Crea el modelo de pose una sola vez por proceso, sin importar la interfaz de calculo_imagen_v1"""
+    global _motor
+    _motor = crear_motor(BACKEND_POR_DEFECTO, min_detection_confidence=0.5)
+
+
+def analizar_persona(recorte, region, forma_imagen, visibilidad_minima=0.5):
+    """Ejecuta la pose sobre el recorte de una persona y arma su reporte"""
+    if _motor is None:
+        iniciar_trabajador()
+    landmarks = _motor.process(recorte)
+    if landmarks is None or visibilidad_cuerpo(landmarks) < visibilidad_minima:
+        return None
+    landmarks = reproyectar_landmarks(landmarks, region, forma_imagen)
+    proportions = {key: float(value) for key, value in
+                   calculate_proportions_array(landmarks, CALIBRATION).items()}
+    return {
+        'bbox': list(region),
+        'proportions': proportions,
+        'comparison': compare_proportions(proportions),
+        'calibration': dict(CALIBRATION),
+        'landmarks': landmarks.tolist()
+    }
+
+
+def analizar_grupo(imagen, pool, image_path=None, margen=0.15):
+    """Analiza en paralelo a cada persona de la foto; devuelve un reporte por persona detectada"""
+    regiones = [expandir_region(region, imagen.shape, margen) for region in detectar_personas(imagen)]
+    futuros = [
+        pool.submit(analizar_persona, np.ascontiguousarray(imagen[y:y + h, x:x + w]), (x, y, w, h), imagen.shape)
+        for x, y, w, h in regiones
+    ]
+    reportes = []
+    for futuro in futuros:
+        reporte = futuro.result()
+        if reporte is not None:
+            reporte['person'] = len(reportes) + 1
+            reporte['image_path'] = image_path
+            reportes.append(reporte)
+    return reportes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analiza la postura de cada persona en una foto grupal")
+    parser.add_argument("foto")
+    parser.add_argument("--trabajadores", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los reportes")
+    args = parser.parse_args()
+
+    imagen = cv2.imread(args.foto)
+    if imagen is None:
+        raise SystemExit("No se pudo leer la imagen")
+
+    with ProcessPoolExecutor(max_workers=args.trabajadores, initializer=iniciar_trabajador) as pool:
+        reportes = analizar_grupo(imagen, pool, image_path=args.foto)
+
+    for reporte in reportes:
+        x, y, w, h = reporte['bbox']
+        print(f"Persona {reporte['person']} en ({x}, {y}, {w}x{h}):")
+        for key, data in reporte['comparison'].items():
+            print(f"  {key}: {data['yours']:.3f} (saludable {data['healthy']:.3f}, {data['percentage']:+.1f}%)")
+    if not reportes:
+        print("No se detectaron personas")
+
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(reportes, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
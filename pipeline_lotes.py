@@ -0,0 +1,368 @@
+"""Análisis de postura por lotes en etapas encadenadas: lectura → decodificación → inferencia → puntuación.
+
+Uso:
+    python pipeline_lotes.py CARPETA_O_FOTOS... [--lectores 4] [--decodificadores 2]
+                             [--inferencia 1] [--puntuadores 1] [--cola 16] [--lote 8]
+                             [--backend mediapipe] [--salida resultados.jsonl] [--guardar]
+
+Cada etapa tiene su propia cantidad de hilos y se comunica con la siguiente por
+una cola acotada, así que mientras la inferencia trabaja sobre una imagen las
+siguientes ya se están leyendo del disco y decodificando, y la memoria queda
+limitada por el tamaño de las colas. cv2.imdecode y los modelos liberan el GIL,
+por lo que los hilos trabajan en paralelo. Al terminar se imprime, por etapa, el
+tiempo ocupado, el tiempo esperando trabajo y el tiempo bloqueada porque la
+etapa siguiente no da abasto: la etapa con mayor utilización es el cuello de botella.
+Las fotos que no pasan el filtro de calidad (filtro_calidad.py) se descartan al
+decodificarlas, sin llegar a la inferencia.
+"""
+import argparse
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from archivo_landmarks import DIRECTORIO_POR_DEFECTO, ArchivoLandmarks
+from filtro_calidad import FiltroCalidad
+
+EXTENSIONES = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Marca de fin de trabajo que cada hilo pasa a la etapa siguiente
+FIN = None
+
+
+def listar_imagenes(rutas):
+    """Expande carpetas a las imágenes que contienen, en orden"""
+    imagenes = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            imagenes.extend(sorted(r for r in glob.glob(os.path.join(ruta, "*")) if r.lower().endswith(EXTENSIONES)))
+        else:
+            imagenes.append(ruta)
+    return imagenes
+
+
+class Etapa:
+    """Grupo de hilos que toma elementos de una cola, los procesa y los deja en la siguiente.
+
+    procesar recibe una lista de elementos (hasta `lote`, los que ya estén
+    esperando en la cola) y los completa en su lugar. Los elementos con
+    'error' pasan de largo sin procesarse. Se mide por hilo el tiempo ocupado y
+    el tiempo esperando en cada cola.
+    """
+
+    def __init__(self, nombre, procesar, hilos=1, lote=1, iniciar_hilo=None):
+        self.nombre = nombre
+        self.procesar = procesar
+        self.hilos = hilos
+        self.lote = lote
+        self.iniciar_hilo = iniciar_hilo
+        self.entrada = None
+        self.salida = None
+        # Marcas de fin a dejar en la salida: una por cada hilo de la etapa siguiente
+        self.fines_salida = 1
+        self.activos = hilos
+        self.cerrojo = threading.Lock()
+        self.procesados = 0
+        self.ocupado = 0.0
+        self.espera_entrada = 0.0
+        self.espera_salida = 0.0
+
+    def tomar(self):
+        """Bloquea hasta tener un elemento y agrega los que ya estén esperando, hasta `lote`"""
+        inicio = time.perf_counter()
+        primero = self.entrada.get()
+        espera = time.perf_counter() - inicio
+        if primero is FIN:
+            return None, espera
+        elementos = [primero]
+        while len(elementos) < self.lote:
+            try:
+                elemento = self.entrada.get_nowait()
+            except queue.Empty:
+                break
+            if elemento is FIN:
+                # Se devuelve la marca para que la vea este mismo hilo en la próxima vuelta
+                self.entrada.put(FIN)
+                break
+            elementos.append(elemento)
+        return elementos, espera
+
+    def trabajar(self, cancelado):
+        contexto = self.iniciar_hilo() if self.iniciar_hilo else None
+        ocupado = espera_entrada = espera_salida = 0.0
+        procesados = 0
+        try:
+            while True:
+                elementos, espera = self.tomar()
+                espera_entrada += espera
+                if elementos is None:
+                    break
+                if cancelado.is_set():
+                    # Cancelado: se vacía la entrada sin procesar hasta la marca de fin, así
+                    # ninguna etapa anterior queda bloqueada en una cola llena
+                    continue
+
+                inicio = time.perf_counter()
+                validos = [e for e in elementos if "error" not in e]
+                if validos:
+                    try:
+                        if self.iniciar_hilo:
+                            self.procesar(validos, contexto)
+                        else:
+                            self.procesar(validos)
+                    except Exception as e:
+                        for elemento in validos:
+                            elemento["error"] = f"{self.nombre}: {e}"
+                ocupado += time.perf_counter() - inicio
+                procesados += len(elementos)
+
+                inicio = time.perf_counter()
+                for elemento in elementos:
+                    self.salida.put(elemento)
+                espera_salida += time.perf_counter() - inicio
+        finally:
+            if contexto is not None and hasattr(contexto, "close"):
+                contexto.close()
+            with self.cerrojo:
+                self.procesados += procesados
+                self.ocupado += ocupado
+                self.espera_entrada += espera_entrada
+                self.espera_salida += espera_salida
+                self.activos -= 1
+                ultimo = self.activos == 0
+            if ultimo:
+                for _ in range(self.fines_salida):
+                    self.salida.put(FIN)
+
+    def estadisticas(self, duracion):
+        disponible = self.hilos * duracion
+        return {
+            "etapa": self.nombre,
+            "hilos": self.hilos,
+            "procesados": self.procesados,
+            "ocupado_s": self.ocupado,
+            "espera_entrada_s": self.espera_entrada,
+            "espera_salida_s": self.espera_salida,
+            "utilizacion": self.ocupado / disponible if disponible > 0 else 0.0
+        }
+
+
+def leer(elementos):
+    for elemento in elementos:
+        try:
+            with open(elemento["ruta"], "rb") as f:
+                elemento["datos"] = f.read()
+        except OSError as e:
+            elemento["error"] = f"lectura: {e}"
+
+
+def crear_decodificacion(filtro=None):
+    """Etapa de decodificación; con un FiltroCalidad las imágenes no aptas no llegan a la inferencia"""
+    def decodificar(elementos):
+        for elemento in elementos:
+            datos = elemento.pop("datos")
+            imagen = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if imagen is None:
+                elemento["error"] = "decodificación: no se pudo leer la imagen"
+                continue
+            if filtro is not None:
+                calidad = filtro.evaluar(imagen)
+                if not calidad["apta"]:
+                    elemento["error"] = "calidad: " + ", ".join(calidad["motivos"])
+                    elemento["calidad"] = calidad
+                    continue
+            elemento["imagen"] = imagen
+
+    return decodificar
+
+
+def inferir_lote(motor, imagenes, recorte=True):
+    """Landmarks de cada imagen (o None) y los detalles del motor, en una llamada por lote"""
+    from recorte_persona import detectar_lote_con_recorte
+
+    if recorte:
+        return [landmarks for landmarks, _ in detectar_lote_con_recorte(motor.process_batch, imagenes)], motor.last_info
+    return motor.process_batch(imagenes), motor.last_info
+
+
+def crear_inferencia(backend, recorte=True, planificador=None, filtro=None, **opciones):
+    """Devuelve (iniciar_hilo, procesar) para la etapa de inferencia.
+
+    Sin planificador cada hilo tiene su propio motor de pose. Con planificador los
+    hilos de la etapa sólo envían cada lote como trabajo de clase "lotes" y esperan
+    el resultado, así los análisis interactivos de la interfaz pasan por delante.
+    """
+    from motor_pose import crear_motor
+
+    def iniciar_hilo():
+        # Los grafos de MediaPipe no se pueden compartir entre hilos
+        return None if planificador is not None else crear_motor(backend, **opciones)
+
+    def procesar(elementos, motor):
+        imagenes = [elemento.pop("imagen") for elemento in elementos]
+        inicio = time.perf_counter()
+        if planificador is not None:
+            detectados, info = planificador.enviar("lotes", inferir_lote, imagenes, recorte).result()
+        else:
+            detectados, info = inferir_lote(motor, imagenes, recorte)
+        if filtro is not None:
+            ms = (time.perf_counter() - inicio) * 1000 / len(imagenes)
+            for _ in imagenes:
+                filtro.registrar_inferencia(ms)
+        for elemento, landmarks in zip(elementos, detectados):
+            if landmarks is None:
+                elemento["error"] = "No se detectó postura en la imagen"
+            else:
+                elemento["landmarks"] = landmarks
+                elemento["model"] = info
+
+    return iniciar_hilo, procesar
+
+
+def puntuar(elementos):
+    """Calcula las proporciones de todo el lote con una sola llamada vectorizada"""
+    from proporciones import CALIBRATION, calculate_proportions_array, compare_proportions
+
+    proporciones = calculate_proportions_array(np.stack([e["landmarks"] for e in elementos]), CALIBRATION)
+    for i, elemento in enumerate(elementos):
+        elemento["proportions"] = {clave: float(valores[i]) for clave, valores in proporciones.items()}
+        elemento["comparison"] = compare_proportions(elemento["proportions"])
+
+
+class PipelineLotes:
+    """Encadena las etapas con colas acotadas y entrega los resultados a medida que salen"""
+
+    def __init__(self, lectores=4, decodificadores=2, inferencia=1, puntuadores=1, tamano_cola=16, lote=8,
+                 backend="mediapipe", recorte=True, planificador=None, filtro=None, **opciones_motor):
+        self.filtro = filtro
+        iniciar_inferencia, inferir = crear_inferencia(backend, recorte, planificador, filtro, **opciones_motor)
+        self.etapas = [
+            Etapa("lectura", leer, lectores),
+            Etapa("decodificación", crear_decodificacion(filtro), decodificadores),
+            Etapa("inferencia", inferir, inferencia, lote=lote, iniciar_hilo=iniciar_inferencia),
+            Etapa("puntuación", puntuar, puntuadores, lote=lote)
+        ]
+        self.colas = [queue.Queue(maxsize=tamano_cola) for _ in range(len(self.etapas) + 1)]
+        for i, etapa in enumerate(self.etapas):
+            etapa.entrada, etapa.salida = self.colas[i], self.colas[i + 1]
+            if i + 1 < len(self.etapas):
+                etapa.fines_salida = self.etapas[i + 1].hilos
+        self.cancelado = threading.Event()
+        self.hilos = []
+        self.duracion = 0.0
+
+    def alimentar(self, rutas):
+        for indice, ruta in enumerate(rutas):
+            if self.cancelado.is_set():
+                break
+            self.colas[0].put({"indice": indice, "ruta": ruta})
+        for _ in range(self.etapas[0].hilos):
+            self.colas[0].put(FIN)
+
+    def ejecutar(self, rutas):
+        """Procesa las rutas y produce cada resultado (diccionario con 'indice' y 'ruta') al terminarlo"""
+        inicio = time.perf_counter()
+        self.hilos = [threading.Thread(target=self.alimentar, args=(rutas,), daemon=True)]
+        for etapa in self.etapas:
+            self.hilos.extend(threading.Thread(target=etapa.trabajar, args=(self.cancelado,), daemon=True)
+                              for _ in range(etapa.hilos))
+        for hilo in self.hilos:
+            hilo.start()
+
+        salida = self.colas[-1]
+        terminado = False
+        try:
+            while True:
+                elemento = salida.get()
+                if elemento is FIN:
+                    terminado = True
+                    break
+                yield elemento
+        finally:
+            # Si se deja de consumir antes del final, las etapas descartan lo que queda; se
+            # vacía la salida hasta la marca de fin para que todos los hilos terminen
+            self.cancelado.set()
+            while not terminado:
+                terminado = salida.get() is FIN
+            self.duracion = time.perf_counter() - inicio
+
+    def estadisticas(self):
+        return [etapa.estadisticas(self.duracion) for etapa in self.etapas]
+
+    def imprimir_estadisticas(self):
+        estadisticas = self.estadisticas()
+        print(f"{'etapa':16}{'hilos':>6}{'elementos':>10}{'ocupado s':>11}{'esperando s':>13}"
+              f"{'bloqueado s':>13}{'utilizacion':>13}")
+        for e in estadisticas:
+            print(f"{e['etapa']:16}{e['hilos']:6d}{e['procesados']:10d}{e['ocupado_s']:11.2f}"
+                  f"{e['espera_entrada_s']:13.2f}{e['espera_salida_s']:13.2f}{e['utilizacion'] * 100:12.0f}%")
+        cuello = max(estadisticas, key=lambda e: e["utilizacion"])
+        print(f"Cuello de botella: {cuello['etapa']} ({cuello['utilizacion'] * 100:.0f}% ocupada)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analiza muchas fotos en etapas paralelas con colas acotadas")
+    parser.add_argument("rutas", nargs="+", help="Carpetas o fotos a analizar")
+    parser.add_argument("--lectores", type=int, default=4, help="Hilos que leen los archivos del disco")
+    parser.add_argument("--decodificadores", type=int, default=2, help="Hilos que decodifican las imágenes")
+    parser.add_argument("--inferencia", type=int, default=1, help="Hilos de inferencia (un modelo por hilo)")
+    parser.add_argument("--puntuadores", type=int, default=1, help="Hilos que calculan las proporciones")
+    parser.add_argument("--cola", type=int, default=16, help="Capacidad de cada cola entre etapas")
+    parser.add_argument("--lote", type=int, default=8, help="Imágenes por lote en inferencia y puntuación")
+    parser.add_argument("--backend", default="mediapipe", help="Backend de pose (mediapipe u onnx)")
+    parser.add_argument("--modelo-onnx", default=None, help="Modelo para el backend ONNX")
+    parser.add_argument("--sin-recorte", action="store_true", help="Inferir sobre la imagen completa")
+    parser.add_argument("--sin-filtro", action="store_true", help="No descartar fotos borrosas, mal expuestas o sin persona")
+    parser.add_argument("--salida", help="Archivo JSON Lines con los resultados (por defecto, sólo el resumen)")
+    parser.add_argument("--guardar", action="store_true", help="Agregar los análisis al archivo de landmarks")
+    parser.add_argument("--archivo", default=DIRECTORIO_POR_DEFECTO, help="Directorio del archivo de landmarks")
+    args = parser.parse_args()
+
+    rutas = listar_imagenes(args.rutas)
+    if not rutas:
+        raise SystemExit("No se encontraron imágenes")
+
+    opciones_motor = {"model_path": args.modelo_onnx} if args.modelo_onnx else {}
+    filtro = None if args.sin_filtro else FiltroCalidad()
+    pipeline = PipelineLotes(args.lectores, args.decodificadores, args.inferencia, args.puntuadores,
+                             args.cola, args.lote, args.backend, not args.sin_recorte, filtro=filtro,
+                             **opciones_motor)
+    archivo = ArchivoLandmarks(args.archivo) if args.guardar else None
+    salida = open(args.salida, "w") if args.salida else None
+    correctas = errores = 0
+    try:
+        for resultado in pipeline.ejecutar(rutas):
+            if "error" in resultado:
+                errores += 1
+                print(f"{resultado['ruta']}: error ({resultado['error']})")
+            else:
+                correctas += 1
+                if archivo is not None:
+                    resultado["registro"] = archivo.agregar(resultado["landmarks"], {
+                        "image_path": resultado["ruta"],
+                        "proportions": resultado["proportions"],
+                        "model": resultado["model"]
+                    })
+            if salida is not None:
+                datos = {clave: valor for clave, valor in resultado.items() if clave != "landmarks"}
+                salida.write(json.dumps(datos, default=float) + "\n")
+    except KeyboardInterrupt:
+        print("Interrumpido")
+    finally:
+        if salida is not None:
+            salida.close()
+
+    print(f"{correctas} imágenes analizadas, {errores} con error, "
+          f"{len(rutas) / pipeline.duracion if pipeline.duracion else 0:.1f} imágenes/s")
+    pipeline.imprimir_estadisticas()
+    if filtro is not None:
+        print(filtro.resumen())
+
+
+if __name__ == "__main__":
+    main()
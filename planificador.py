@@ -0,0 +1,248 @@
+"""Planificador de trabajos de inferencia con clases de prioridad.
+
+Los análisis pedidos desde la interfaz (clase "interactivo"), los trabajos por
+lotes ("lotes") y los recálculos en segundo plano ("fondo") comparten los mismos
+hilos de inferencia. Cuando un hilo se libera toma el trabajo de mayor prioridad
+cuya clase no llegó a su límite de concurrencia; por defecto los lotes y el fondo
+nunca ocupan todos los hilos, así que siempre queda uno libre para la interfaz.
+Un trabajo sube una clase de prioridad por cada ENVEJECIMIENTO_S segundos de
+espera, para que el fondo no quede postergado para siempre.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+CLASES = ("interactivo", "lotes", "fondo")
+PRIORIDADES = {"interactivo": 0, "lotes": 1, "fondo": 2}
+
+# Segundos de espera que hacen subir un trabajo una clase de prioridad
+ENVEJECIMIENTO_S = 30.0
+
+# Mediciones recientes por clase usadas en las métricas
+VENTANA_METRICAS = 1000
+
+
+class Trabajo:
+    __slots__ = ("clase", "funcion", "args", "kwargs", "futuro", "enviado", "iniciado")
+
+    def __init__(self, clase, funcion, args, kwargs):
+        self.clase = clase
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        self.futuro = Future()
+        self.enviado = time.perf_counter()
+        self.iniciado = None
+
+
+def limites_por_defecto(trabajadores):
+    """Lotes y fondo dejan al menos un hilo libre para la interfaz (si hay más de uno)"""
+    reservados = max(1, trabajadores - 1)
+    return {"interactivo": trabajadores, "lotes": reservados, "fondo": max(1, reservados // 2)}
+
+
+class Planificador:
+    """Hilos de inferencia compartidos que atienden los trabajos por clase de prioridad.
+
+    Si se pasa iniciar_hilo, cada hilo crea con él su propio contexto (por
+    ejemplo un motor de pose) y los trabajos se llaman como funcion(contexto, *args).
+    enviar devuelve un concurrent.futures.Future: cancel() descarta el trabajo
+    si todavía no empezó.
+    """
+
+    def __init__(self, trabajadores=2, limites=None, envejecimiento_s=ENVEJECIMIENTO_S, iniciar_hilo=None):
+        self.trabajadores = trabajadores
+        self.limites = dict(limites_por_defecto(trabajadores), **(limites or {}))
+        self.envejecimiento_s = envejecimiento_s
+        self.iniciar_hilo = iniciar_hilo
+        self.colas = {clase: deque() for clase in CLASES}
+        self.ejecutando = {clase: 0 for clase in CLASES}
+        self.condicion = threading.Condition()
+        self.cerrado = False
+        self.esperas = {clase: deque(maxlen=VENTANA_METRICAS) for clase in CLASES}
+        self.ejecuciones = {clase: deque(maxlen=VENTANA_METRICAS) for clase in CLASES}
+        self.contadores = {clase: {"completados": 0, "errores": 0, "cancelados": 0} for clase in CLASES}
+        self.hilos = [threading.Thread(target=self.trabajar, daemon=True) for _ in range(trabajadores)]
+        for hilo in self.hilos:
+            hilo.start()
+
+    def enviar(self, clase, funcion, *args, **kwargs):
+        if clase not in PRIORIDADES:
+            raise ValueError(f"Clase de prioridad desconocida: {clase}")
+        trabajo = Trabajo(clase, funcion, args, kwargs)
+        with self.condicion:
+            if self.cerrado:
+                raise RuntimeError("El planificador está cerrado")
+            self.colas[clase].append(trabajo)
+            self.condicion.notify()
+        return trabajo.futuro
+
+    def cancelar_clase(self, clase):
+        """Cancela todos los trabajos de la clase que todavía no empezaron; devuelve cuántos"""
+        with self.condicion:
+            pendientes = list(self.colas[clase])
+        return sum(1 for trabajo in pendientes if trabajo.futuro.cancel())
+
+    def prioridad(self, trabajo, ahora):
+        return PRIORIDADES[trabajo.clase] - (ahora - trabajo.enviado) / self.envejecimiento_s
+
+    def siguiente(self):
+        """Primer trabajo de la clase con mejor prioridad efectiva que tenga lugar; None si no hay"""
+        ahora = time.perf_counter()
+        elegido = None
+        for clase in CLASES:
+            cola = self.colas[clase]
+            # Los cancelados se descartan al llegar al frente de la cola
+            while cola and cola[0].futuro.cancelled():
+                cola.popleft()
+                self.contadores[clase]["cancelados"] += 1
+            if not cola or self.ejecutando[clase] >= self.limites[clase]:
+                continue
+            # Dentro de una clase el orden es de llegada: basta mirar el primero
+            if elegido is None or self.prioridad(cola[0], ahora) < self.prioridad(elegido, ahora):
+                elegido = cola[0]
+        if elegido is not None:
+            self.colas[elegido.clase].popleft()
+            self.ejecutando[elegido.clase] += 1
+        return elegido
+
+    def trabajar(self):
+        contexto = self.iniciar_hilo() if self.iniciar_hilo else None
+        try:
+            while True:
+                with self.condicion:
+                    trabajo = self.siguiente()
+                    while trabajo is None:
+                        if self.cerrado:
+                            return
+                        self.condicion.wait()
+                        trabajo = self.siguiente()
+                self.ejecutar(trabajo, contexto)
+        finally:
+            if contexto is not None and hasattr(contexto, "close"):
+                contexto.close()
+
+    def ejecutar(self, trabajo, contexto):
+        clase = trabajo.clase
+        if trabajo.futuro.set_running_or_notify_cancel():
+            trabajo.iniciado = time.perf_counter()
+            try:
+                if self.iniciar_hilo:
+                    resultado = trabajo.funcion(contexto, *trabajo.args, **trabajo.kwargs)
+                else:
+                    resultado = trabajo.funcion(*trabajo.args, **trabajo.kwargs)
+            except BaseException as e:
+                trabajo.futuro.set_exception(e)
+                estado = "errores"
+            else:
+                trabajo.futuro.set_result(resultado)
+                estado = "completados"
+            fin = time.perf_counter()
+        else:
+            estado = "cancelados"
+        with self.condicion:
+            self.ejecutando[clase] -= 1
+            self.contadores[clase][estado] += 1
+            if estado != "cancelados":
+                self.esperas[clase].append(trabajo.iniciado - trabajo.enviado)
+                self.ejecuciones[clase].append(fin - trabajo.iniciado)
+            # Se liberó lugar en la clase: puede haber trabajos que esperaban por el límite
+            self.condicion.notify_all()
+
+    def metricas(self):
+        """Por clase: pendientes, en ejecución, contadores y espera / ejecución media y p95 en ms"""
+        with self.condicion:
+            resumen = {}
+            for clase in CLASES:
+                datos = {"pendientes": len(self.colas[clase]), "ejecutando": self.ejecutando[clase]}
+                datos.update(self.contadores[clase])
+                for nombre, valores in (("espera", self.esperas[clase]), ("ejecucion", self.ejecuciones[clase])):
+                    valores = np.array(valores) * 1000
+                    datos[f"{nombre}_media_ms"] = float(valores.mean()) if len(valores) else None
+                    datos[f"{nombre}_p95_ms"] = float(np.percentile(valores, 95)) if len(valores) else None
+                resumen[clase] = datos
+        return resumen
+
+    def resumen(self):
+        lineas = []
+        for clase, datos in self.metricas().items():
+            if datos["completados"] + datos["errores"] + datos["cancelados"] + datos["pendientes"] == 0:
+                continue
+            linea = f"{clase}: {datos['completados']} completados, {datos['pendientes']} pendientes"
+            if datos["espera_media_ms"] is not None:
+                linea += (f", espera media {datos['espera_media_ms']:.0f} ms (p95 {datos['espera_p95_ms']:.0f}),"
+                          f" ejecución media {datos['ejecucion_media_ms']:.0f} ms (p95 {datos['ejecucion_p95_ms']:.0f})")
+            lineas.append(linea)
+        return "\n".join(lineas) or "Sin trabajos"
+
+    def cerrar(self, cancelar_pendientes=True, esperar=True):
+        with self.condicion:
+            self.cerrado = True
+            pendientes = [trabajo for cola in self.colas.values() for trabajo in cola]
+            self.condicion.notify_all()
+        if cancelar_pendientes:
+            for trabajo in pendientes:
+                trabajo.futuro.cancel()
+        if esperar:
+            for hilo in self.hilos:
+                hilo.join()
+
+
+_planificador = None
+_cerrojo = threading.Lock()
+
+
+def planificador_compartido(trabajadores=2, **opciones):
+    """Planificador único del proceso, con un motor de pose por hilo; se crea en el primer uso"""
+    global _planificador
+    with _cerrojo:
+        if _planificador is None:
+            from motor_pose import crear_motor
+
+            _planificador = Planificador(trabajadores, iniciar_hilo=lambda: crear_motor(**opciones))
+        return _planificador
+
+
+def combinar_detalles(intentos, region=None):
+    """Une los detalles del motor de las inferencias hechas sobre una misma imagen.
+
+    Con recorte puede haber dos: la del recorte y el respaldo de cuadro completo.
+    El nivel y la visibilidad son los del último intento; los tiempos se suman.
+    """
+    if not intentos:
+        return None
+    detalles = dict(intentos[-1])
+    detalles['recorte'] = region is not None
+    if len(intentos) > 1:
+        tiempos = {}
+        for intento in intentos:
+            for clave, ms in intento['timings_ms'].items():
+                tiempos[clave] = tiempos.get(clave, 0.0) + ms
+        detalles['timings_ms'] = tiempos
+        detalles['total_ms'] = sum(intento['total_ms'] for intento in intentos)
+        detalles['intentos'] = [{'tier': intento['tier'], 'visibility': intento['visibility'],
+                                 'total_ms': intento['total_ms']} for intento in intentos]
+    return detalles
+
+
+def detectar_pose(motor, imagen, recorte=True, region_previa=None):
+    """Trabajo de análisis de una imagen BGR; devuelve (landmarks o None, detalles del motor)"""
+    from recorte_persona import detectar_con_recorte
+
+    intentos = []
+
+    def detectar(imagen):
+        landmarks = motor.process(imagen)
+        if motor.last_info:
+            intentos.append(motor.last_info)
+        return landmarks
+
+    region = None
+    if recorte:
+        landmarks, region = detectar_con_recorte(detectar, imagen, region_previa=region_previa)
+    else:
+        landmarks = detectar(imagen)
+    return landmarks, combinar_detalles(intentos, region)
@@ -0,0 +1,146 @@
+"""Proporciones corporales a partir de landmarks de pose, sin interfaz gráfica ni modelo.
+
+Los índices de landmarks son los de mediapipe.solutions.pose.PoseLandmark, fijos
+en el formato de 33 puntos, así que los procesos sin interfaz (lotes, video,
+reportes, búsqueda) pueden usar este módulo sin importar Tk ni MediaPipe.
+calculo_imagen_v1 lo reexporta con los mismos nombres.
+
+CALIBRATION son los factores vigentes: los de DEFAULT_CALIBRATION con los
+ajustados por autocalibracion.py (``calibracion.json``) encima, si existen.
+"""
+import json
+import os
+
+import numpy as np
+
+from referencia_poblacion import cargar_referencia
+
+# Índices de PoseLandmark usados en las proporciones
+NOSE = 0
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_HIP = 23
+RIGHT_HIP = 24
+LEFT_KNEE = 25
+RIGHT_KNEE = 26
+LEFT_ANKLE = 27
+RIGHT_ANKLE = 28
+
+# Proporciones corporales saludables promedio
+HEALTHY_PROPORTIONS = {
+    'head_to_body': 1/7.5,
+    'shoulder_to_waist': 1.6,
+    'arm_to_body': 0.4,
+    'leg_to_body': 0.5,
+    'waist_to_hip': 0.75
+}
+
+# Factores de calibración sin ajustar
+DEFAULT_CALIBRATION = {
+    'head': 1.0,
+    'shoulders': 1.0,
+    'waist': 1.0,
+    'hips': 1.0,
+    'knees': 1.0,
+    'ankles': 1.0
+}
+
+RUTA_CALIBRACION = "calibracion.json"
+
+
+def cargar_calibracion(ruta=RUTA_CALIBRACION):
+    """Factores guardados por el último ajuste, o un diccionario vacío si no hay"""
+    if not os.path.exists(ruta):
+        return {}
+    try:
+        with open(ruta, "r") as f:
+            return dict(json.load(f).get("factores", {}))
+    except (OSError, ValueError) as e:
+        print(f"Error cargando calibración: {e}")
+        return {}
+
+
+# Factores de calibración vigentes, con los del último ajuste automático
+CALIBRATION = dict(DEFAULT_CALIBRATION, **cargar_calibracion())
+
+# Grupo de calibración de cada landmark usado en las proporciones
+CALIBRATION_GROUPS = {
+    NOSE: 'head',
+    LEFT_SHOULDER: 'shoulders',
+    RIGHT_SHOULDER: 'shoulders',
+    LEFT_HIP: 'hips',
+    RIGHT_HIP: 'hips',
+    LEFT_KNEE: 'knees',
+    RIGHT_KNEE: 'knees',
+    LEFT_ANKLE: 'ankles',
+    RIGHT_ANKLE: 'ankles'
+}
+
+
+def calculate_proportions_array(landmarks, calibration_factors):
+    """Versión vectorizada de PostureAnalyzer.calculate_proportions.
+
+    landmarks es un arreglo (..., 33, >=2) con coordenadas normalizadas. Los factores
+    de calibración pueden ser escalares o arreglos que se difundan con las dimensiones
+    iniciales de landmarks. Devuelve un diccionario de arreglos con esas dimensiones.
+    """
+    landmarks = np.asarray(landmarks)
+
+    def point(*indices):
+        total = 0
+        for index in indices:
+            group = CALIBRATION_GROUPS.get(index)
+            factor = calibration_factors[group] if group else 1.0
+            factor = np.asarray(factor, dtype=np.float64)[..., None]
+            total = total + landmarks[..., index, :2].astype(np.float64) * factor
+        return total / len(indices)
+
+    def distance(point1, point2):
+        return np.sqrt(((point1 - point2) ** 2).sum(axis=-1))
+
+    head = point(NOSE)
+    neck = point(LEFT_SHOULDER, RIGHT_SHOULDER)
+    shoulder_left = point(LEFT_SHOULDER)
+    shoulder_right = point(RIGHT_SHOULDER)
+    waist = point(LEFT_HIP, RIGHT_HIP)
+    hip_left = point(LEFT_HIP)
+    knee_left = point(LEFT_KNEE)
+    ankle_left = point(LEFT_ANKLE)
+
+    head_height = distance(head, neck)
+    full_height = distance(head, ankle_left)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'head_to_body': head_height / full_height,
+            'shoulder_to_waist': distance(shoulder_left, shoulder_right) / distance(waist, neck),
+            'arm_to_body': distance(shoulder_left, knee_left) / full_height,
+            'leg_to_body': distance(waist, ankle_left) / full_height,
+            'waist_to_hip': distance(waist, hip_left) / distance(hip_left, knee_left)
+        }
+
+
+def compare_proportions(proportions):
+    """Compara unas proporciones con los promedios saludables.
+
+    Si existe una población de referencia, la medida saludable es su mediana y se
+    agrega el percentil de cada proporción; si no, se usan HEALTHY_PROPORTIONS.
+    """
+    reference = cargar_referencia()
+    comparison = {}
+    for key, value in proportions.items():
+        healthy = HEALTHY_PROPORTIONS[key]
+        percentile = None
+        if reference is not None and reference.tabla(key) is not None:
+            healthy = reference.mediana(key)
+            percentile = reference.percentil(key, value)
+        difference = value - healthy
+        percentage = (difference / healthy) * 100
+        comparison[key] = {
+            'yours': value,
+            'healthy': healthy,
+            'difference': difference,
+            'percentage': percentage,
+            'percentile': percentile
+        }
+    return comparison
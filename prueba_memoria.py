@@ -0,0 +1,302 @@
+"""Prueba de memoria de sesiones largas para las aplicaciones Tk.
+
+Uso:
+    python prueba_memoria.py [--app v1,v2,v3,salud] [--ciclos 2000] [--imagen foto.jpg]
+                             [--umbral-kb 2] [--umbral-rss-kb 16]
+
+Cada aplicación corre en su propio proceso y repite miles de ciclos de
+cargar / analizar / comparar / calcular como lo haría un usuario. Tras unos
+ciclos de calentamiento se toman muestras de la memoria residente (RSS) y de
+la memoria asignada por Python (tracemalloc); si el crecimiento por ciclo,
+estimado con una recta de mínimos cuadrados, pasa el umbral, la prueba falla
+y se listan las líneas de código que más memoria acumularon.
+
+Sin DISPLAY se abre una pantalla virtual con pyvirtualdisplay (requiere Xvfb).
+Los diálogos de messagebox se responden solos y todo se escribe en un
+directorio temporal, así que no se tocan el historial ni el archivo de landmarks.
+El archivo de landmarks de v1 y v3 sólo guarda el primer análisis: si creciera
+en cada ciclo, él y el índice de poses se contarían como fuga.
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+APLICACIONES = ("v1", "v2", "v3", "salud")
+DIRECTORIO_PROYECTO = os.path.dirname(os.path.abspath(__file__))
+
+
+def rss_actual():
+    """Memoria residente actual del proceso en bytes, o None si no se puede medir"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def pendiente(x, y):
+    """Pendiente de la recta de mínimos cuadrados (crecimiento por ciclo)"""
+    if len(x) < 2:
+        return 0.0
+    return float(np.polyfit(np.asarray(x, dtype=float), np.asarray(y, dtype=float), 1)[0])
+
+
+def iniciar_pantalla():
+    """Abre una pantalla virtual si no hay una disponible; devuelve el objeto a cerrar o None"""
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        return None
+    try:
+        from pyvirtualdisplay import Display
+    except ImportError:
+        raise SystemExit("No hay DISPLAY: instale Xvfb y pyvirtualdisplay (pip install pyvirtualdisplay)")
+    try:
+        pantalla = Display(visible=False, size=(1280, 1024))
+        pantalla.start()
+    except FileNotFoundError:
+        raise SystemExit("No hay DISPLAY y no se encontró Xvfb para la pantalla virtual")
+    return pantalla
+
+
+def silenciar_dialogos():
+    # Los diálogos modales bloquearían la prueba: se responden automáticamente
+    from tkinter import messagebox
+    for nombre in ("showinfo", "showwarning", "showerror"):
+        setattr(messagebox, nombre, lambda *args, **kwargs: "ok")
+    messagebox.askyesno = lambda *args, **kwargs: True
+
+
+def imagen_sintetica(ruta):
+    """Silueta oscura sobre fondo claro: suficiente para el análisis por contornos de v2"""
+    imagen = np.full((600, 400, 3), 235, dtype=np.uint8)
+    cv2.circle(imagen, (200, 80), 40, (40, 40, 40), -1)
+    cv2.rectangle(imagen, (140, 120), (260, 330), (40, 40, 40), -1)
+    cv2.rectangle(imagen, (150, 330), (195, 560), (40, 40, 40), -1)
+    cv2.rectangle(imagen, (205, 330), (250, 560), (40, 40, 40), -1)
+    cv2.imwrite(ruta, imagen)
+    return ruta
+
+
+def landmarks_sinteticos():
+    """Landmarks fijos con forma de persona de pie, para cuando el modelo no detecta a nadie"""
+    generador = np.random.default_rng(0)
+    landmarks = np.zeros((33, 4), dtype=np.float32)
+    landmarks[:, 0] = 0.5 + generador.uniform(-0.15, 0.15, 33)
+    landmarks[:, 1] = np.linspace(0.1, 0.95, 33)
+    landmarks[:, 3] = 1.0
+    return landmarks
+
+
+def guardar_una_vez(archivo):
+    """Hace que el archivo de landmarks guarde sólo el primer análisis y devuelva ese registro después"""
+    agregar = archivo.agregar
+
+    def agregar_primero(landmarks, reporte=None):
+        if len(archivo):
+            return len(archivo) - 1
+        return agregar(landmarks, reporte)
+
+    archivo.agregar = agregar_primero
+
+
+def bombear(raiz, veces=3):
+    # Procesa eventos pendientes, incluidos los after() de la carga progresiva
+    for _ in range(veces):
+        raiz.update()
+        time.sleep(0.002)
+
+
+def conductor_v1(imagen):
+    import calculo_imagen_v1 as v1
+
+    app = v1.PostureAnalyzer()
+    guardar_una_vez(app.archive)
+    sinteticos = landmarks_sinteticos()
+
+    def ciclo(i):
+        app.image_path = imagen
+        app.display_image(imagen)
+        bombear(app)
+        try:
+            app.analyze_posture()
+        except ValueError:
+            app.landmarks = sinteticos
+            app.calculate_proportions()
+        app.show_results(app.generate_report())
+        bombear(app)
+
+    return app, ciclo
+
+
+def conductor_v2(imagen):
+    import tkinter as tk
+    import calculo_imagen_v2 as v2
+
+    raiz = tk.Tk()
+    app = v2.App(raiz)
+    original = cv2.imread(imagen)
+
+    def ciclo(i):
+        app.imagen_original = original
+        app.mostrar_imagen(original)
+        app.analizar_imagen()
+        app.mostrar_comparacion()
+        bombear(raiz)
+
+    return raiz, ciclo
+
+
+def conductor_v3(imagen):
+    import tkinter as tk
+    import calculo_imagen_v3 as v3
+
+    raiz = tk.Tk()
+    app = v3.PostureAnalyzerApp(raiz)
+    guardar_una_vez(app.archive)
+    original = cv2.imread(imagen)
+    sinteticos = app.extract_landmarks(landmarks_sinteticos(), original.shape)
+
+    def ciclo(i):
+        app.image_path = imagen
+        app.show_image()
+        bombear(raiz)
+        app.process_image()
+        # El análisis corre en el planificador: se espera a que la interfaz lo recoja
+        while app.analysis_job is not None:
+            bombear(raiz, 1)
+        if not app.landmarks:
+            app.landmarks = list(sinteticos)
+            app.draw_landmarks()
+            app.calculate_proportions()
+        app.show_comparison()
+        if i % 10 == 0:
+            app.toggle_calibration()
+            app.toggle_calibration()
+        bombear(raiz)
+
+    return raiz, ciclo
+
+
+def conductor_salud(imagen):
+    import tkinter as tk
+    import Trabajo_En_Clase as salud
+
+    raiz = tk.Tk()
+    app = salud.CalculadoraSaludApp(raiz)
+    tipos = ("barras", "radar", "medidor")
+
+    def ciclo(i):
+        app.peso.set(60 + i % 40)
+        app.tipo_grafico.set(tipos[i % len(tipos)])
+        app.calcular_salud()
+        # El historial crece a propósito; se borra cada tanto para medir sólo lo que no debería crecer
+        if i % 50 == 49:
+            app.borrar_historial()
+        bombear(raiz)
+
+    return raiz, ciclo
+
+
+CONDUCTORES = {"v1": conductor_v1, "v2": conductor_v2, "v3": conductor_v3, "salud": conductor_salud}
+
+
+def medir(nombre, imagen, ciclos, calentamiento, muestras, directorio):
+    """Corre los ciclos de una aplicación y devuelve el crecimiento de memoria por ciclo"""
+    # Cada aplicación escribe sus archivos en un directorio temporal propio
+    sys.path.insert(0, DIRECTORIO_PROYECTO)
+    os.chdir(directorio)
+    silenciar_dialogos()
+    raiz, ciclo = CONDUCTORES[nombre](imagen)
+
+    for i in range(calentamiento):
+        ciclo(i)
+    gc.collect()
+    tracemalloc.start(10)
+    inicial = tracemalloc.take_snapshot()
+
+    intervalo = max(1, ciclos // muestras)
+    puntos, rss, asignada = [], [], []
+    inicio = time.perf_counter()
+    for i in range(ciclos):
+        ciclo(calentamiento + i)
+        if i % intervalo == 0 or i == ciclos - 1:
+            gc.collect()
+            puntos.append(i)
+            rss.append(rss_actual() or 0)
+            asignada.append(tracemalloc.get_traced_memory()[0])
+    duracion = time.perf_counter() - inicio
+
+    final = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    acumulado = [str(diferencia) for diferencia in final.compare_to(inicial, "lineno")[:10]]
+    raiz.destroy()
+
+    return {
+        "app": nombre,
+        "ciclos": ciclos,
+        "segundos_por_ciclo": duracion / ciclos,
+        "rss_inicial_mb": rss[0] / (1024 * 1024),
+        "rss_final_mb": rss[-1] / (1024 * 1024),
+        "crecimiento_rss_kb": pendiente(puntos, rss) / 1024,
+        "crecimiento_python_kb": pendiente(puntos, asignada) / 1024,
+        "mayores_acumulaciones": acumulado
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de memoria de sesiones largas de las aplicaciones Tk")
+    parser.add_argument("--app", default=",".join(APLICACIONES), help="Aplicaciones a probar, separadas por coma")
+    parser.add_argument("--ciclos", type=int, default=2000)
+    parser.add_argument("--calentamiento", type=int, default=100)
+    parser.add_argument("--muestras", type=int, default=50, help="Cantidad de mediciones durante la prueba")
+    parser.add_argument("--imagen", help="Foto a usar (por defecto, una silueta sintética)")
+    parser.add_argument("--umbral-kb", type=float, default=2.0, help="Crecimiento máximo de memoria Python por ciclo")
+    parser.add_argument("--umbral-rss-kb", type=float, default=16.0, help="Crecimiento máximo de RSS por ciclo")
+    args = parser.parse_args()
+
+    pantalla = iniciar_pantalla()
+    directorio = tempfile.mkdtemp(prefix="prueba_memoria_")
+    contexto = multiprocessing.get_context("spawn")
+    fallidas = []
+    try:
+        imagen = os.path.abspath(args.imagen) if args.imagen else imagen_sintetica(os.path.join(directorio, "silueta.png"))
+        for nombre in args.app.split(","):
+            with contexto.Pool(1) as pool:
+                resultado = pool.apply(medir, (nombre, imagen, args.ciclos, args.calentamiento, args.muestras,
+                                               tempfile.mkdtemp(prefix=f"{nombre}_", dir=directorio)))
+            excedida = (resultado["crecimiento_python_kb"] > args.umbral_kb
+                        or resultado["crecimiento_rss_kb"] > args.umbral_rss_kb)
+            print(f"{nombre}: {resultado['ciclos']} ciclos, {resultado['segundos_por_ciclo'] * 1000:.1f} ms/ciclo, "
+                  f"RSS {resultado['rss_inicial_mb']:.0f} -> {resultado['rss_final_mb']:.0f} MB, "
+                  f"crecimiento {resultado['crecimiento_python_kb']:.2f} KB/ciclo (Python), "
+                  f"{resultado['crecimiento_rss_kb']:.2f} KB/ciclo (RSS) -> {'FALLA' if excedida else 'OK'}")
+            if excedida:
+                fallidas.append(nombre)
+                for linea in resultado["mayores_acumulaciones"]:
+                    print(f"    {linea}")
+    finally:
+        if pantalla is not None:
+            pantalla.stop()
+        # Borra la imagen sintética y los directorios de trabajo de cada aplicación
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    sys.exit(1 if fallidas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import numpy as np
+
+from motor_siluetas import silueta
+
+# Lado mayor de la imagen reducida sobre la que se busca la silueta
+TAMANO_ANALISIS = 256
+
+# Landmarks del cuerpo usados para juzgar la visibilidad (hombros a tobillos)
+LANDMARKS_CUERPO = [11, 12, 23, 24, 25, 26, 27, 28]
+
+
+def detectar_region_persona(imagen, tamano_analisis=TAMANO_ANALISIS):
+    """Busca la región de la persona con la silueta de mayor área (como calculo_imagen_v2).
+
+    Trabaja sobre una versión reducida de la imagen, así que cuesta unos pocos
+    milisegundos. Devuelve ((x, y, ancho, alto) en píxeles de la imagen completa,
+    confianza entre 0 y 1), o (None, 0.0) si no encuentra ninguna silueta.
+    """
+    region, area = silueta(imagen, tamano_analisis)
+    if region is None:
+        return None, 0.0
+
+    alto, ancho = imagen.shape[:2]
+    _, _, w, h = region
+    fraccion = (w * h) / float(alto * ancho)
+    # Una silueta que ocupa casi todo el cuadro suele ser el fondo mal umbralizado
+    if w == 0 or h == 0 or fraccion < 0.02 or fraccion > 0.9:
+        confianza = 0.0
+    else:
+        confianza = min(1.0, area / float(w * h))
+    return region, float(confianza)
+
+
+def region_desde_landmarks(landmarks, forma_imagen, visibilidad_minima=0.5):
+    """Caja (x, y, ancho, alto) en píxeles que contiene los landmarks visibles de un cuadro anterior"""
+    landmarks = np.asarray(landmarks)
+    visibles = landmarks[landmarks[:, 3] >= visibilidad_minima] if landmarks.shape[1] > 3 else landmarks
+    if len(visibles) == 0:
+        return None
+    alto, ancho = forma_imagen[:2]
+    x0, y0 = visibles[:, 0].min() * ancho, visibles[:, 1].min() * alto
+    x1, y1 = visibles[:, 0].max() * ancho, visibles[:, 1].max() * alto
+    return int(x0), int(y0), int(np.ceil(x1 - x0)), int(np.ceil(y1 - y0))
+
+
+def expandir_region(region, forma_imagen, margen=0.25):
+    """Agrega un margen relativo a la región y la recorta a los límites de la imagen"""
+    alto, ancho = forma_imagen[:2]
+    x, y, w, h = region
+    dx, dy = int(w * margen), int(h * margen)
+    x0, y0 = max(0, x - dx), max(0, y - dy)
+    x1, y1 = min(ancho, x + w + dx), min(alto, y + h + dy)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def inferir_en_region(detectar, imagen, region):
+    """Ejecuta detectar() sobre el recorte y devuelve los landmarks en coordenadas de la imagen completa"""
+    x, y, w, h = region
+    landmarks = detectar(imagen[y:y + h, x:x + w])
+    if landmarks is None:
+        return None
+    return reproyectar_landmarks(landmarks, region, imagen.shape)
+
+
+def reproyectar_landmarks(landmarks, region, forma_imagen):
+    """Pasa landmarks normalizados al recorte `region` a coordenadas normalizadas de la imagen completa"""
+    alto, ancho = forma_imagen[:2]
+    x, y, w, h = region
+    landmarks = np.array(landmarks, dtype=np.float32)
+    landmarks[:, 0] = (landmarks[:, 0] * w + x) / ancho
+    landmarks[:, 1] = (landmarks[:, 1] * h + y) / alto
+    # MediaPipe expresa z en la misma escala que x
+    landmarks[:, 2] = landmarks[:, 2] * w / ancho
+    return landmarks
+
+
+def visibilidad_cuerpo(landmarks):
+    return float(np.mean(np.asarray(landmarks)[LANDMARKS_CUERPO, 3]))
+
+
+def detectar_con_recorte(detectar, imagen, region_previa=None, confianza_minima=0.5,
+                         visibilidad_minima=0.5, margen=0.25):
+    """Ejecuta la inferencia sólo sobre la región de la persona, con respaldo de cuadro completo.
+
+    detectar es una función que recibe una imagen BGR y devuelve landmarks (33, 4)
+    normalizados o None. La región sale de region_previa (por ejemplo la caja de
+    los landmarks del cuadro anterior) o de la silueta. Si la región es poco
+    confiable o los landmarks del recorte tienen baja visibilidad, se repite la
+    inferencia sobre la imagen completa. Devuelve (landmarks o None, región usada o None).
+    """
+    if region_previa is not None:
+        region, confianza = region_previa, 1.0
+    else:
+        region, confianza = detectar_region_persona(imagen)
+
+    if region is not None and confianza >= confianza_minima:
+        region = expandir_region(region, imagen.shape, margen)
+        if region[2] > 0 and region[3] > 0:
+            landmarks = inferir_en_region(detectar, imagen, region)
+            if landmarks is not None and visibilidad_cuerpo(landmarks) >= visibilidad_minima:
+                return landmarks, region
+
+    return detectar(imagen), None
+
+
+def detectar_lote_con_recorte(detectar_lote, imagenes, confianza_minima=0.5, visibilidad_minima=0.5, margen=0.25):
+    """Como detectar_con_recorte, pero para una lista de imágenes y un detector por lotes.
+
+    detectar_lote recibe una lista de imágenes BGR y devuelve la lista de landmarks
+    (o None). Los recortes confiables se infieren en un lote y las imágenes que
+    necesitan el respaldo de cuadro completo, en un segundo lote. Devuelve la
+    lista de (landmarks o None, región usada o None).
+    """
+    resultados = [(None, None)] * len(imagenes)
+    recortes, pendientes = [], []
+    for i, imagen in enumerate(imagenes):
+        region, confianza = detectar_region_persona(imagen)
+        if region is not None and confianza >= confianza_minima:
+            region = expandir_region(region, imagen.shape, margen)
+            if region[2] > 0 and region[3] > 0:
+                recortes.append((i, region))
+                continue
+        pendientes.append(i)
+
+    if recortes:
+        detectados = detectar_lote([imagenes[i][y:y + h, x:x + w] for i, (x, y, w, h) in recortes])
+        for (i, region), landmarks in zip(recortes, detectados):
+            if landmarks is not None:
+                landmarks = reproyectar_landmarks(landmarks, region, imagenes[i].shape)
+                if visibilidad_cuerpo(landmarks) >= visibilidad_minima:
+                    resultados[i] = (landmarks, region)
+                    continue
+            pendientes.append(i)
+
+    if pendientes:
+        pendientes.sort()
+        for i, landmarks in zip(pendientes, detectar_lote([imagenes[i] for i in pendientes])):
+            resultados[i] = (landmarks, None)
+    return resultados
@@ -0,0 +1,130 @@
+import csv
+import os
+
+import numpy as np
+
+RUTA_REFERENCIA = "poblacion_referencia.csv"
+
+# Límites inferiores de las bandas de edad usadas para estratificar
+BANDAS_EDAD = [0, 18, 30, 40, 50, 60, 70]
+
+# Tamaño máximo de cada tabla de cuantiles; con más muestras se resume la distribución
+TAMANO_TABLA = 1001
+
+# Muestras mínimas para usar un estrato en lugar de uno más general
+MIN_MUESTRAS = 30
+
+
+def banda_edad(edad):
+    """Devuelve la etiqueta de la banda de edad, por ejemplo '30-39'"""
+    indice = int(np.searchsorted(BANDAS_EDAD, edad, side="right")) - 1
+    inicio = BANDAS_EDAD[max(indice, 0)]
+    if indice + 1 < len(BANDAS_EDAD):
+        return f"{inicio}-{BANDAS_EDAD[indice + 1] - 1}"
+    return f"{inicio}+"
+
+
+class ReferenciaPoblacion:
+    """Tablas de cuantiles por métrica calculadas a partir de una población de referencia.
+
+    El CSV tiene una columna por métrica (por ejemplo ``imc``, ``head_to_body`` o
+    ``proporcion_altura_ancho``) y, opcionalmente, ``edad`` y ``genero`` para
+    estratificar. Cada tabla está ordenada, así que el percentil de un valor se
+    obtiene por búsqueda binaria.
+    """
+
+    def __init__(self, tablas):
+        # tablas: {(metrica, banda_edad o None, genero o None): arreglo ordenado}
+        self.tablas = tablas
+
+    @classmethod
+    def desde_csv(cls, ruta, tamano_tabla=TAMANO_TABLA):
+        valores = {}
+        with open(ruta, "r", newline="") as f:
+            lector = csv.DictReader(f)
+            for fila in lector:
+                edad = fila.pop("edad", "") or ""
+                genero = (fila.pop("genero", "") or "").strip() or None
+                banda = banda_edad(float(edad)) if edad.strip() else None
+                for metrica, texto in fila.items():
+                    if metrica is None or not texto or not texto.strip():
+                        continue
+                    try:
+                        valor = float(texto)
+                    except ValueError:
+                        continue
+                    estratos = {(None, None), (banda, None), (None, genero), (banda, genero)}
+                    for estrato_banda, estrato_genero in estratos:
+                        valores.setdefault((metrica, estrato_banda, estrato_genero), []).append(valor)
+
+        tablas = {}
+        for clave, lista in valores.items():
+            ordenados = np.sort(np.asarray(lista, dtype=np.float64))
+            if len(ordenados) > tamano_tabla:
+                ordenados = np.quantile(ordenados, np.linspace(0, 1, tamano_tabla))
+            tablas[clave] = ordenados
+        return cls(tablas)
+
+    def metricas(self):
+        return sorted({metrica for metrica, _, _ in self.tablas})
+
+    def tabla(self, metrica, edad=None, genero=None):
+        """Devuelve la tabla del estrato más específico con suficientes muestras"""
+        banda = banda_edad(edad) if edad is not None else None
+        for clave in ((metrica, banda, genero), (metrica, banda, None), (metrica, None, genero), (metrica, None, None)):
+            tabla = self.tablas.get(clave)
+            if tabla is not None and (len(tabla) >= MIN_MUESTRAS or clave[1:] == (None, None)):
+                return tabla
+        return None
+
+    def percentiles(self, metrica, valores, edad=None, genero=None):
+        """Percentil (0-100) de cada valor dentro de la población; NaN si no hay datos"""
+        valores = np.asarray(valores, dtype=np.float64)
+        tabla = self.tabla(metrica, edad, genero)
+        if tabla is None or len(tabla) == 0:
+            return np.full(valores.shape, np.nan)
+        if len(tabla) == 1:
+            return np.where(valores < tabla[0], 0.0, 100.0)
+        # np.interp localiza cada valor en la tabla ordenada por búsqueda binaria
+        resultado = np.interp(valores, tabla, np.linspace(0, 100, len(tabla)))
+        # Un valor repetido en la tabla (IMC o medidas redondeadas) toma la posición
+        # media de su bloque, no la última como daría np.interp
+        izquierda = np.searchsorted(tabla, valores, "left")
+        derecha = np.searchsorted(tabla, valores, "right")
+        repetidos = derecha > izquierda
+        return np.where(repetidos, 100 * (izquierda + derecha - 1) / 2 / (len(tabla) - 1), resultado)
+
+    def percentil(self, metrica, valor, edad=None, genero=None):
+        return float(self.percentiles(metrica, [valor], edad, genero)[0])
+
+    def valor_en_percentil(self, metrica, percentil, edad=None, genero=None):
+        """Valor de la métrica en el percentil dado; None si no hay datos"""
+        tabla = self.tabla(metrica, edad, genero)
+        if tabla is None or len(tabla) == 0:
+            return None
+        return float(np.interp(percentil, np.linspace(0, 100, len(tabla)), tabla))
+
+    def mediana(self, metrica, edad=None, genero=None):
+        return self.valor_en_percentil(metrica, 50, edad, genero)
+
+
+_referencia_cargada = {}
+
+
+def cargar_referencia(ruta=RUTA_REFERENCIA):
+    """Carga (una sola vez por ruta y fecha de modificación) la población de referencia.
+
+    Devuelve None si el archivo no existe, en cuyo caso las aplicaciones siguen
+    usando sus constantes saludables fijas.
+    """
+    if not os.path.exists(ruta):
+        return None
+    clave = (os.path.abspath(ruta), os.path.getmtime(ruta))
+    if clave not in _referencia_cargada:
+        try:
+            _referencia_cargada.clear()
+            _referencia_cargada[clave] = ReferenciaPoblacion.desde_csv(ruta)
+        except Exception as e:
+            print(f"Error cargando población de referencia: {e}")
+            return None
+    return _referencia_cargada[clave]
@@ -0,0 +1,203 @@
+"""Cálculos de salud (IMC, metabolismo basal, calorías y recomendaciones) sin interfaz gráfica.
+
+Uso como filtro de línea de comandos, una persona por línea en JSON Lines:
+    python salud.py [personas.jsonl] [--trabajadores N] [--bloque 2000] > resultados.jsonl
+
+Cada línea de entrada tiene peso (kg), altura (m), edad, genero y actividad; cada
+línea de salida agrega imc, bmr, calorias, clasificacion y recomendacion (o
+"error" si la línea no se pudo procesar). Las líneas se procesan por bloques y,
+con varios trabajadores, sólo hay unos pocos bloques en vuelo a la vez, así que
+la memoria no crece con el tamaño de la entrada. Este módulo no importa Tk.
+"""
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+FACTORES_ACTIVIDAD = {
+    "Sedentario": 1.2,
+    "Ligero": 1.375,
+    "Moderado": 1.55,
+    "Intenso": 1.725,
+    "Muy intenso": 1.9
+}
+
+# Versión de calcular_metricas y FACTORES_ACTIVIDAD: al cambiarlas hay que subirla para
+# que las métricas del historial se recalculen (ver metricas_versionadas.py)
+VERSION_FORMULA = 1
+
+# Líneas por bloque enviado a cada trabajador
+TAMANO_BLOQUE = 2000
+
+
+def calcular_metricas(peso, altura, edad, genero, actividad):
+    """Devuelve (imc, bmr, calorias) con la fórmula de Harris-Benedict revisada"""
+    imc = peso / (altura ** 2)
+    if genero == "Masculino":
+        bmr = 88.362 + (13.397 * peso) + (4.799 * altura * 100) - (5.677 * edad)
+    else:
+        bmr = 447.593 + (9.247 * peso) + (3.098 * altura * 100) - (4.330 * edad)
+    calorias = bmr * FACTORES_ACTIVIDAD.get(actividad, 1.2)
+    return imc, bmr, calorias
+
+
+def calcular_metricas_arreglos(peso, altura, edad, genero, actividad):
+    """Versión vectorizada de calcular_metricas: recibe secuencias del mismo largo y devuelve tres arreglos"""
+    peso = np.asarray(peso, dtype=np.float64)
+    altura = np.asarray(altura, dtype=np.float64)
+    edad = np.asarray(edad, dtype=np.float64)
+    masculino = np.asarray(genero, dtype=object) == "Masculino"
+    with np.errstate(divide='ignore', invalid='ignore'):
+        imc = peso / (altura ** 2)
+    bmr = np.where(masculino,
+                   88.362 + (13.397 * peso) + (4.799 * altura * 100) - (5.677 * edad),
+                   447.593 + (9.247 * peso) + (3.098 * altura * 100) - (4.330 * edad))
+    # Un factor por nivel de actividad distinto, no por fila
+    niveles, posiciones = np.unique(np.asarray(actividad, dtype=str), return_inverse=True)
+    factores = np.array([FACTORES_ACTIVIDAD.get(nivel, 1.2) for nivel in niveles])
+    calorias = bmr * factores[posiciones.reshape(-1)]
+    return imc, bmr, calorias
+
+
+def clasificar_imc(imc):
+    if imc < 18.5:
+        return "Bajo peso"
+    elif imc < 25:
+        return "Peso normal"
+    elif imc < 30:
+        return "Sobrepeso"
+    return "Obesidad"
+
+
+def generar_texto_recomendacion(imc, edad, genero, actividad):
+    """Texto de recomendaciones según IMC, edad, género y nivel de actividad"""
+    if imc < 18.5:
+        recomendacion = (
+            f"Su IMC de {imc:.2f} indica bajo peso.\n"
+            "Recomendaciones:\n"
+            "- Consuma alimentos ricos en nutrientes y calorías.\n"
+            "- Realice ejercicios de fuerza para ganar masa muscular.\n"
+            "- Consulte a un nutricionista para un plan personalizado.\n"
+        )
+    elif imc < 25:
+        recomendacion = (
+            f"Su IMC de {imc:.2f} se encuentra en un rango saludable.\n"
+            "Recomendaciones:\n"
+            "- Mantenga una dieta balanceada.\n"
+            "- Continúe con su nivel de actividad física actual.\n"
+            "- Realice chequeos médicos periódicos.\n"
+        )
+    elif imc < 30:
+        recomendacion = (
+            f"Su IMC de {imc:.2f} indica sobrepeso.\n"
+            "Recomendaciones:\n"
+            "- Reduzca el consumo de alimentos procesados y azúcares.\n"
+            "- Aumente su actividad física gradualmente.\n"
+            "- Consuma más frutas, verduras y proteínas magras.\n"
+        )
+    else:
+        recomendacion = (
+            f"Su IMC de {imc:.2f} indica obesidad.\n"
+            "Recomendaciones:\n"
+            "- Es importante consultar a un médico para evaluación.\n"
+            "- Considere un plan de alimentación supervisado.\n"
+            "- Incorpore ejercicio regular adaptado a sus capacidades.\n"
+        )
+    if edad > 50:
+        recomendacion += "\nPara su edad:\n- Realice ejercicios de bajo impacto.\n- Asegure suficiente ingesta de calcio y vitamina D.\n"
+    if genero == "Femenino" and edad > 40:
+        recomendacion += "\nAdicionalmente:\n- Considere exámenes de densidad ósea periódicos.\n"
+    if actividad == "Sedentario":
+        recomendacion += "\nDebido a su bajo nivel de actividad:\n- Comience con caminatas diarias de 15-30 minutos.\n"
+    return recomendacion
+
+
+def procesar_registro(registro, con_recomendacion=True):
+    """Agrega las métricas calculadas a un registro con peso, altura, edad, genero y actividad"""
+    peso = float(registro["peso"])
+    altura = float(registro["altura"])
+    edad = int(registro.get("edad", 0))
+    genero = registro.get("genero", "")
+    actividad = registro.get("actividad", "")
+    imc, bmr, calorias = calcular_metricas(peso, altura, edad, genero, actividad)
+    resultado = dict(registro)
+    resultado.update({"imc": imc, "bmr": bmr, "calorias": calorias, "clasificacion": clasificar_imc(imc)})
+    if con_recomendacion:
+        resultado["recomendacion"] = generar_texto_recomendacion(imc, edad, genero, actividad)
+    return resultado
+
+
+def procesar_lineas(lineas, con_recomendacion=True):
+    """Procesa un bloque de líneas JSON y devuelve la salida del bloque ya serializada"""
+    salida = []
+    for linea in lineas:
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            resultado = procesar_registro(json.loads(linea), con_recomendacion)
+        except KeyError as e:
+            resultado = {"error": f"falta el campo {e}", "entrada": linea}
+        except (ValueError, TypeError, ZeroDivisionError, AttributeError) as e:
+            resultado = {"error": str(e) or type(e).__name__, "entrada": linea}
+        salida.append(json.dumps(resultado, ensure_ascii=False))
+    return "\n".join(salida) + "\n" if salida else ""
+
+
+def bloques(entrada, tamano):
+    while True:
+        bloque = list(islice(entrada, tamano))
+        if not bloque:
+            return
+        yield bloque
+
+
+def procesar_flujo(entrada, salida, trabajadores=1, tamano_bloque=TAMANO_BLOQUE, con_recomendacion=True):
+    """Lee líneas de `entrada` y escribe los resultados en `salida`, en el mismo orden.
+
+    Con más de un trabajador se mantienen como máximo 2 bloques por proceso en
+    vuelo; el siguiente bloque se lee recién cuando se escribe el más antiguo.
+    """
+    if trabajadores <= 1:
+        for bloque in bloques(entrada, tamano_bloque):
+            salida.write(procesar_lineas(bloque, con_recomendacion))
+        return
+
+    with ProcessPoolExecutor(max_workers=trabajadores) as pool:
+        en_vuelo = deque()
+        for bloque in bloques(entrada, tamano_bloque):
+            en_vuelo.append(pool.submit(procesar_lineas, bloque, con_recomendacion))
+            if len(en_vuelo) >= trabajadores * 2:
+                salida.write(en_vuelo.popleft().result())
+        while en_vuelo:
+            salida.write(en_vuelo.popleft().result())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcula IMC, metabolismo, calorías y recomendaciones desde JSON Lines")
+    parser.add_argument("entrada", nargs="?", help="Archivo JSON Lines (por defecto, la entrada estándar)")
+    parser.add_argument("--trabajadores", type=int, default=1, help="Procesos a usar (0 = todos los núcleos)")
+    parser.add_argument("--bloque", type=int, default=TAMANO_BLOQUE, help="Líneas por bloque")
+    parser.add_argument("--sin-recomendacion", action="store_true", help="No incluir el texto de recomendación")
+    args = parser.parse_args()
+
+    trabajadores = args.trabajadores or os.cpu_count() or 1
+    entrada = open(args.entrada, "r", encoding="utf-8") if args.entrada else sys.stdin
+    try:
+        procesar_flujo(entrada, sys.stdout, trabajadores, args.bloque, not args.sin_recomendacion)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # La salida se cerró antes de tiempo (por ejemplo, con `| head`)
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+
+
+if __name__ == "__main__":
+    main()
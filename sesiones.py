@@ -0,0 +1,77 @@
+"""Archivos de sesión para reabrir un análisis de postura sin volver a decodificar ni inferir.
+
+Formato (un solo archivo):
+    MAGIA (8 bytes) | largo del encabezado (uint32 little-endian) | encabezado JSON |
+    arreglos crudos, cada uno alineado a ALINEACION bytes
+
+El encabezado guarda los metadatos de la sesión (rutas, calibración, proporciones)
+y, por cada arreglo, su dtype, forma y posición en el archivo, así que abrir una
+sesión sólo lee el encabezado y mapea los arreglos en memoria con ``np.memmap``.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIA = b"POSESES\x01"
+ALINEACION = 64
+EXTENSION = ".sesion"
+TIPOS_ARCHIVO = [("Sesiones de postura", "*" + EXTENSION)]
+
+
+def _alinear(posicion):
+    return (posicion + ALINEACION - 1) // ALINEACION * ALINEACION
+
+
+def guardar_sesion(ruta, arreglos, metadatos=None):
+    """Guarda los arreglos numpy (diccionario nombre -> arreglo) y los metadatos JSON en `ruta`"""
+    arreglos = {nombre: np.ascontiguousarray(valor) for nombre, valor in arreglos.items() if valor is not None}
+
+    # La posición de cada arreglo depende del largo del encabezado, que a su vez
+    # contiene esas posiciones: se calcula con el encabezado rellenado a la alineación
+    descripcion = {
+        nombre: {"dtype": valor.dtype.str, "forma": list(valor.shape), "offset": 0}
+        for nombre, valor in arreglos.items()
+    }
+    encabezado = {"formato": 1, "metadatos": metadatos or {}, "arreglos": descripcion}
+    while True:
+        texto = json.dumps(encabezado, default=float).encode("utf-8")
+        posicion = _alinear(len(MAGIA) + 4 + len(texto))
+        cambio = False
+        for nombre, valor in arreglos.items():
+            if descripcion[nombre]["offset"] != posicion:
+                descripcion[nombre]["offset"] = posicion
+                cambio = True
+            posicion = _alinear(posicion + valor.nbytes)
+        if not cambio:
+            break
+
+    ruta_tmp = ruta + ".tmp"
+    with open(ruta_tmp, "wb") as f:
+        f.write(MAGIA)
+        f.write(struct.pack("<I", len(texto)))
+        f.write(texto)
+        for nombre, valor in arreglos.items():
+            f.seek(descripcion[nombre]["offset"])
+            f.write(valor.tobytes())
+    os.replace(ruta_tmp, ruta)
+
+
+def abrir_sesion(ruta):
+    """Abre una sesión; devuelve (arreglos mapeados en memoria de sólo lectura, metadatos)"""
+    with open(ruta, "rb") as f:
+        if f.read(len(MAGIA)) != MAGIA:
+            raise ValueError("El archivo no es una sesión de postura")
+        largo, = struct.unpack("<I", f.read(4))
+        encabezado = json.loads(f.read(largo).decode("utf-8"))
+
+    arreglos = {}
+    for nombre, datos in encabezado["arreglos"].items():
+        forma = tuple(datos["forma"])
+        if int(np.prod(forma)) == 0:
+            arreglos[nombre] = np.empty(forma, dtype=np.dtype(datos["dtype"]))
+        else:
+            arreglos[nombre] = np.memmap(ruta, dtype=np.dtype(datos["dtype"]), mode="r",
+                                         offset=datos["offset"], shape=forma)
+    return arreglos, encabezado["metadatos"]
@@ -0,0 +1,305 @@
+"""Sincronización del historial de mediciones entre estaciones a través de un directorio compartido.
+
+Cada estación anexa sus mediciones nuevas a su propio diario ``<estacion>.jsonl``
+dentro del directorio compartido (local o de red) y lee de los diarios de las
+demás sólo lo agregado desde la última vez, usando la posición en bytes
+guardada en ``sync_estado.json``. Las mediciones se identifican por 'id', así
+que leer dos veces la misma no la duplica. Las escrituras se protegen con
+bloqueos de archivo para que varias instancias puedan trabajar a la vez.
+"""
+import json
+import os
+import socket
+import textwrap
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+RUTA_HISTORIAL = "health_history.json"
+RUTA_ESTADO = "sync_estado.json"
+# Mediciones creadas desde la última sincronización, pendientes de publicar
+RUTA_PENDIENTES = "sync_pendientes.jsonl"
+
+CAMPOS_MEDICION = ("fecha", "peso", "altura", "edad", "genero", "actividad", "imc", "bmr", "calorias")
+FORMATO_FECHA = "%Y-%m-%d %H:%M"
+
+# Espacio de nombres para los id derivados del contenido de mediciones antiguas
+ESPACIO_IDS = uuid.UUID("6f1c9a52-3b0e-4d8a-9c47-2e5b8d1f0a63")
+
+# Última escritura propia de cada historial: (mtime_ns, tamaño, entradas escritas, id de la última)
+_escrituras = {}
+
+
+def estacion_por_defecto():
+    return socket.gethostname()
+
+
+@contextmanager
+def bloqueo(ruta, exclusivo=True):
+    """Bloqueo entre procesos sobre `ruta` + '.lock' (flock en Unix, msvcrt en Windows)"""
+    with open(ruta + ".lock", "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        elif msvcrt is not None:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def completar_entrada(entrada, estacion):
+    """Agrega id, timestamp y estación a una medición que no los tiene.
+
+    Las mediciones anteriores a la sincronización reciben un id derivado de su
+    contenido, así la misma medición importada en dos estaciones no se duplica.
+    """
+    if not entrada.get("id"):
+        contenido = json.dumps({campo: entrada.get(campo) for campo in CAMPOS_MEDICION}, sort_keys=True)
+        entrada["id"] = str(uuid.uuid5(ESPACIO_IDS, contenido))
+    if entrada.get("timestamp") is None:
+        try:
+            entrada["timestamp"] = datetime.strptime(entrada.get("fecha", ""), FORMATO_FECHA).timestamp()
+        except ValueError:
+            entrada["timestamp"] = time.time()
+    if not entrada.get("estacion"):
+        entrada["estacion"] = estacion
+    return entrada
+
+
+def nueva_entrada(datos, estacion):
+    """Crea una medición con id único, timestamp y estación de origen"""
+    entrada = dict(datos)
+    entrada.update({"id": str(uuid.uuid4()), "timestamp": time.time(), "estacion": estacion})
+    return entrada
+
+
+def leer_historial(ruta=RUTA_HISTORIAL):
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, "r") as f:
+        texto = f.read()
+    try:
+        return json.loads(texto)
+    except ValueError:
+        # Un anexado interrumpido deja el arreglo sin cerrar: se conservan las entradas completas
+        fin = texto.rfind("\n    }")
+        if fin < 0:
+            raise
+        return json.loads(texto[:fin] + "\n    }\n]")
+
+
+def escribir_atomico(ruta, datos):
+    ruta_tmp = f"{ruta}.{os.getpid()}.tmp"
+    with open(ruta_tmp, "w") as f:
+        json.dump(datos, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(ruta_tmp, ruta)
+
+
+def anexar_en_lugar(ruta, entradas):
+    """Agrega entradas al final del arreglo JSON escrito por escribir_atomico sin reescribir el resto.
+
+    Devuelve False si el archivo no termina como se espera (vacío o escrito por otro programa).
+    """
+    texto = "".join(",\n" + textwrap.indent(json.dumps(entrada, indent=4), " " * 4) for entrada in entradas)
+    with open(ruta, "r+b") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() < 4:
+            return False
+        f.seek(-2, os.SEEK_END)
+        if f.read(2) != b"\n]":
+            return False
+        f.seek(-2, os.SEEK_END)
+        f.write((texto + "\n]").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    return True
+
+
+def firma_archivo(ruta):
+    if not os.path.exists(ruta):
+        return None
+    info = os.stat(ruta)
+    return info.st_mtime_ns, info.st_size
+
+
+def fusionar(historial, entradas, ids=None):
+    """Agrega al historial las entradas cuyo id no está todavía; devuelve las agregadas.
+
+    Si se pasa el conjunto `ids` del historial (y se mantiene entre llamadas), el
+    costo depende sólo de la cantidad de entradas recibidas.
+    """
+    if ids is None:
+        ids = {entrada.get("id") for entrada in historial}
+    nuevas = []
+    for entrada in entradas:
+        if entrada.get("id") not in ids:
+            ids.add(entrada.get("id"))
+            historial.append(entrada)
+            nuevas.append(entrada)
+    return nuevas
+
+
+def guardar_historial(historial, ruta=RUTA_HISTORIAL, reemplazar=False, estacion=None, preparar=None):
+    """Guarda el historial bajo bloqueo; devuelve las mediciones incorporadas de otra instancia.
+
+    Si el archivo no cambió desde la última escritura de este proceso, sólo se
+    anexan al final las mediciones nuevas. Si cambió, antes de escribir se
+    incorporan por id las mediciones que otra instancia haya guardado (las
+    antiguas sin id lo reciben con completar_entrada y después pasan por
+    `preparar`, si se da), así ninguna pisa a la otra. Con reemplazar=True (al borrar el historial) se escribe tal cual.
+    """
+    clave = os.path.abspath(ruta)
+    with bloqueo(ruta):
+        previa = _escrituras.get(clave)
+        escritas = previa[2] if previa else 0
+        ajenas = []
+        if not reemplazar and previa and previa[:2] == firma_archivo(ruta) and 0 < escritas <= len(historial) \
+                and historial[escritas - 1].get("id") == previa[3]:
+            if escritas < len(historial) and not anexar_en_lugar(ruta, historial[escritas:]):
+                escribir_atomico(ruta, historial)
+        else:
+            if not reemplazar:
+                estacion = estacion or estacion_por_defecto()
+                guardadas = [completar_entrada(entrada, estacion) for entrada in leer_historial(ruta)]
+                if preparar is not None:
+                    guardadas = [preparar(entrada) for entrada in guardadas]
+                ajenas = fusionar(historial, guardadas)
+            escribir_atomico(ruta, historial)
+        ultima = historial[-1].get("id") if historial else None
+        _escrituras[clave] = firma_archivo(ruta) + (len(historial), ultima)
+    return ajenas
+
+
+def registrar_pendiente(entrada, ruta=RUTA_PENDIENTES):
+    """Anota una medición nueva para publicarla en la próxima sincronización"""
+    with bloqueo(ruta):
+        with open(ruta, "a") as f:
+            f.write(json.dumps(entrada) + "\n")
+
+
+def descartar_pendientes(ruta=RUTA_PENDIENTES):
+    """Olvida las mediciones pendientes de publicar (al borrar el historial local no se publican)"""
+    if not os.path.exists(ruta):
+        return
+    with bloqueo(ruta):
+        open(ruta, "w").close()
+
+
+def leer_lineas(ruta, posicion=0):
+    """Lee las líneas JSON completas desde `posicion`; devuelve (entradas, posición tras la última línea completa)"""
+    entradas = []
+    with open(ruta, "rb") as f:
+        f.seek(posicion)
+        for linea in f:
+            if not linea.endswith(b"\n"):
+                break
+            posicion += len(linea)
+            try:
+                entradas.append(json.loads(linea))
+            except ValueError:
+                continue
+    return entradas, posicion
+
+
+def nombre_diario(estacion):
+    seguro = "".join(c if c.isalnum() or c in "-_." else "_" for c in estacion)
+    return f"{seguro}.jsonl"
+
+
+class SincronizadorHistorial:
+    """Intercambia con el directorio compartido sólo las mediciones nuevas desde la última sincronización"""
+
+    def __init__(self, directorio, estacion=None, ruta_estado=RUTA_ESTADO, ruta_pendientes=RUTA_PENDIENTES):
+        self.directorio = directorio
+        self.estacion = estacion or estacion_por_defecto()
+        self.ruta_estado = ruta_estado
+        self.ruta_pendientes = ruta_pendientes
+        self.ruta_diario = os.path.join(directorio, nombre_diario(self.estacion))
+        # Ids conocidos del historial y cuántas entradas del historial ya están en el conjunto
+        self.ids = set()
+        self.conocidas = 0
+
+    def leer_estado(self):
+        estado = {"directorio": None, "cursores": {}}
+        if os.path.exists(self.ruta_estado):
+            with open(self.ruta_estado, "r") as f:
+                estado.update(json.load(f))
+        return estado
+
+    def publicar(self, entradas):
+        """Anexa las entradas al diario de esta estación"""
+        if not entradas:
+            return
+        datos = "".join(json.dumps(entrada) + "\n" for entrada in entradas).encode("utf-8")
+        with bloqueo(self.ruta_diario):
+            with open(self.ruta_diario, "ab") as f:
+                f.write(datos)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def leer_diario(self, ruta, posicion):
+        """Lee las líneas completas agregadas desde `posicion`; devuelve (entradas, nueva posición)"""
+        with bloqueo(ruta, exclusivo=False):
+            return leer_lineas(ruta, posicion)
+
+    def actualizar_ids(self, historial):
+        # El historial sólo crece por el final; si se achicó (se borró) se vuelve a armar el conjunto
+        if len(historial) < self.conocidas:
+            self.ids, self.conocidas = set(), 0
+        self.ids.update(entrada.get("id") for entrada in historial[self.conocidas:])
+        self.conocidas = len(historial)
+
+    def sincronizar(self, historial):
+        """Publica las mediciones pendientes y agrega al historial las de otras estaciones.
+
+        Devuelve (cantidad publicada, lista de mediciones recibidas). El historial se
+        modifica en su lugar; guardarlo queda a cargo de quien llama.
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        self.actualizar_ids(historial)
+
+        with bloqueo(self.ruta_estado):
+            estado = self.leer_estado()
+            directorio = os.path.abspath(self.directorio)
+
+            with bloqueo(self.ruta_pendientes):
+                if estado["directorio"] != directorio:
+                    # Primera sincronización con este directorio: se publica todo lo propio
+                    pendientes = [entrada for entrada in historial if entrada.get("estacion") == self.estacion]
+                    estado = {"directorio": directorio, "cursores": {}}
+                elif os.path.exists(self.ruta_pendientes):
+                    pendientes, _ = leer_lineas(self.ruta_pendientes, 0)
+                else:
+                    pendientes = []
+                self.publicar(pendientes)
+                open(self.ruta_pendientes, "w").close()
+
+            recibidas = []
+            for nombre in sorted(os.listdir(self.directorio)):
+                if not nombre.endswith(".jsonl"):
+                    continue
+                ruta = os.path.join(self.directorio, nombre)
+                entradas, estado["cursores"][nombre] = self.leer_diario(ruta, estado["cursores"].get(nombre, 0))
+                recibidas.extend(fusionar(historial, entradas, self.ids))
+
+            escribir_atomico(self.ruta_estado, estado)
+        self.conocidas = len(historial)
+        return len(pendientes), recibidas
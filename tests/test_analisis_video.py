@@ -0,0 +1,40 @@
+import cv2
+import numpy as np
+import pytest
+
+import analisis_video
+from analisis_video import CUADROS_MINIMOS_SEGMENTO, dividir_segmentos
+
+
+def test_dividir_segmentos_en_fotogramas_clave():
+    segmentos = dividir_segmentos(10 * CUADROS_MINIMOS_SEGMENTO, 4, claves=[0, 130, 290, 460])
+    assert segmentos[0][0] == 0 and segmentos[-1][1] == 10 * CUADROS_MINIMOS_SEGMENTO
+    assert {inicio for inicio, _ in segmentos[1:]} <= {130, 290, 460}
+    assert all(fin == siguiente for (_, fin), (siguiente, _) in zip(segmentos, segmentos[1:]))
+
+
+def test_dividir_segmentos_cortos():
+    assert dividir_segmentos(CUADROS_MINIMOS_SEGMENTO - 1, 8) == [(0, CUADROS_MINIMOS_SEGMENTO - 1)]
+    assert dividir_segmentos(0, 8) == []
+
+
+def video_de_prueba(ruta, cuadros=12):
+    escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*"MJPG"), 10.0, (64, 48))
+    if not escritor.isOpened():
+        pytest.skip("OpenCV no puede escribir video MJPG")
+    for i in range(cuadros):
+        escritor.write(np.full((48, 64, 3), 20 * i, dtype=np.uint8))
+    escritor.release()
+
+
+def test_video_sin_cantidad_de_cuadros(tmp_path, monkeypatch):
+    pytest.importorskip("mediapipe")
+    ruta = str(tmp_path / "video.avi")
+    video_de_prueba(ruta)
+    # Contenedor que no informa CAP_PROP_FRAME_COUNT
+    monkeypatch.setattr(analisis_video, "propiedades_video", lambda ruta: (10.0, 0))
+
+    resultado = analisis_video.analizar_video(ruta, trabajadores=2, paso=3)
+    assert resultado["cuadros"].tolist() == [0, 3, 6, 9]
+    assert resultado["resumen"]["segmentos"] == 1
+    assert resultado["resumen"]["cuadros_totales"] == 10
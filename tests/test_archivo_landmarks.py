@@ -0,0 +1,94 @@
+import json
+import multiprocessing
+
+import numpy as np
+
+from archivo_landmarks import TAMANO_REGISTRO, ArchivoLandmarks
+
+
+def landmarks(valor, cantidad=1):
+    return np.full((cantidad, 33, 4), valor, dtype=np.float32)
+
+
+def test_agregar_y_cargar(tmp_path):
+    archivo = ArchivoLandmarks(str(tmp_path))
+    assert archivo.agregar_lote(landmarks(1.0, 2), [{"image_path": "a.jpg"}, {"image_path": "b.jpg"}]) == [0, 1]
+    assert archivo.agregar(landmarks(2.0)[0], {"image_path": "c.jpg"}) == 2
+
+    guardados = archivo.cargar()
+    assert guardados.shape == (3, 33, 4)
+    assert guardados[2, 0, 0] == 2.0
+    assert [r["image_path"] for r in archivo.reportes()] == ["a.jpg", "b.jpg", "c.jpg"]
+    assert [r["registro"] for r in archivo.reportes()] == [0, 1, 2]
+
+
+def test_leer_reportes_desde_continua(tmp_path):
+    archivo = ArchivoLandmarks(str(tmp_path))
+    archivo.agregar(landmarks(1.0)[0], {"image_path": "a.jpg"})
+    reportes, posicion = archivo.leer_reportes_desde(0)
+    assert len(reportes) == 1
+    archivo.agregar(landmarks(2.0)[0], {"image_path": "b.jpg"})
+    reportes, _ = archivo.leer_reportes_desde(posicion)
+    assert [r["image_path"] for r in reportes] == ["b.jpg"]
+
+
+def simular_escritura_interrumpida(archivo, registro):
+    """Datos y reporte escritos pero índice sin actualizar, como tras un corte a mitad de agregar_lote"""
+    with open(archivo.ruta_datos, "ab") as f:
+        f.write(landmarks(9.0).tobytes()[:TAMANO_REGISTRO // 2])
+    with open(archivo.ruta_reportes, "a") as f:
+        f.write(json.dumps({"registro": registro, "image_path": "perdida.jpg"}) + "\n")
+        f.write('{"registro": ')
+
+
+def test_recuperacion_tras_escritura_interrumpida(tmp_path):
+    archivo = ArchivoLandmarks(str(tmp_path))
+    archivo.agregar_lote(landmarks(1.0, 2), [{"image_path": "a.jpg"}, {"image_path": "b.jpg"}])
+    simular_escritura_interrumpida(archivo, 2)
+
+    # Lo no confirmado no se ve
+    assert len(archivo) == 2
+    assert [r["image_path"] for r in archivo.reportes()] == ["a.jpg", "b.jpg"]
+
+    # El siguiente anexado reemplaza los restos en lugar de dejar reportes duplicados
+    assert archivo.agregar(landmarks(3.0)[0], {"image_path": "c.jpg"}) == 2
+    assert archivo.cargar()[2, 0, 0] == 3.0
+    assert [(r["registro"], r["image_path"]) for r in archivo.reportes()] == [(0, "a.jpg"), (1, "b.jpg"), (2, "c.jpg")]
+    with open(archivo.ruta_reportes) as f:
+        assert "perdida.jpg" not in f.read()
+
+
+def test_recuperacion_con_indice_sin_tamano(tmp_path):
+    archivo = ArchivoLandmarks(str(tmp_path))
+    archivo.agregar(landmarks(1.0)[0], {"image_path": "a.jpg"})
+    # Índice escrito por una versión anterior, sin bytes_reportes
+    with open(archivo.ruta_indice, "w") as f:
+        json.dump({"registros": 1}, f)
+    simular_escritura_interrumpida(archivo, 1)
+
+    assert archivo.agregar(landmarks(2.0)[0], {"image_path": "b.jpg"}) == 1
+    assert [(r["registro"], r["image_path"]) for r in archivo.reportes()] == [(0, "a.jpg"), (1, "b.jpg")]
+
+
+def agregar_varios(directorio, valor, cantidad):
+    archivo = ArchivoLandmarks(directorio)
+    for _ in range(cantidad):
+        archivo.agregar(landmarks(valor)[0], {"valor": valor})
+
+
+def test_anexados_concurrentes(tmp_path):
+    procesos = [multiprocessing.Process(target=agregar_varios, args=(str(tmp_path), float(valor), 20))
+                for valor in range(4)]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join()
+
+    archivo = ArchivoLandmarks(str(tmp_path))
+    guardados = archivo.cargar()
+    reportes = archivo.reportes()
+    assert len(guardados) == 80
+    assert [r["registro"] for r in reportes] == list(range(80))
+    # Cada reporte apunta a los landmarks que escribió el mismo proceso
+    for reporte in reportes:
+        assert guardados[reporte["registro"], 0, 0] == reporte["valor"]
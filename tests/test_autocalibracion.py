@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from autocalibracion import GRUPOS_AJUSTABLES, ajustar, error_candidatos
+from proporciones import DEFAULT_CALIBRATION, HEALTHY_PROPORTIONS, calculate_proportions_array
+
+FACTORES = {"shoulders": 1.2, "hips": 0.85, "knees": 1.1, "ankles": 0.95}
+
+
+def poses_sinteticas(cantidad):
+    generador = np.random.default_rng(0)
+    landmarks = np.zeros((cantidad, 33, 4), dtype=np.float32)
+    landmarks[..., :2] = generador.uniform(0.1, 0.9, (cantidad, 33, 2))
+    landmarks[..., 3] = 1.0
+    return landmarks
+
+
+def test_ajustar_recupera_factores_conocidos():
+    landmarks = poses_sinteticas(300)
+    verdaderos = dict(DEFAULT_CALIBRATION, **FACTORES)
+    proporciones = calculate_proportions_array(landmarks, verdaderos)
+    claves = list(HEALTHY_PROPORTIONS)
+    medidas = np.stack([proporciones[clave] for clave in claves], axis=1)
+
+    inicio = time.perf_counter()
+    factores, error, evaluados = ajustar(landmarks, medidas, claves)
+    duracion = time.perf_counter() - inicio
+
+    for grupo in GRUPOS_AJUSTABLES:
+        assert factores[grupo] == pytest.approx(FACTORES[grupo], abs=0.01)
+    assert error < 1e-4
+    assert error < error_candidatos(landmarks, medidas, claves, np.ones((1, len(GRUPOS_AJUSTABLES))))[0]
+    # Segundos, no horas: la búsqueda en grilla es vectorizada
+    assert duracion < 30
+
+
+def test_analisis_sin_interfaz_no_importa_tk():
+    codigo = "import sys, autocalibracion, vigilar_carpeta, analisis_imagen; print('tkinter' in sys.modules)"
+    salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert salida.stdout.strip() == "False"
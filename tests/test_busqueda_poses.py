@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+import busqueda_poses
+from archivo_landmarks import ArchivoLandmarks
+from busqueda_poses import IndicePoses, pose_features
+
+
+def poses_aleatorias(cantidad, semilla=0):
+    generador = np.random.default_rng(semilla)
+    return generador.uniform(0.2, 0.8, size=(cantidad, 33, 4)).astype(np.float32)
+
+
+def fuerza_bruta(poses, consulta, k, excluir=None):
+    """Referencia: distancias a todos los vectores con NumPy, ordenadas"""
+    distancias = np.linalg.norm(pose_features(poses) - pose_features(consulta)[0], axis=1)
+    orden = [int(i) for i in np.argsort(distancias) if i != excluir][:k]
+    return orden, distancias[orden]
+
+
+def comparar(indice, poses, consulta, k=5, excluir=None):
+    resultado = indice.buscar(consulta, k=k, excluir=excluir)
+    registros, distancias = fuerza_bruta(poses, consulta, k, excluir)
+    assert [registro for registro, _ in resultado] == registros
+    np.testing.assert_allclose([distancia for _, distancia in resultado], distancias, rtol=1e-3, atol=1e-3)
+
+
+@pytest.mark.parametrize("con_scipy", [True, False])
+def test_buscar_coincide_con_fuerza_bruta_incluida_la_cola(monkeypatch, con_scipy):
+    if con_scipy:
+        pytest.importorskip("scipy")
+    else:
+        monkeypatch.setattr(busqueda_poses, "cKDTree", None)
+    poses = poses_aleatorias(350)
+    indice = IndicePoses(fraccion_reconstruccion=0.5, minimo_reconstruccion=100)
+    indice.agregar(pose_features(poses[:300]), np.arange(300))
+    # Los 50 registros nuevos no alcanzan para reconstruir: quedan en la cola de fuerza bruta
+    indice.agregar(pose_features(poses[300:]), np.arange(300, 350))
+    assert len(indice) == 350
+    assert indice.tamano_arbol == (300 if con_scipy else 0)
+
+    for consulta in (poses[10] + 0.01, poses[320] + 0.01, poses_aleatorias(1, semilla=1)[0]):
+        comparar(indice, poses, consulta)
+
+
+def test_excluir_quita_el_propio_registro():
+    poses = poses_aleatorias(200)
+    indice = IndicePoses(minimo_reconstruccion=50)
+    indice.agregar(pose_features(poses), np.arange(200))
+    resultado = indice.buscar(poses[42], k=3, excluir=42)
+    assert len(resultado) == 3
+    assert 42 not in [registro for registro, _ in resultado]
+    comparar(indice, poses, poses[42], k=3, excluir=42)
+
+
+def test_sincronizar_solo_indexa_lo_nuevo(tmp_path):
+    archivo = ArchivoLandmarks(str(tmp_path))
+    poses = poses_aleatorias(130)
+    archivo.agregar_lote(poses[:100], [{"image_path": f"{i}.jpg"} for i in range(100)])
+    indice = IndicePoses(archivo, minimo_reconstruccion=60)
+
+    assert indice.sincronizar(tamano_bloque=40) == 100
+    assert indice.sincronizar() == 0
+    archivo.agregar_lote(poses[100:], [{"image_path": f"{i}.jpg"} for i in range(100, 130)])
+    assert indice.sincronizar() == 30
+    assert len(indice) == 130
+    assert indice.registros[:130].tolist() == list(range(130))
+    assert indice.reportes[125] == "125.jpg"
+    comparar(indice, poses, poses[120] + 0.01)
@@ -0,0 +1,42 @@
+import os
+
+from PIL import Image
+
+from cache_miniaturas import CacheMiniaturas, liberar_espacio
+
+
+def crear(ruta, tamano, fecha):
+    with open(ruta, "wb") as f:
+        f.write(b"x" * tamano)
+    os.utime(ruta, (fecha, fecha))
+    return (ruta, tamano, fecha)
+
+
+def test_liberar_espacio_borra_las_mas_viejas(tmp_path):
+    entradas = [crear(str(tmp_path / f"{i}.png"), 100, 1000 + i) for i in range(5)]
+    assert liberar_espacio(entradas, 250) == 200
+    assert sorted(os.listdir(tmp_path)) == ["3.png", "4.png"]
+
+
+def test_lectura_cuenta_como_uso(tmp_path):
+    foto = str(tmp_path / "foto.png")
+    Image.new("RGB", (64, 64), "red").save(foto)
+    cache = CacheMiniaturas(str(tmp_path / "miniaturas"), max_bytes=10 ** 9)
+    cache.generar(foto, (32, 32))
+    destino = cache.ruta_cache(foto, (32, 32), "thumbnail")
+    os.utime(destino, (1000, 1000))
+    assert cache.obtener(foto, (32, 32)) is not None
+    assert os.path.getmtime(destino) > 1000
+
+
+def test_limpiar_respeta_el_maximo(tmp_path):
+    directorio = tmp_path / "miniaturas"
+    cache = CacheMiniaturas(str(directorio), max_bytes=10 ** 9)
+    for i in range(6):
+        foto = str(tmp_path / f"foto{i}.png")
+        Image.new("RGB", (64, 64), (i * 40, 0, 0)).save(foto)
+        cache.generar(foto, (32, 32))
+    tamanos = [f.stat().st_size for f in directorio.iterdir()]
+    cache.max_bytes = sum(tamanos) // 2
+    assert cache.limpiar() <= cache.max_bytes
+    assert 0 < len(list(directorio.iterdir())) < 6
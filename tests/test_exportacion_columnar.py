@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from archivo_landmarks import ArchivoLandmarks
+from exportacion_columnar import (exportar_historial, exportar_reportes, importar_historial,
+                                  importar_reportes, importar_reportes_a_archivo)
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".arrow"])
+def test_historial_ida_y_vuelta(tmp_path, extension):
+    historial = [{"fecha": "2024-03-0%d 09:30" % i, "peso": 70.0 + i, "altura": 1.75, "edad": 30 + i,
+                  "genero": "Femenino", "actividad": "Ligero", "imc": 22.5, "bmr": 1500.0, "calorias": 2062.5,
+                  "id": "id-%d" % i, "timestamp": 1709458200.0 + i, "estacion": "A",
+                  "version_formula": 1, "version_metricas": 1}
+                 for i in range(1, 4)]
+    ruta = str(tmp_path / ("historial" + extension))
+    assert exportar_historial(historial, ruta, tamano_lote=2) == 3
+    assert importar_historial(ruta) == historial
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".arrow"])
+def test_reportes_ida_y_vuelta(tmp_path, extension):
+    archivo = ArchivoLandmarks(str(tmp_path / "origen"))
+    landmarks = np.random.default_rng(0).random((3, 33, 4)).astype(np.float32)
+    archivo.agregar_lote(landmarks, [
+        {"image_path": "a.jpg", "proportions": {"head_to_body": 0.25}},
+        {"image_path": "b.jpg", "person": 1, "proportions": {"head_to_body": 0.5}},
+        {"image_path": "c.jpg"}
+    ])
+    ruta = str(tmp_path / ("reportes" + extension))
+    exportar_reportes(archivo, ruta, desde=1)
+
+    reportes, leidos = importar_reportes(ruta)
+    np.testing.assert_array_equal(leidos, landmarks[1:])
+    assert [reporte["registro"] for reporte in reportes] == [1, 2]
+    assert reportes[0]["person"] == 1 and "person" not in reportes[1]
+    assert reportes[0]["proportions"] == {"head_to_body": 0.5}
+    assert reportes[1]["proportions"] is None
+
+    destino = ArchivoLandmarks(str(tmp_path / "destino"))
+    assert importar_reportes_a_archivo(ruta, destino) == [0, 1]
+    np.testing.assert_array_equal(destino.cargar(), landmarks[1:])
+    assert [reporte["registro_origen"] for reporte in destino.reportes()] == [1, 2]
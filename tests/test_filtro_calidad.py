@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from filtro_calidad import FiltroCalidad, ImagenRechazada
+
+
+def imagen_negra():
+    return np.zeros((120, 80, 3), dtype=np.uint8)
+
+
+def test_verificar_rechaza_y_cuenta():
+    filtro = FiltroCalidad()
+    with pytest.raises(ImagenRechazada) as error:
+        filtro.verificar(imagen_negra())
+    assert "oscura" in error.value.evaluacion["motivos"]
+    c = filtro.contadores()
+    assert (c["evaluadas"], c["rechazadas"], c["por_motivo"]["oscura"]) == (1, 1, 1)
+
+
+def test_evaluar_sin_registrar_hasta_decidir():
+    filtro = FiltroCalidad()
+    evaluacion = filtro.evaluar(imagen_negra(), registrar=False)
+    assert not evaluacion["apta"]
+    assert filtro.contadores()["rechazadas"] == 0
+    filtro.registrar_rechazo(evaluacion)
+    assert filtro.contadores()["rechazadas"] == 1
+
+
+def test_resumen_con_balance_negativo():
+    filtro = FiltroCalidad()
+    filtro.evaluar(imagen_negra(), registrar=False)
+    filtro.ms_filtro = 5000.0
+    filtro.registrar_inferencia(100.0)
+    resumen = filtro.resumen()
+    assert "balance neto" in resumen and "costó 5.0 s más" in resumen
@@ -0,0 +1,45 @@
+import glob
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+pytest.importorskip("fpdf")
+cv2 = pytest.importorskip("cv2")
+
+import generador_reportes
+from metricas_versionadas import MetricasHistorial
+
+HISTORIAL = [
+    {"id": "a", "fecha": "2026-01-01 10:00", "peso": 70, "altura": 1.75, "edad": 30,
+     "genero": "Masculino", "actividad": "Moderada"},
+    {"id": "b", "fecha": "2026-03-01 10:00", "peso": 80, "altura": 1.75, "edad": 30,
+     "genero": "Masculino", "actividad": "Moderada"},
+]
+
+
+def test_asignar_salud_por_fecha(tmp_path):
+    reportes = [{"fecha": "2025-12-01 00:00:00"}, {"fecha": "2026-02-01 00:00:00"}, {}]
+    generador_reportes.asignar_salud(reportes, HISTORIAL, MetricasHistorial(str(tmp_path / "cache.npz")))
+    assert "salud" not in reportes[0]
+    assert reportes[1]["salud"]["id"] == "a"
+    assert reportes[2]["salud"]["id"] == "b"
+    assert reportes[2]["salud"]["imc"] == pytest.approx(80 / 1.75 ** 2)
+
+
+def test_generar_reportes_limpia_temporales(tmp_path):
+    imagen = np.full((300, 200, 3), 255, np.uint8)
+    cv2.rectangle(imagen, (75, 25), (125, 275), (0, 0, 0), -1)
+    ruta = str(tmp_path / "foto.jpg")
+    cv2.imwrite(ruta, imagen)
+    assert generador_reportes.proporcion_altura_ancho(imagen) == pytest.approx(5, rel=0.1)
+
+    reportes = [{"registro": i, "image_path": ruta, "landmarks": np.random.rand(33, 4).tolist()} for i in range(2)]
+    generador_reportes.asignar_salud(reportes, HISTORIAL, MetricasHistorial(str(tmp_path / "cache.npz")))
+    antes = set(glob.glob(os.path.join(tempfile.gettempdir(), "reportes_*")))
+    resultados = generador_reportes.generar_reportes(reportes, str(tmp_path / "pdf"), trabajadores=2)
+    assert [error for _, error in resultados] == [None, None]
+    assert all(os.path.getsize(pdf) > 0 for pdf, _ in resultados)
+    # Cada trabajador borra su directorio temporal al terminar
+    assert set(glob.glob(os.path.join(tempfile.gettempdir(), "reportes_*"))) == antes
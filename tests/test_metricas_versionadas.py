@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+import metricas_versionadas
+from metricas_versionadas import MetricasHistorial, solo_datos
+from salud import VERSION_FORMULA, calcular_metricas
+
+
+def historial_de(cantidad):
+    return [{"id": str(i), "peso": 60.0 + i % 40, "altura": 1.5 + (i % 5) / 10, "edad": 20 + i % 50,
+             "genero": "Masculino" if i % 2 else "Femenino", "actividad": "Moderado"}
+            for i in range(cantidad)]
+
+
+def test_solo_datos_quita_derivadas():
+    entrada = {"id": "a", "peso": 70.0, "imc": 22.0, "bmr": 1600.0, "calorias": 2000.0, "version_metricas": 0}
+    assert solo_datos(entrada) == {"id": "a", "peso": 70.0}
+
+
+def test_con_metricas_coincide_con_calcular_metricas(tmp_path):
+    historial = historial_de(10)
+    metricas = MetricasHistorial(str(tmp_path / "cache.npz"))
+    for entrada, completa in zip(historial, metricas.con_metricas(historial)):
+        esperado = calcular_metricas(entrada["peso"], entrada["altura"], entrada["edad"],
+                                     entrada["genero"], entrada["actividad"])
+        assert (completa["imc"], completa["bmr"], completa["calorias"]) == pytest.approx(esperado)
+        assert completa["version_metricas"] == VERSION_FORMULA
+    # Las entradas del historial no se modifican
+    assert "imc" not in historial[0]
+
+
+def test_ultima_sin_columnas_completas(tmp_path):
+    historial = historial_de(20)
+    metricas = MetricasHistorial(str(tmp_path / "cache.npz"))
+    ultima = metricas.ultima(historial)
+    assert ultima["imc"] == pytest.approx(metricas.con_metricas(historial, -1)[0]["imc"])
+    assert metricas.ultima([]) is None
+
+
+def test_cache_se_guarda_por_tandas(tmp_path, monkeypatch):
+    monkeypatch.setattr(metricas_versionadas, "PENDIENTES_GUARDADO", 10)
+    ruta = str(tmp_path / "cache.npz")
+    historial = historial_de(5)
+    metricas = MetricasHistorial(ruta)
+    metricas.columnas(historial)
+    # Pocas entradas sin guardar: no vale la pena reescribir la cache
+    assert not os.path.exists(ruta)
+
+    historial += historial_de(15)[5:]
+    metricas.columnas(historial)
+    assert os.path.exists(ruta)
+
+    # Otra instancia la lee y sólo calcula lo que falta
+    otra = MetricasHistorial(ruta)
+    assert otra.cubiertas(VERSION_FORMULA, historial) == 15
+    assert otra.con_metricas(historial + historial_de(16)[15:])[-1]["imc"] is not None
+
+
+def test_cambio_de_version_en_segundo_plano(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "cache.npz")
+    historial = historial_de(30)
+    metricas = MetricasHistorial(ruta)
+    metricas.columnas(historial)
+    metricas.guardar_cache(VERSION_FORMULA)
+
+    # Nueva versión de la fórmula con un historial "grande": se calcula en un hilo
+    monkeypatch.setattr(metricas_versionadas, "VERSION_FORMULA", VERSION_FORMULA + 1)
+    monkeypatch.setattr(metricas_versionadas, "UMBRAL_SEGUNDO_PLANO", 10)
+    nueva = MetricasHistorial(ruta)
+    entradas = nueva.con_metricas(historial)
+    assert {entrada["version_metricas"] for entrada in entradas} <= {VERSION_FORMULA, VERSION_FORMULA + 1}
+    nueva.hilo.join()
+    assert {entrada["version_metricas"] for entrada in nueva.con_metricas(historial)} == {VERSION_FORMULA + 1}
+    assert list(nueva.versiones) == [VERSION_FORMULA + 1]
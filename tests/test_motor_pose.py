@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from onnx import TensorProto, helper
+
+from motor_pose import REPROBAR_CADA, VENTANA_EXITOS, MotorOnnx, MotorPose
+
+
+def modelo_presencia(ruta):
+    """Modelo mínimo NHWC de 5x11 (33 x 5 valores): landmarks = la entrada aplanada, presencia = 10 * media - 2 (un logit)"""
+    entrada = helper.make_tensor_value_info("imagen", TensorProto.FLOAT, ["N", 5, 11, 3])
+    landmarks = helper.make_tensor_value_info("landmarks", TensorProto.FLOAT, ["N", 165])
+    presencia = helper.make_tensor_value_info("presencia", TensorProto.FLOAT, ["N", 1])
+    nodos = [
+        helper.make_node("Flatten", ["imagen"], ["landmarks"]),
+        helper.make_node("ReduceMean", ["landmarks"], ["media"], axes=[1], keepdims=1),
+        helper.make_node("Mul", ["media", "diez"], ["escalada"]),
+        helper.make_node("Sub", ["escalada", "dos"], ["presencia"]),
+    ]
+    constantes = [helper.make_tensor("diez", TensorProto.FLOAT, [], [10.0]),
+                  helper.make_tensor("dos", TensorProto.FLOAT, [], [2.0])]
+    grafo = helper.make_graph(nodos, "presencia", [entrada], [landmarks, presencia], constantes)
+    modelo = helper.make_model(grafo, opset_imports=[helper.make_opsetid("", 13)])
+    modelo.ir_version = 8
+    onnx.save(modelo, ruta)
+
+
+def imagen(valor):
+    return np.full((5, 11, 3), valor, dtype=np.uint8)
+
+
+def test_presencia_logit_se_decide_una_vez(tmp_path):
+    ruta = str(tmp_path / "modelo.onnx")
+    modelo_presencia(ruta)
+    motor = MotorOnnx(ruta, batch_size=4)
+
+    # Primer lote con logits fuera de [0, 1]: queda decidido que la presencia es un logit
+    assert motor.process(imagen(255)) is not None
+    assert motor.presence_logit is True
+    # Logit 0.31 (sigmoide 0.58): se acepta aunque el lote sólo tenga valores dentro de [0, 1]
+    assert motor.process(imagen(59)) is not None
+
+
+def test_presencia_probabilidad_explicita(tmp_path):
+    ruta = str(tmp_path / "modelo.onnx")
+    modelo_presencia(ruta)
+    motor = MotorOnnx(ruta, batch_size=4, presence_logit=False)
+    # El mismo valor leído como probabilidad 0.31 queda debajo de min_presence
+    assert motor.process(imagen(59)) is None
+    assert motor.process_batch([imagen(255), imagen(59)])[1] is None
+
+
+def test_nivel_saltado_se_vuelve_a_probar():
+    motor = MotorPose(tiers=(0, 1, 2))
+    motor.recent_success[0] = [False] * VENTANA_EXITOS
+    llamadas = [motor.candidate_tiers() for _ in range(REPROBAR_CADA)]
+    assert llamadas[0] == [1, 2]
+    # Una de cada REPROBAR_CADA llamadas incluye el nivel que venía fallando
+    assert sum(0 in candidatos for candidatos in llamadas) == 1
@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+import pytest
+
+from motor_siluetas import _analizar_uno, analizar_lote, leer_reducida, silueta
+
+# Silueta oscura sobre fondo claro, en píxeles de la foto completa
+CAJA = (304, 200, 200, 800)
+
+
+def foto_sintetica():
+    imagen = np.full((1200, 800, 3), 230, dtype=np.uint8)
+    x, y, ancho, alto = CAJA
+    imagen[y:y + alto, x:x + ancho] = 20
+    return imagen
+
+
+def comparar_caja(caja, area, tolerancia):
+    assert caja is not None
+    assert np.abs(np.array(caja) - np.array(CAJA)).max() <= tolerancia
+    assert area == pytest.approx(CAJA[2] * CAJA[3], rel=0.05)
+
+
+def test_silueta_en_memoria_con_y_sin_lado_maximo():
+    imagen = foto_sintetica()
+    caja, area = silueta(imagen)
+    assert caja == CAJA
+    # Con lado_maximo la máscara es ~4.7 veces menor: la caja vuelve a la escala original
+    caja, area = silueta(imagen, lado_maximo=256)
+    comparar_caja(caja, area, tolerancia=5)
+
+
+def test_lectura_reducida_vuelve_a_pixeles_de_la_foto(tmp_path):
+    ruta = str(tmp_path / "persona.png")
+    cv2.imwrite(ruta, foto_sintetica())
+
+    reducida, factor = leer_reducida(ruta, lado_maximo=256)
+    assert factor == 4
+    assert reducida.shape[:2] == (300, 200)
+
+    caja, area, forma = _analizar_uno(ruta, None)
+    assert caja == CAJA and forma == (1200, 800)
+    # Lectura reducida por 4 más el reescalado a 256: la caja y el área se llevan a la foto completa
+    caja, area, forma = _analizar_uno(ruta, 256)
+    assert forma == (1200, 800)
+    comparar_caja(caja, area, tolerancia=8)
+
+    resultado = analizar_lote([ruta, foto_sintetica(), str(tmp_path / "falta.png")], hilos=2, lado_maximo=256)
+    assert resultado["legible"].tolist() == [True, True, False]
+    assert resultado["encontrada"].tolist() == [True, True, False]
+    assert resultado["alto_imagen"].tolist() == [1200, 1200, 0]
+    assert abs(int(resultado["alto"][0]) - CAJA[3]) <= 8
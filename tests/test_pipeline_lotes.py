@@ -0,0 +1,80 @@
+import threading
+import time
+
+from pipeline_lotes import PipelineLotes
+
+
+def pipeline_falso(procesados, lote=4):
+    """Pipeline con varias hebras por etapa y etapas falsas que anotan lo que procesan"""
+    pipeline = PipelineLotes(lectores=3, decodificadores=2, inferencia=3, puntuadores=2, tamano_cola=2, lote=lote)
+    cerrojo = threading.Lock()
+
+    def etapa_falsa(nombre, fallar=None):
+        def procesar(elementos):
+            time.sleep(0.001)
+            with cerrojo:
+                procesados.setdefault(nombre, []).extend(e["indice"] for e in elementos)
+            if fallar is not None and any(fallar(e) for e in elementos):
+                raise ValueError("falla de prueba")
+            for elemento in elementos:
+                elemento.setdefault("etapas", []).append(nombre)
+        return procesar
+
+    fallas = {"decodificación": lambda e: e["indice"] % 7 == 3}
+    for etapa in pipeline.etapas:
+        etapa.procesar = etapa_falsa(etapa.nombre, fallas.get(etapa.nombre))
+        etapa.iniciar_hilo = None
+    return pipeline
+
+
+def consumir(generador, cantidad=None, espera=10):
+    """Consume el generador en otro hilo para que la prueba no se cuelgue si no termina"""
+    resultados = []
+
+    def correr():
+        for resultado in generador:
+            resultados.append(resultado)
+            if cantidad is not None and len(resultados) >= cantidad:
+                generador.close()
+                break
+
+    hilo = threading.Thread(target=correr, daemon=True)
+    hilo.start()
+    hilo.join(espera)
+    assert not hilo.is_alive(), "el generador no terminó"
+    return resultados
+
+
+def test_cada_entrada_sale_una_vez_y_los_errores_pasan():
+    procesados = {}
+    pipeline = pipeline_falso(procesados)
+    rutas = [f"foto{i}.jpg" for i in range(100)]
+    resultados = consumir(pipeline.ejecutar(rutas))
+
+    assert sorted(r["indice"] for r in resultados) == list(range(100))
+    for resultado in resultados:
+        if resultado["indice"] % 7 == 3:
+            # El error de decodificación llega al final y las etapas siguientes no lo procesan
+            assert resultado["error"].startswith("decodificación:")
+            assert resultado["etapas"] == ["lectura"]
+            assert resultado["indice"] not in procesados["inferencia"]
+        else:
+            assert "error" not in resultado
+            assert resultado["etapas"] == ["lectura", "decodificación", "inferencia", "puntuación"]
+    assert sorted(procesados["lectura"]) == list(range(100))
+    assert sum(e["procesados"] for e in pipeline.estadisticas() if e["etapa"] == "puntuación") == 100
+    for hilo in pipeline.hilos:
+        hilo.join(5)
+        assert not hilo.is_alive()
+
+
+def test_cancelar_termina_todos_los_hilos():
+    procesados = {}
+    pipeline = pipeline_falso(procesados, lote=2)
+    resultados = consumir(pipeline.ejecutar([f"foto{i}.jpg" for i in range(500)]), cantidad=5)
+    assert len(resultados) == 5
+    for hilo in pipeline.hilos:
+        hilo.join(5)
+        assert not hilo.is_alive()
+    # Al cancelar no se siguió leyendo toda la entrada
+    assert len(procesados["lectura"]) < 500
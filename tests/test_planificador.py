@@ -0,0 +1,48 @@
+import numpy as np
+
+from planificador import Planificador, detectar_pose
+
+
+class MotorFalso:
+    """Falla en los recortes y detecta en el cuadro completo, con 10 ms por inferencia"""
+
+    def __init__(self, forma_completa):
+        self.forma_completa = forma_completa
+        self.last_info = None
+
+    def process(self, imagen):
+        completa = imagen.shape == self.forma_completa
+        self.last_info = {'backend': 'falso', 'tier': 1, 'visibility': 0.9 if completa else None,
+                          'timings_ms': {1: 10.0}, 'total_ms': 10.0}
+        if not completa:
+            return None
+        landmarks = np.zeros((33, 4), dtype=np.float32)
+        landmarks[:, 3] = 0.9
+        return landmarks
+
+
+def test_detalles_suman_recorte_y_respaldo():
+    imagen = np.zeros((200, 100, 3), dtype=np.uint8)
+    landmarks, detalles = detectar_pose(MotorFalso(imagen.shape), imagen, region_previa=(20, 20, 40, 100))
+    assert landmarks is not None
+    assert detalles['total_ms'] == 20.0
+    assert detalles['timings_ms'] == {1: 20.0}
+    assert len(detalles['intentos']) == 2
+    assert detalles['recorte'] is False
+    assert detalles['visibility'] == 0.9
+
+
+def test_detalles_sin_recorte():
+    imagen = np.zeros((200, 100, 3), dtype=np.uint8)
+    _, detalles = detectar_pose(MotorFalso(imagen.shape), imagen, recorte=False)
+    assert detalles['total_ms'] == 10.0
+    assert 'intentos' not in detalles
+
+
+def test_planificador_ejecuta_por_prioridad():
+    planificador = Planificador(1, iniciar_hilo=lambda: None)
+    try:
+        futuros = [planificador.enviar("lotes", lambda motor, i: i, i) for i in range(3)]
+        assert [futuro.result(timeout=5) for futuro in futuros] == [0, 1, 2]
+    finally:
+        planificador.cerrar()
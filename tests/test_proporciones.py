@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import proporciones
+from proporciones import DEFAULT_CALIBRATION, HEALTHY_PROPORTIONS, calculate_proportions_array, compare_proportions
+
+
+def pose_de_pie():
+    """Pose frontal simple con distancias conocidas"""
+    landmarks = np.zeros((33, 4), dtype=np.float32)
+    puntos = {
+        proporciones.NOSE: (0.5, 0.1),
+        proporciones.LEFT_SHOULDER: (0.6, 0.3),
+        proporciones.RIGHT_SHOULDER: (0.4, 0.3),
+        proporciones.LEFT_HIP: (0.55, 0.6),
+        proporciones.RIGHT_HIP: (0.45, 0.6),
+        proporciones.LEFT_KNEE: (0.55, 0.8),
+        proporciones.LEFT_ANKLE: (0.55, 1.0),
+    }
+    for indice, (x, y) in puntos.items():
+        landmarks[indice, :2] = (x, y)
+    return landmarks
+
+
+def test_indices_coinciden_con_mediapipe():
+    mp = pytest.importorskip("mediapipe")
+    lm = mp.solutions.pose.PoseLandmark
+    for nombre in ("NOSE", "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_HIP", "RIGHT_HIP",
+                   "LEFT_KNEE", "RIGHT_KNEE", "LEFT_ANKLE", "RIGHT_ANKLE"):
+        assert getattr(proporciones, nombre) == getattr(lm, nombre).value
+
+
+def test_proporciones_conocidas():
+    resultado = calculate_proportions_array(pose_de_pie(), DEFAULT_CALIBRATION)
+    assert set(resultado) == set(HEALTHY_PROPORTIONS)
+    assert float(resultado['head_to_body']) == pytest.approx(0.2 / np.hypot(0.05, 0.9))
+    assert float(resultado['shoulder_to_waist']) == pytest.approx(0.2 / 0.3)
+
+
+def test_calibracion_por_candidato():
+    # Factores (C, 1) contra landmarks (N, 33, 4): resultado (C, N)
+    landmarks = np.stack([pose_de_pie()] * 3)
+    factores = dict(DEFAULT_CALIBRATION, shoulders=np.array([[1.0], [2.0]]))
+    resultado = calculate_proportions_array(landmarks, factores)
+    assert resultado['head_to_body'].shape == (2, 3)
+    assert resultado['shoulder_to_waist'][1, 0] > resultado['shoulder_to_waist'][0, 0]
+
+
+def test_comparar_sin_referencia(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    comparacion = compare_proportions({'head_to_body': HEALTHY_PROPORTIONS['head_to_body'] * 1.1})
+    assert comparacion['head_to_body']['percentage'] == pytest.approx(10.0)
+    assert comparacion['head_to_body']['percentile'] is None
+
+
+def test_modulos_sin_interfaz_no_importan_tk():
+    codigo = ("import sys, proporciones, multi_persona, pipeline_lotes, busqueda_poses, autocalibracion; "
+              "sys.exit('tkinter' in sys.modules or 'calculo_imagen_v1' in sys.modules)")
+    subprocess.run([sys.executable, "-c", codigo], check=True, cwd=os.path.dirname(os.path.abspath(proporciones.__file__)))
+
+
+def test_calibracion_vigente_usa_el_ultimo_ajuste(tmp_path):
+    with open(tmp_path / "calibracion.json", "w") as f:
+        json.dump({"factores": {"shoulders": 1.2}}, f)
+    codigo = "import proporciones as p; print(p.CALIBRATION['shoulders'], p.CALIBRATION['head'])"
+    entorno = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(proporciones.__file__)))
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=str(tmp_path), env=entorno,
+                            capture_output=True, text=True, check=True).stdout
+    assert salida.split() == ["1.2", "1.0"]
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from recorte_persona import detectar_con_recorte, detectar_lote_con_recorte, reproyectar_landmarks
+
+# Persona oscura sobre fondo claro: centro en (404, 600) de una foto de 800 x 1200
+X, Y, ANCHO, ALTO = 304, 200, 200, 800
+CENTRO = ((X + ANCHO / 2) / 800, (Y + ALTO / 2) / 1200)
+
+
+def foto(con_persona=True):
+    imagen = np.full((1200, 800, 3), 230, dtype=np.uint8)
+    if con_persona:
+        imagen[Y:Y + ALTO, X:X + ANCHO] = 20
+    return imagen
+
+
+class DetectorFalso:
+    """Devuelve los 33 landmarks en el centro normalizado de los píxeles oscuros de lo que recibe"""
+
+    def __init__(self, visibilidad_recorte=1.0):
+        self.visibilidad_recorte = visibilidad_recorte
+        self.formas = []
+
+    def __call__(self, imagen):
+        self.formas.append(imagen.shape[:2])
+        filas, columnas = np.nonzero(imagen[:, :, 0] < 128)
+        if len(filas) == 0:
+            return None
+        alto, ancho = imagen.shape[:2]
+        completa = imagen.shape[:2] == (1200, 800)
+        landmarks = np.zeros((33, 4), dtype=np.float32)
+        landmarks[:, 0] = (columnas.min() + columnas.max() + 1) / 2 / ancho
+        landmarks[:, 1] = (filas.min() + filas.max() + 1) / 2 / alto
+        landmarks[:, 2] = 0.1
+        landmarks[:, 3] = 1.0 if completa else self.visibilidad_recorte
+        return landmarks
+
+
+def test_reproyectar_landmarks_del_recorte():
+    landmarks = np.array([[0.0, 0.0, 0.2, 1.0], [1.0, 1.0, -0.1, 0.5], [0.5, 0.25, 0.0, 0.9]])
+    reproyectados = reproyectar_landmarks(landmarks, (100, 300, 200, 400), (1200, 800))
+    np.testing.assert_allclose(reproyectados[:, 0], [100 / 800, 300 / 800, 200 / 800])
+    np.testing.assert_allclose(reproyectados[:, 1], [300 / 1200, 700 / 1200, 400 / 1200])
+    np.testing.assert_allclose(reproyectados[:, 2], [0.2 * 200 / 800, -0.1 * 200 / 800, 0.0], atol=1e-7)
+    np.testing.assert_allclose(reproyectados[:, 3], landmarks[:, 3])
+
+
+def test_recorte_devuelve_landmarks_en_la_foto_completa():
+    detector = DetectorFalso()
+    landmarks, region = detectar_con_recorte(detector, foto())
+    assert region is not None
+    assert len(detector.formas) == 1 and detector.formas[0] == (region[3], region[2])
+    assert detector.formas[0][0] * detector.formas[0][1] < 1200 * 800
+    assert landmarks[0, 0] == pytest.approx(CENTRO[0], abs=1e-3)
+    assert landmarks[0, 1] == pytest.approx(CENTRO[1], abs=1e-3)
+    assert landmarks[0, 2] == pytest.approx(0.1 * region[2] / 800)
+
+
+def test_region_previa_se_usa_sin_buscar_silueta():
+    detector = DetectorFalso()
+    landmarks, region = detectar_con_recorte(detector, foto(), region_previa=(X, Y, ANCHO, ALTO), margen=0.1)
+    assert region == (X - 20, Y - 80, ANCHO + 40, ALTO + 160)
+    assert landmarks[0, 0] == pytest.approx(CENTRO[0], abs=1e-3)
+    assert landmarks[0, 1] == pytest.approx(CENTRO[1], abs=1e-3)
+
+
+def test_respaldo_de_cuadro_completo():
+    # Recorte con landmarks poco visibles: se repite la inferencia sobre toda la foto
+    detector = DetectorFalso(visibilidad_recorte=0.2)
+    landmarks, region = detectar_con_recorte(detector, foto())
+    assert region is None
+    assert len(detector.formas) == 2 and detector.formas[-1] == (1200, 800)
+    assert landmarks[0, 0] == pytest.approx(CENTRO[0], abs=1e-3)
+
+    # Sin silueta confiable se infiere directamente sobre la foto completa
+    detector = DetectorFalso()
+    landmarks, region = detectar_con_recorte(detector, foto(con_persona=False))
+    assert landmarks is None and region is None
+    assert detector.formas == [(1200, 800)]
+
+
+def test_lote_con_recorte_y_respaldo():
+    detector = DetectorFalso()
+    lotes = []
+
+    def detectar_lote(imagenes):
+        lotes.append(len(imagenes))
+        return [detector(imagen) for imagen in imagenes]
+
+    resultados = detectar_lote_con_recorte(detectar_lote, [foto(), foto(con_persona=False), foto()])
+    assert lotes == [2, 1]
+    assert [region is not None for _, region in resultados] == [True, False, True]
+    for i in (0, 2):
+        assert resultados[i][0][0, 0] == pytest.approx(CENTRO[0], abs=1e-3)
+        assert resultados[i][0][0, 1] == pytest.approx(CENTRO[1], abs=1e-3)
+    assert resultados[1][0] is None
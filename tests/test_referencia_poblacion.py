@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from referencia_poblacion import MIN_MUESTRAS, ReferenciaPoblacion, banda_edad
+
+
+def test_percentiles_interpolan_entre_valores():
+    referencia = ReferenciaPoblacion({("imc", None, None): np.array([10.0, 20.0, 30.0, 40.0, 50.0])})
+    assert referencia.percentiles("imc", [5, 10, 25, 50, 60]).tolist() == [0, 0, 37.5, 100, 100]
+    assert referencia.percentil("imc", 30) == 50
+    assert referencia.valor_en_percentil("imc", 62.5) == 35
+    assert referencia.mediana("imc") == 30
+
+
+def test_percentil_de_valores_repetidos_es_el_medio_del_bloque():
+    tabla = np.array([20.0] + [22.0] * 7 + [25.0, 30.0])
+    referencia = ReferenciaPoblacion({("imc", None, None): tabla})
+    assert referencia.percentil("imc", 22) == pytest.approx(100 * 4 / 9)
+    assert referencia.percentil("imc", 20) == 0
+    # Entre valores distintos se sigue interpolando desde el final del bloque
+    assert referencia.percentil("imc", 23.5) == pytest.approx(100 * 7.5 / 9)
+
+
+def test_sin_datos():
+    referencia = ReferenciaPoblacion({})
+    assert np.isnan(referencia.percentil("imc", 20))
+    assert referencia.valor_en_percentil("imc", 50) is None
+
+
+def test_estratos_de_edad_y_genero(tmp_path):
+    ruta = tmp_path / "poblacion.csv"
+    filas = ["edad,genero,imc"]
+    filas += [f"35,Femenino,{20 + i % 3}" for i in range(MIN_MUESTRAS)]
+    filas += [f"65,Masculino,{30 + i % 3}" for i in range(MIN_MUESTRAS)]
+    # Estrato con pocas muestras: se usa el más general que sí tiene
+    filas += ["45,Femenino,40"]
+    ruta.write_text("\n".join(filas) + "\n")
+    referencia = ReferenciaPoblacion.desde_csv(str(ruta))
+
+    assert banda_edad(35) == "30-39" and banda_edad(75) == "70+"
+    assert referencia.mediana("imc", 35, "Femenino") == 21
+    assert referencia.mediana("imc", 65, "Masculino") == 31
+    assert referencia.mediana("imc", 45, "Femenino") == 21
+    assert len(referencia.tabla("imc")) == 2 * MIN_MUESTRAS + 1
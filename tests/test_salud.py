@@ -0,0 +1,70 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from salud import procesar_flujo, procesar_lineas
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LINEAS = [
+    '{"peso": 70, "altura": 1.75, "edad": 30, "genero": "Masculino", "actividad": "Moderado"}',
+    '{"peso": 70, "altura": 1.75',
+    '',
+    '{"altura": 1.6, "edad": 40}',
+    '{"peso": 60, "altura": 0, "edad": 25, "genero": "Femenino"}',
+    '{"peso": "mucho", "altura": 1.6}',
+    '[1, 2]',
+    'null',
+    '{"peso": 45, "altura": 1.7, "edad": 55, "genero": "Femenino", "actividad": "Sedentario"}',
+]
+
+
+def revisar(resultados):
+    # La línea vacía se omite; las demás salen en orden, una por entrada
+    assert len(resultados) == 8
+    assert resultados[0]["clasificacion"] == "Peso normal"
+    assert resultados[0]["imc"] == pytest.approx(70 / 1.75 ** 2)
+    assert resultados[7]["clasificacion"] == "Bajo peso"
+    assert "error" not in resultados[0] and "error" not in resultados[7]
+    for resultado, entrada in zip(resultados[1:7], [LINEAS[1]] + LINEAS[3:8]):
+        assert resultado["error"]
+        assert resultado["entrada"] == entrada
+    assert resultados[2]["error"] == "falta el campo 'peso'"
+
+
+def test_procesar_lineas_con_filas_invalidas():
+    salida = procesar_lineas(LINEAS, con_recomendacion=False)
+    resultados = [json.loads(linea) for linea in salida.splitlines()]
+    revisar(resultados)
+    assert "recomendacion" not in resultados[0]
+
+
+def test_procesar_flujo_por_bloques():
+    salida = io.StringIO()
+    procesar_flujo(iter(linea + "\n" for linea in LINEAS), salida, tamano_bloque=2)
+    resultados = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+    revisar(resultados)
+    assert "bajo peso" in resultados[7]["recomendacion"]
+
+
+@pytest.mark.parametrize("trabajadores", ["1", "2"])
+def test_cli_en_flujo_desde_la_entrada_estandar(trabajadores):
+    proceso = subprocess.run(
+        [sys.executable, "salud.py", "--trabajadores", trabajadores, "--bloque", "2", "--sin-recomendacion"],
+        input="\n".join(LINEAS) + "\n", capture_output=True, text=True, cwd=RAIZ, timeout=60
+    )
+    assert proceso.returncode == 0, proceso.stderr
+    revisar([json.loads(linea) for linea in proceso.stdout.splitlines()])
+
+
+def test_cli_desde_archivo(tmp_path):
+    ruta = tmp_path / "personas.jsonl"
+    ruta.write_text("\n".join(LINEAS) + "\n", encoding="utf-8")
+    proceso = subprocess.run([sys.executable, "salud.py", str(ruta)], capture_output=True, text=True,
+                             cwd=RAIZ, timeout=60)
+    assert proceso.returncode == 0, proceso.stderr
+    revisar([json.loads(linea) for linea in proceso.stdout.splitlines()])
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from sesiones import ALINEACION, abrir_sesion, guardar_sesion
+
+
+def test_ida_y_vuelta(tmp_path):
+    ruta = str(tmp_path / "analisis.sesion")
+    arreglos = {
+        "imagen": np.arange(7 * 5 * 3, dtype=np.uint8).reshape(7, 5, 3),
+        "landmarks": np.random.default_rng(0).random((33, 4)).astype(np.float32),
+        "vacio": np.empty((0, 2), dtype=np.float64),
+        "omitido": None
+    }
+    metadatos = {"image_path": "foto.jpg", "proportions": {"head_to_body": np.float32(0.25)}}
+    guardar_sesion(ruta, arreglos, metadatos)
+
+    leidos, meta = abrir_sesion(ruta)
+    assert set(leidos) == {"imagen", "landmarks", "vacio"}
+    for nombre in leidos:
+        assert leidos[nombre].dtype == arreglos[nombre].dtype
+        np.testing.assert_array_equal(leidos[nombre], arreglos[nombre])
+    assert isinstance(leidos["imagen"], np.memmap)
+    assert leidos["imagen"].offset % ALINEACION == 0
+    assert meta["image_path"] == "foto.jpg"
+    assert meta["proportions"]["head_to_body"] == pytest.approx(0.25)
+
+
+def test_archivo_que_no_es_sesion(tmp_path):
+    ruta = tmp_path / "otro.sesion"
+    ruta.write_bytes(b"no es una sesion")
+    with pytest.raises(ValueError):
+        abrir_sesion(str(ruta))
@@ -0,0 +1,116 @@
+import json
+import os
+
+import sincronizacion_historial as sincronizacion
+
+
+def antigua(peso):
+    """Medición guardada antes de la sincronización: sin id, timestamp ni estación"""
+    return {"fecha": "2024-01-0%d 10:00" % peso, "peso": float(peso), "altura": 1.7, "edad": 30,
+            "genero": "Masculino", "actividad": "Sedentario", "imc": 20.0, "bmr": 1500.0, "calorias": 1800.0}
+
+
+def test_fusionar_por_id():
+    historial = [{"id": "a"}, {"id": "b"}]
+    nuevas = sincronizacion.fusionar(historial, [{"id": "b"}, {"id": "c"}, {"id": "c"}])
+    assert [entrada["id"] for entrada in nuevas] == ["c"]
+    assert [entrada["id"] for entrada in historial] == ["a", "b", "c"]
+
+
+def test_guardar_actualiza_historial_antiguo(tmp_path):
+    ruta = str(tmp_path / "health_history.json")
+    with open(ruta, "w") as f:
+        json.dump([antigua(1), antigua(2), antigua(3)], f)
+
+    # Lo que hace la calculadora al cargar: completar las antiguas y agregar una nueva
+    historial = [sincronizacion.completar_entrada(entrada, "A") for entrada in sincronizacion.leer_historial(ruta)]
+    historial.append(sincronizacion.nueva_entrada(antigua(4), "A"))
+    assert sincronizacion.guardar_historial(historial, ruta, estacion="A") == []
+
+    guardado = sincronizacion.leer_historial(ruta)
+    assert len(guardado) == 4
+    assert len({entrada["id"] for entrada in guardado}) == 4
+
+
+def test_guardar_incorpora_antiguas_de_otra_instancia(tmp_path):
+    ruta = str(tmp_path / "health_history.json")
+    with open(ruta, "w") as f:
+        json.dump([antigua(1), antigua(2)], f)
+
+    historial = [sincronizacion.nueva_entrada(antigua(3), "B")]
+    ajenas = sincronizacion.guardar_historial(historial, ruta, estacion="B")
+    assert len(ajenas) == 2
+    assert all(entrada.get("id") for entrada in ajenas)
+    assert len(sincronizacion.leer_historial(ruta)) == 3
+    # Volver a guardar no duplica nada
+    sincronizacion.guardar_historial(historial, ruta, estacion="B")
+    assert len(sincronizacion.leer_historial(ruta)) == 3
+
+
+def test_guardar_anexa_sin_reescribir(tmp_path):
+    ruta = str(tmp_path / "health_history.json")
+    historial = [sincronizacion.nueva_entrada(antigua(1), "A")]
+    sincronizacion.guardar_historial(historial, ruta, estacion="A")
+    inodo = os.stat(ruta).st_ino
+
+    historial.append(sincronizacion.nueva_entrada(antigua(2), "A"))
+    sincronizacion.guardar_historial(historial, ruta, estacion="A")
+    # Anexado en el mismo archivo (escribir_atomico lo habría reemplazado) y con el formato de json.dump
+    assert os.stat(ruta).st_ino == inodo
+    with open(ruta) as f:
+        assert f.read() == json.dumps(historial, indent=4)
+
+
+def test_guardar_ve_cambios_de_otra_instancia(tmp_path):
+    ruta = str(tmp_path / "health_history.json")
+    propio = [sincronizacion.nueva_entrada(antigua(1), "A")]
+    sincronizacion.guardar_historial(propio, ruta, estacion="A")
+
+    # Otra instancia guarda su medición en el mismo archivo
+    otro = sincronizacion.leer_historial(ruta) + [sincronizacion.nueva_entrada(antigua(2), "B")]
+    sincronizacion.escribir_atomico(ruta, otro)
+
+    propio.append(sincronizacion.nueva_entrada(antigua(3), "A"))
+    ajenas = sincronizacion.guardar_historial(propio, ruta, estacion="A")
+    assert [entrada["estacion"] for entrada in ajenas] == ["B"]
+    assert len(sincronizacion.leer_historial(ruta)) == 3
+
+
+def test_leer_historial_con_anexado_interrumpido(tmp_path):
+    ruta = str(tmp_path / "health_history.json")
+    historial = [sincronizacion.nueva_entrada(antigua(1), "A"), sincronizacion.nueva_entrada(antigua(2), "A")]
+    sincronizacion.escribir_atomico(ruta, historial)
+    with open(ruta, "r+") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(f.tell() - 2)
+        f.write(',\n    {\n        "peso": 7')
+    assert sincronizacion.leer_historial(ruta) == historial
+
+
+def test_guardar_prepara_las_incorporadas(tmp_path):
+    from metricas_versionadas import solo_datos
+
+    ruta = str(tmp_path / "health_history.json")
+    with open(ruta, "w") as f:
+        json.dump([antigua(1)], f)
+
+    historial = [sincronizacion.nueva_entrada({"peso": 70.0}, "A")]
+    ajenas = sincronizacion.guardar_historial(historial, ruta, estacion="A", preparar=solo_datos)
+    assert len(ajenas) == 1 and "imc" not in ajenas[0]
+    assert all("imc" not in entrada for entrada in sincronizacion.leer_historial(ruta))
+
+
+def test_descartar_pendientes_no_las_publica(tmp_path):
+    pendientes = str(tmp_path / "pendientes.jsonl")
+    compartido = str(tmp_path / "compartido")
+    entrada = sincronizacion.nueva_entrada({"fecha": "2026-01-01 10:00", "peso": 70}, "a")
+    sincronizacion.registrar_pendiente(entrada, pendientes)
+    sincronizador = sincronizacion.SincronizadorHistorial(compartido, "a", str(tmp_path / "estado.json"), pendientes)
+    # Primera sincronización con el directorio: se publica lo propio del historial (vacío)
+    assert sincronizador.sincronizar([]) == (0, [])
+
+    sincronizacion.registrar_pendiente(entrada, pendientes)
+    sincronizacion.descartar_pendientes(pendientes)
+    assert sincronizador.sincronizar([]) == (0, [])
+    diario = os.path.join(compartido, "a.jsonl")
+    assert not os.path.exists(diario) or os.path.getsize(diario) == 0
@@ -0,0 +1,66 @@
+import os
+import signal
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+import vigilar_carpeta
+from archivo_landmarks import ArchivoLandmarks
+from vigilar_carpeta import MAX_REINTENTOS, VigilanteCarpeta
+
+
+def terminado(resultado=None, error=None):
+    futuro = Future()
+    if error is not None:
+        futuro.set_exception(error)
+    else:
+        futuro.set_result(resultado)
+    return futuro
+
+
+def vigilante(tmp_path):
+    return VigilanteCarpeta(str(tmp_path), ArchivoLandmarks(str(tmp_path / "archivo")))
+
+
+def test_resultados_definitivos_quedan_registrados(tmp_path):
+    v = vigilante(tmp_path)
+    ok = terminado((np.zeros((33, 4), np.float32), {"head_to_body": 0.1}))
+    ilegible = terminado(error=ValueError("No se pudo leer la imagen"))
+    v.pendientes = {ok: ("a.jpg", "h1", 0.0), ilegible: ("b.jpg", "h2", 0.0)}
+    assert v.recoger([ok, ilegible]) == []
+    assert v.vistos == {"h1", "h2"}
+    # Tras reiniciar se recuerdan las dos
+    assert vigilante(tmp_path).vistos == {"h1", "h2"}
+
+
+def test_fallas_del_trabajador_se_reintentan(tmp_path):
+    v = vigilante(tmp_path)
+    for intento in range(1, MAX_REINTENTOS + 1):
+        futuro = terminado(error=BrokenProcessPool("trabajador caído"))
+        v.pendientes = {futuro: ("a.jpg", "h1", 0.0)}
+        v.enviadas["a.jpg"] = (1, 0.0)
+        reintentar = v.recoger([futuro])
+        assert v.pool_roto
+        if intento < MAX_REINTENTOS:
+            # No se marca como vista ni se escribe en el estado: vuelve a la cola
+            assert reintentar == ["a.jpg"] and "a.jpg" not in v.enviadas
+            assert v.vistos == set() and not os.path.exists(v.ruta_estado)
+    assert reintentar == [] and v.vistos == {"h1"}
+
+
+def test_interrupcion_en_el_trabajador_no_se_registra(tmp_path):
+    v = vigilante(tmp_path)
+    futuro = terminado(error=KeyboardInterrupt())
+    v.pendientes = {futuro: ("a.jpg", "h1", 0.0)}
+    assert v.recoger([futuro]) == ["a.jpg"]
+    assert v.vistos == set()
+
+
+def test_trabajador_ignora_sigint():
+    anterior = signal.getsignal(signal.SIGINT)
+    try:
+        vigilar_carpeta.iniciar_trabajador()
+        assert signal.getsignal(signal.SIGINT) is signal.SIG_IGN
+    finally:
+        signal.signal(signal.SIGINT, anterior)
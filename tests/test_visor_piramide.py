@@ -0,0 +1,118 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+pytest.importorskip("PIL.ImageTk")
+
+import visor_piramide
+from visor_piramide import TAMANO_TESELA, PiramideTeselas
+
+
+@pytest.fixture
+def foto(tmp_path):
+    ruta = str(tmp_path / "foto.png")
+    datos = np.random.default_rng(0).integers(0, 255, (3 * TAMANO_TESELA + 10, 4 * TAMANO_TESELA, 3), np.uint8)
+    Image.fromarray(datos).save(ruta)
+    return ruta
+
+
+def test_construir_completa(tmp_path, foto):
+    piramide = PiramideTeselas(foto, directorio=str(tmp_path / "teselas"))
+    piramide.construir()
+    assert piramide.completa
+    assert piramide.niveles_listos() == set(range(len(piramide.tamanos)))
+    assert piramide.tesela(0, 3, 3).size == (TAMANO_TESELA, 10)
+    # Otra instancia de la misma foto la encuentra hecha
+    assert PiramideTeselas(foto, directorio=str(tmp_path / "teselas")).completa
+
+
+def test_cancelar_entre_teselas(tmp_path, foto, monkeypatch):
+    piramide = PiramideTeselas(foto, directorio=str(tmp_path / "teselas"))
+    guardar = Image.Image.save
+    guardadas = []
+
+    def guardar_y_cancelar(imagen, *args, **kwargs):
+        guardadas.append(1)
+        piramide.cancelada = True
+        return guardar(imagen, *args, **kwargs)
+
+    monkeypatch.setattr(Image.Image, "save", guardar_y_cancelar)
+    piramide.construir()
+    assert len(guardadas) == 1
+    assert not piramide.completa
+    assert not os.path.exists(os.path.join(piramide.directorio, "info.json"))
+
+
+def test_reabrir_durante_la_construccion(tmp_path, foto):
+    directorio = str(tmp_path / "teselas")
+    vieja = PiramideTeselas(foto, directorio=directorio)
+    nueva = PiramideTeselas(foto, directorio=directorio)
+    # La construcción vieja tiene el cerrojo; la nueva espera a que se cancele y termine
+    cerrojo = visor_piramide.cerrojo_directorio(vieja.directorio)
+    cerrojo.acquire()
+    hilo = threading.Thread(target=nueva.construir)
+    hilo.start()
+    hilo.join(0.2)
+    assert hilo.is_alive() and not nueva.niveles_listos()
+    cerrojo.release()
+    hilo.join(10)
+    assert nueva.completa
+
+
+def test_limpiar_teselas_conserva_la_ultima(tmp_path, foto):
+    directorio = str(tmp_path / "teselas")
+    vieja = PiramideTeselas(foto, directorio=directorio)
+    vieja.construir()
+    os.utime(vieja.directorio, (1000, 1000))
+    otra = str(tmp_path / "otra.png")
+    Image.open(foto).transpose(Image.Transpose.FLIP_LEFT_RIGHT).save(otra)
+    # El máximo alcanza para una sola pirámide: al terminar la nueva se borra la vieja y la nueva queda
+    nueva = PiramideTeselas(otra, directorio=directorio, max_bytes=visor_piramide.tamano_piramide(vieja.directorio))
+    nueva.construir()
+    assert nueva.completa
+    assert not os.path.exists(vieja.directorio)
+    assert os.path.exists(os.path.join(nueva.directorio, "info.json"))
+
+
+def test_niveles_del_mas_grande_al_mas_chico(tmp_path, foto, monkeypatch):
+    piramide = PiramideTeselas(foto, directorio=str(tmp_path / "teselas"))
+    orden = []
+    marcar = piramide.marcar_listo
+    monkeypatch.setattr(piramide, "marcar_listo", lambda nivel: (orden.append(nivel), marcar(nivel)))
+    piramide.construir()
+    assert orden == list(range(len(piramide.tamanos)))
+
+
+class CanvasFalso:
+    """Lo mínimo de tk.Canvas que usa el visor para pedir teselas, sin pantalla"""
+
+    def __init__(self):
+        self.pendientes = []
+
+    def bind(self, *args, **kwargs):
+        pass
+
+    def after(self, ms, funcion, *args):
+        self.pendientes.append((funcion, args))
+
+    def after_idle(self, funcion, *args):
+        self.pendientes.append((funcion, args))
+
+
+def test_teselas_se_leen_en_el_hilo_lector(tmp_path, foto):
+    piramide = PiramideTeselas(foto, directorio=str(tmp_path / "teselas"))
+    piramide.construir()
+    visor = visor_piramide.VisorPiramide(CanvasFalso())
+    visor.piramide = piramide
+    assert visor.tesela_o_pedir(piramide, 0, 1, 2) is None
+    # Pedirla otra vez mientras se lee no la encola de nuevo
+    assert visor.tesela_o_pedir(piramide, 0, 1, 2) is None
+    for _ in range(200):
+        if piramide.tesela_en_memoria(0, 1, 2) is not None and not visor.pedidas:
+            break
+        threading.Event().wait(0.01)
+    assert visor.teselas_leidas and visor.cola_teselas.empty()
+    assert visor.tesela_o_pedir(piramide, 0, 1, 2).size == (TAMANO_TESELA, TAMANO_TESELA)
@@ -0,0 +1,278 @@
+"""Modo sin interfaz que vigila una carpeta y analiza cada foto nueva.
+
+Uso:
+    python vigilar_carpeta.py CARPETA [--trabajadores 2] [--archivo landmark_archive]
+
+Las fotos se identifican por el hash de su contenido, así que una copia o un
+renombrado no se vuelve a analizar, ni siquiera después de reiniciar. Puede
+correr junto a la interfaz o a otros vigilantes sobre el mismo archivo de
+landmarks: los anexados y el registro de estado se hacen bajo bloqueo.
+"""
+import argparse
+import hashlib
+import json
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from archivo_landmarks import DIRECTORIO_POR_DEFECTO, ArchivoLandmarks
+from filtro_calidad import ImagenRechazada
+from sincronizacion_historial import bloqueo
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+EXTENSIONES = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Veces que se reintenta una foto cuyo análisis falló por el trabajador (no por la foto)
+# antes de registrarla como error
+MAX_REINTENTOS = 3
+
+
+def hash_contenido(datos):
+    return hashlib.sha256(datos).hexdigest()
+
+
+def iniciar_trabajador():
+    # Ctrl-C lo atiende el proceso principal, que espera a los trabajos en curso
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def analizar_bytes(datos):
+    """Decodifica y analiza una imagen en un proceso trabajador"""
+    import cv2
+    from analisis_imagen import analyze_image
+
+    imagen = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return analyze_image(imagen)
+
+
+class VigilanteCarpeta:
+    def __init__(self, carpeta, archivo, trabajadores=2, intervalo=2.0, estabilidad=1.0):
+        self.carpeta = carpeta
+        self.archivo = archivo
+        self.trabajadores = trabajadores
+        self.intervalo = intervalo
+        self.estabilidad = estabilidad
+        self.ruta_estado = os.path.join(archivo.directorio, "vigilancia_estado.jsonl")
+
+        # Hashes con resultado definitivo (analizada, descartada o ilegible), tamaño/mtime
+        # visto por ruta y firma de las rutas ya enviadas, para no volver a leerlas en cada escaneo
+        self.vistos = set()
+        self.observados = {}
+        self.enviadas = {}
+        self.pendientes = {}
+        # Fallas del trabajador por hash; esas fotos vuelven a la cola
+        self.reintentos = {}
+        self.pool_roto = False
+        self.retrasos = []
+        # Fotos descartadas por el filtro de calidad antes de la inferencia
+        self.rechazadas = 0
+        self.cargar_estado()
+
+    def cargar_estado(self):
+        """Recupera lo ya procesado para no repetirlo tras un reinicio"""
+        for reporte in self.archivo.reportes():
+            if reporte.get("sha256"):
+                self.vistos.add(reporte["sha256"])
+        if os.path.exists(self.ruta_estado):
+            with open(self.ruta_estado, "r") as f:
+                for linea in f:
+                    try:
+                        self.vistos.add(json.loads(linea)["sha256"])
+                    except (ValueError, KeyError):
+                        continue
+
+    def registrar_estado(self, sha256, ruta, estado, detalle=None):
+        linea = json.dumps({"sha256": sha256, "ruta": ruta, "estado": estado, "detalle": detalle}) + "\n"
+        with bloqueo(self.ruta_estado):
+            with open(self.ruta_estado, "a") as f:
+                f.write(linea)
+
+    def escanear(self):
+        """Devuelve las rutas cuyo tamaño y fecha no cambiaron desde el escaneo anterior"""
+        listas = []
+        ahora = time.time()
+        actuales = {}
+        with os.scandir(self.carpeta) as entradas:
+            for entrada in entradas:
+                if not entrada.is_file() or not entrada.name.lower().endswith(EXTENSIONES):
+                    continue
+                info = entrada.stat()
+                firma = (info.st_size, info.st_mtime)
+                actuales[entrada.path] = firma
+                if self.enviadas.get(entrada.path) == firma:
+                    continue
+                if self.observados.get(entrada.path) == firma and ahora - info.st_mtime >= self.estabilidad:
+                    listas.append(entrada.path)
+        self.observados = actuales
+        return listas
+
+    def esperar_eventos(self, inotify, espera):
+        """Con inotify, espera a que un archivo se cierre tras escribirse o se mueva a la carpeta"""
+        eventos = inotify.read(timeout=int(espera * 1000))
+        return [os.path.join(self.carpeta, evento.name) for evento in eventos
+                if evento.name.lower().endswith(EXTENSIONES)]
+
+    def enviar(self, pool, ruta):
+        """Envía la foto al pool si su contenido no se procesó; devuelve False si el pool está roto"""
+        try:
+            info = os.stat(ruta)
+            with open(ruta, "rb") as f:
+                datos = f.read()
+        except OSError:
+            return True
+        sha256 = hash_contenido(datos)
+        if sha256 in self.vistos or any(p[1] == sha256 for p in self.pendientes.values()):
+            self.enviadas[ruta] = (info.st_size, info.st_mtime)
+            return True
+        try:
+            futuro = pool.submit(analizar_bytes, datos)
+        except BrokenProcessPool:
+            self.pool_roto = True
+            return False
+        self.enviadas[ruta] = (info.st_size, info.st_mtime)
+        self.pendientes[futuro] = (ruta, sha256, info.st_mtime)
+        return True
+
+    def recoger(self, terminados):
+        """Registra los resultados terminados; devuelve las rutas a reintentar.
+
+        Sólo los resultados definitivos de la foto (analizada, descartada, ilegible o
+        sin persona) van al estado y a `vistos`. Las fallas del trabajador o del pool
+        no dicen nada de la foto: se reintenta hasta MAX_REINTENTOS veces.
+        """
+        reintentar = []
+        for futuro in terminados:
+            ruta, sha256, mtime = self.pendientes.pop(futuro)
+            retraso = time.time() - mtime
+            try:
+                landmarks, proporciones = futuro.result()
+            except ImagenRechazada as e:
+                self.rechazadas += 1
+                self.registrar_estado(sha256, ruta, "rechazada", e.evaluacion["motivos"])
+                print(f"{ruta}: descartada ({e})")
+            except ValueError as e:
+                # analyze_image: imagen que no se puede decodificar o sin postura detectada
+                self.registrar_estado(sha256, ruta, "error", str(e))
+                print(f"{ruta}: error ({e})")
+            except BaseException as e:
+                if isinstance(e, BrokenProcessPool):
+                    self.pool_roto = True
+                self.reintentos[sha256] = self.reintentos.get(sha256, 0) + 1
+                if self.reintentos[sha256] < MAX_REINTENTOS:
+                    print(f"{ruta}: falla del trabajador ({e!r}), se reintenta")
+                    self.enviadas.pop(ruta, None)
+                    reintentar.append(ruta)
+                    continue
+                self.registrar_estado(sha256, ruta, "error", repr(e))
+                print(f"{ruta}: error tras {MAX_REINTENTOS} intentos ({e!r})")
+            else:
+                registro = self.archivo.agregar(landmarks, {
+                    "image_path": ruta,
+                    "sha256": sha256,
+                    "proportions": proporciones,
+                    "retraso_ingesta": retraso
+                })
+                self.registrar_estado(sha256, ruta, "ok", registro)
+                print(f"{ruta}: registro {registro}, retraso de ingesta {retraso:.1f} s")
+            self.vistos.add(sha256)
+            self.reintentos.pop(sha256, None)
+            self.retrasos.append(retraso)
+        return reintentar
+
+    def crear_pool(self):
+        self.pool_roto = False
+        return ProcessPoolExecutor(max_workers=self.trabajadores, initializer=iniciar_trabajador)
+
+    def resumen_retrasos(self):
+        if not self.retrasos:
+            return "Sin imágenes procesadas"
+        retrasos = np.array(self.retrasos[-1000:])
+        return (f"Retraso de ingesta: medio {retrasos.mean():.1f} s, "
+                f"p95 {np.percentile(retrasos, 95):.1f} s, máximo {retrasos.max():.1f} s; "
+                f"{self.rechazadas} descartadas por calidad")
+
+    def ejecutar(self):
+        inotify = None
+        if INotify is not None:
+            inotify = INotify()
+            inotify.add_watch(self.carpeta, flags.CLOSE_WRITE | flags.MOVED_TO)
+        print(f"Vigilando {self.carpeta} ({'inotify' if inotify else 'sondeo'}), "
+              f"{len(self.vistos)} imágenes ya procesadas")
+
+        # Concurrencia acotada: nunca más de dos trabajos en espera por trabajador
+        limite = 2 * self.trabajadores
+        cola = []
+        # Las fotos existentes al arrancar se detectan con el primer par de escaneos
+        self.escanear()
+        ultimo_escaneo = time.time()
+        ultimo_resumen = time.time()
+        pool = self.crear_pool()
+        try:
+            while True:
+                espera = 0.2 if self.pendientes else self.intervalo
+                nuevas = []
+                if inotify is not None:
+                    nuevas += self.esperar_eventos(inotify, espera)
+                elif self.pendientes:
+                    terminados, _ = wait(list(self.pendientes), timeout=espera, return_when=FIRST_COMPLETED)
+                    nuevas += self.recoger(terminados)
+                else:
+                    time.sleep(espera)
+                # El escaneo periódico cubre el modo por sondeo y, con inotify,
+                # lo que llegó antes de empezar a vigilar
+                if time.time() - ultimo_escaneo >= self.intervalo:
+                    nuevas += self.escanear()
+                    ultimo_escaneo = time.time()
+                for ruta in nuevas:
+                    if ruta not in cola:
+                        cola.append(ruta)
+
+                # Un trabajador que murió deja el pool inutilizable: se reemplaza
+                if self.pool_roto and not self.pendientes:
+                    pool.shutdown(wait=False)
+                    pool = self.crear_pool()
+                while cola and len(self.pendientes) < limite and not self.pool_roto:
+                    if not self.enviar(pool, cola[0]):
+                        break
+                    cola.pop(0)
+                if self.pendientes:
+                    terminados, _ = wait(list(self.pendientes), timeout=0, return_when=FIRST_COMPLETED)
+                    cola += [ruta for ruta in self.recoger(terminados) if ruta not in cola]
+
+                if time.time() - ultimo_resumen >= 60:
+                    print(self.resumen_retrasos())
+                    ultimo_resumen = time.time()
+        except KeyboardInterrupt:
+            # Los trabajadores ignoran SIGINT: se terminan los análisis en curso y se registran
+            terminados, _ = wait(list(self.pendientes))
+            self.recoger(terminados)
+            print(self.resumen_retrasos())
+        finally:
+            pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analiza automáticamente las fotos que llegan a una carpeta")
+    parser.add_argument("carpeta")
+    parser.add_argument("--archivo", default=DIRECTORIO_POR_DEFECTO, help="Directorio del archivo de landmarks")
+    parser.add_argument("--trabajadores", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre escaneos")
+    parser.add_argument("--estabilidad", type=float, default=1.0,
+                        help="Segundos sin cambios antes de considerar completa una foto")
+    args = parser.parse_args()
+
+    vigilante = VigilanteCarpeta(args.carpeta, ArchivoLandmarks(args.archivo), args.trabajadores,
+                                 args.intervalo, args.estabilidad)
+    vigilante.ejecutar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,552 @@
+"""Visor con zoom y desplazamiento para fotos grandes, sobre una pirámide de teselas en disco.
+
+La pirámide se calcula una vez por foto: el nivel 0 es la imagen completa y
+cada nivel siguiente la mitad del anterior, cortados en teselas de
+TAMANO_TESELA píxeles y guardados en DIRECTORIO_TESELAS (con clave ruta + fecha
+de modificación, como la cache de miniaturas). Al generarla sólo hay dos
+niveles en memoria a la vez: el que se está cortando y el siguiente. El visor
+dibuja sólo las teselas visibles del nivel que corresponde al zoom, las lee
+del disco en un hilo aparte y guarda en memoria un número acotado de ellas,
+así que una foto de 50 MP se recorre con la misma memoria que una chica. Las
+coordenadas que entrega y recibe el visor son siempre de la imagen completa.
+
+Uso:
+    python visor_piramide.py FOTO                    (abre el visor)
+    python visor_piramide.py FOTO... --precalcular   (sólo genera las pirámides)
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageTk
+
+from cache_miniaturas import INTERVALO_SONDEO_MS, CacheMiniaturas, CargaProgresiva, liberar_espacio
+
+DIRECTORIO_TESELAS = ".teselas"
+TAMANO_TESELA = 256
+CALIDAD_JPEG = 90
+
+# Tamaño máximo de todas las pirámides en disco; se borran las de las fotos abiertas hace más tiempo
+MAX_BYTES_TESELAS = 2 * 1024 * 1024 * 1024
+
+# Teselas decodificadas que se guardan en memoria (~190 KB cada una)
+MAX_TESELAS_MEMORIA = 128
+
+# Zoom máximo en píxeles de pantalla por píxel de la imagen, y cuánto cambia por paso de rueda
+ZOOM_MAXIMO = 8.0
+PASO_ZOOM = 1.25
+
+# Un cerrojo por directorio de pirámide: si la misma foto se vuelve a abrir mientras
+# se genera, la nueva construcción espera a que la anterior (cancelada) termine
+_cerrojos_directorio = {}
+_cerrojo_registro = threading.Lock()
+
+
+def cerrojo_directorio(directorio):
+    with _cerrojo_registro:
+        return _cerrojos_directorio.setdefault(os.path.abspath(directorio), threading.Lock())
+
+
+def tamano_piramide(directorio):
+    """Bytes de una pirámide: los anotados en info.json o, si está incompleta, la suma de sus teselas"""
+    try:
+        with open(os.path.join(directorio, "info.json"), "r") as f:
+            return int(json.load(f)["bytes"])
+    except (OSError, ValueError, KeyError):
+        pass
+    total = 0
+    with os.scandir(directorio) as contenido:
+        for entrada in contenido:
+            if entrada.is_file():
+                total += entrada.stat().st_size
+    return total
+
+
+def limpiar_teselas(directorio=DIRECTORIO_TESELAS, max_bytes=MAX_BYTES_TESELAS):
+    """Borra las pirámides abiertas hace más tiempo hasta que el total entre en max_bytes.
+
+    Las que se están generando en este proceso cuentan para el total pero no se
+    borran. Devuelve los bytes que quedan.
+    """
+    entradas = []
+    en_uso = 0
+    try:
+        with os.scandir(directorio) as contenido:
+            for entrada in contenido:
+                if not entrada.is_dir():
+                    continue
+                if cerrojo_directorio(entrada.path).locked():
+                    en_uso += tamano_piramide(entrada.path)
+                else:
+                    entradas.append((entrada.path, tamano_piramide(entrada.path), entrada.stat().st_mtime))
+    except OSError:
+        return 0
+    return en_uso + liberar_espacio(entradas, max(0, max_bytes - en_uso))
+
+
+class PiramideTeselas:
+    """Pirámide de teselas JPEG de una foto, guardada en disco y leída con una cache LRU.
+
+    Si la pirámide no existe se genera en un hilo, del nivel más grande al más
+    chico: `niveles_listos()` dice qué niveles ya se pueden leer.
+    """
+
+    def __init__(self, ruta, directorio=DIRECTORIO_TESELAS, max_bytes=MAX_BYTES_TESELAS):
+        info = os.stat(ruta)
+        clave = f"{os.path.abspath(ruta)}|{info.st_mtime_ns}|{TAMANO_TESELA}"
+        self.ruta = ruta
+        self.base = directorio
+        self.max_bytes = max_bytes
+        self.directorio = os.path.join(directorio, hashlib.sha1(clave.encode("utf-8")).hexdigest())
+        self.cancelada = False
+        self.error = None
+        self.teselas = OrderedDict()
+        self.cerrojo = threading.Lock()
+        with Image.open(ruta) as imagen:
+            self.tamano = imagen.size
+        self.tamanos = [self.tamano]
+        while max(self.tamanos[-1]) > TAMANO_TESELA:
+            ancho, alto = self.tamanos[-1]
+            self.tamanos.append(((ancho + 1) // 2, (alto + 1) // 2))
+        self.listos = set()
+        if os.path.exists(os.path.join(self.directorio, "info.json")):
+            self.listos = set(range(len(self.tamanos)))
+            # La fecha del directorio hace de fecha de último uso para limpiar_teselas
+            try:
+                os.utime(self.directorio)
+            except OSError:
+                pass
+
+    def niveles_listos(self):
+        """Copia de los niveles ya generados (el hilo que construye los va agregando)"""
+        with self.cerrojo:
+            return set(self.listos)
+
+    @property
+    def completa(self):
+        return len(self.niveles_listos()) == len(self.tamanos)
+
+    def marcar_listo(self, nivel):
+        with self.cerrojo:
+            self.listos.add(nivel)
+
+    def construir(self):
+        """Genera las teselas que faltan; se puede llamar en un hilo aparte.
+
+        Se detiene en la próxima tesela si se cancela la pirámide.
+        """
+        with cerrojo_directorio(self.directorio):
+            if self.cancelada or self.completa:
+                return
+            # Otra construcción de la misma foto pudo terminarla mientras se esperaba el cerrojo
+            if os.path.exists(os.path.join(self.directorio, "info.json")):
+                for nivel in range(len(self.tamanos)):
+                    self.marcar_listo(nivel)
+                return
+            try:
+                self.generar_niveles()
+            except Exception as e:
+                self.error = e
+                print(f"Error generando la pirámide de {self.ruta}: {e}")
+                return
+            # Con el cerrojo tomado, la pirámide recién hecha cuenta para el máximo pero no se borra
+            if self.completa:
+                limpiar_teselas(self.base, self.max_bytes)
+
+    def generar_niveles(self):
+        os.makedirs(self.directorio, exist_ok=True)
+        # load() suelta el archivo al terminar de decodificar; en RGB no se hace otra copia con convert
+        imagen = Image.open(self.ruta)
+        imagen.load()
+        if imagen.mode != "RGB":
+            imagen = imagen.convert("RGB")
+        # Del más grande al más chico: cada nivel se corta, se reduce para el siguiente
+        # y se suelta, así nunca hay más de dos niveles en memoria
+        total = 0
+        for nivel in range(len(self.tamanos)):
+            if nivel > 0:
+                if self.cancelada:
+                    return
+                imagen = imagen.reduce(2)
+            filas, columnas = self.grilla(nivel)
+            for fila in range(filas):
+                for columna in range(columnas):
+                    if self.cancelada:
+                        return
+                    x, y = columna * TAMANO_TESELA, fila * TAMANO_TESELA
+                    tesela = imagen.crop((x, y, min(x + TAMANO_TESELA, imagen.width),
+                                          min(y + TAMANO_TESELA, imagen.height)))
+                    tesela.save(self.ruta_tesela(nivel, fila, columna), format="JPEG", quality=CALIDAD_JPEG)
+                    total += os.path.getsize(self.ruta_tesela(nivel, fila, columna))
+            self.marcar_listo(nivel)
+        imagen = None
+        # info.json se escribe al final: marca que la pirámide está completa
+        with open(os.path.join(self.directorio, "info.json"), "w") as f:
+            json.dump({"ruta": os.path.abspath(self.ruta), "tamanos": self.tamanos, "bytes": total}, f)
+
+    def grilla(self, nivel):
+        ancho, alto = self.tamanos[nivel]
+        return math.ceil(alto / TAMANO_TESELA), math.ceil(ancho / TAMANO_TESELA)
+
+    def ruta_tesela(self, nivel, fila, columna):
+        return os.path.join(self.directorio, f"{nivel}_{fila}_{columna}.jpg")
+
+    def tesela_en_memoria(self, nivel, fila, columna):
+        """Imagen PIL de la tesela si ya está en la cache en memoria, o None"""
+        clave = (nivel, fila, columna)
+        with self.cerrojo:
+            imagen = self.teselas.get(clave)
+            if imagen is not None:
+                self.teselas.move_to_end(clave)
+            return imagen
+
+    def tesela(self, nivel, fila, columna):
+        """Imagen PIL de la tesela, desde la cache en memoria o desde el disco"""
+        clave = (nivel, fila, columna)
+        with self.cerrojo:
+            if clave in self.teselas:
+                self.teselas.move_to_end(clave)
+                return self.teselas[clave]
+        imagen = Image.open(self.ruta_tesela(nivel, fila, columna))
+        imagen.load()
+        with self.cerrojo:
+            self.teselas[clave] = imagen
+            while len(self.teselas) > MAX_TESELAS_MEMORIA:
+                self.teselas.popitem(last=False)
+        return imagen
+
+
+class VisorPiramide:
+    """Muestra una foto en un tk.Canvas existente con zoom (rueda) y desplazamiento (botón derecho o central).
+
+    Mientras la pirámide se genera, o mientras un hilo lee del disco las teselas
+    que faltan, se ve debajo la vista previa de la cache de miniaturas. `al_cambiar()` se llama después de cada zoom o desplazamiento,
+    para que quien dibuja encima (por ejemplo landmarks) mueva sus ítems con
+    imagen_a_canvas. Los ítems del visor llevan el tag "visor" y quedan debajo
+    de todo lo demás.
+    """
+
+    def __init__(self, canvas, al_cambiar=None, cache=None):
+        self.canvas = canvas
+        self.al_cambiar = al_cambiar
+        self.cache = cache or CacheMiniaturas()
+        self.piramide = None
+        self.carga = None
+        self.previa = None
+        self.tamano = None
+        self.escala = 1.0
+        self.origen = (0.0, 0.0)
+        self.items = {}
+        self.niveles_listos = 0
+        self.redibujo_pendiente = False
+        self.arrastre = None
+        # Teselas pedidas al hilo lector (piramide, nivel, fila, columna) y las que no se pudieron leer
+        self.pedidas = set()
+        self.fallidas = set()
+        self.cerrojo_pedidas = threading.Lock()
+        self.cola_teselas = queue.Queue()
+        self.teselas_leidas = False
+        self.sondeo_teselas = False
+        threading.Thread(target=self.leer_teselas, daemon=True).start()
+
+        canvas.bind("<MouseWheel>", self.rueda, add="+")
+        canvas.bind("<Button-4>", self.rueda, add="+")
+        canvas.bind("<Button-5>", self.rueda, add="+")
+        for boton in (2, 3):
+            canvas.bind(f"<ButtonPress-{boton}>", self.empezar_arrastre, add="+")
+            canvas.bind(f"<B{boton}-Motion>", self.arrastrar, add="+")
+        canvas.bind("<Double-Button-3>", lambda event: self.ajustar(), add="+")
+        canvas.bind("<Configure>", lambda event: self.pedir_redibujo(), add="+")
+
+    def dimensiones_canvas(self):
+        ancho = self.canvas.winfo_width()
+        alto = self.canvas.winfo_height()
+        # Antes de mostrarse, winfo_* vale 1: se usa el tamaño pedido
+        if ancho <= 1 or alto <= 1:
+            ancho, alto = int(self.canvas.cget("width")), int(self.canvas.cget("height"))
+        return ancho, alto
+
+    def cargar(self, ruta):
+        """Muestra la foto ajustada al canvas y genera su pirámide en segundo plano si hace falta"""
+        self.cancelar()
+        self.fallidas = set()
+        self.piramide = PiramideTeselas(ruta)
+        self.tamano = self.piramide.tamano
+        self.previa = None
+        self.niveles_listos = len(self.piramide.niveles_listos())
+        self.ajustar()
+        if not self.piramide.completa:
+            threading.Thread(target=self.piramide.construir, daemon=True).start()
+            self.canvas.after(INTERVALO_SONDEO_MS, self.revisar_piramide, self.piramide)
+        self.carga = CargaProgresiva(self.canvas, ruta, self.dimensiones_canvas(), self.set_previa,
+                                     cache=self.cache)
+
+    def mostrar_previa(self, imagen, tamano=None):
+        """Muestra sólo una imagen ya reducida que representa una foto de `tamano` (sin pirámide)"""
+        self.cancelar()
+        self.piramide = None
+        self.tamano = tuple(tamano) if tamano else imagen.size
+        self.previa = imagen
+        self.ajustar()
+
+    def set_previa(self, imagen, final):
+        self.previa = imagen
+        self.pedir_redibujo()
+
+    def cancelar(self):
+        if self.carga is not None:
+            self.carga.cancelar()
+            self.carga = None
+        if self.piramide is not None:
+            self.piramide.cancelada = True
+
+    def revisar_piramide(self, piramide):
+        if piramide is not self.piramide or piramide.error is not None:
+            return
+        listos = len(piramide.niveles_listos())
+        if listos != self.niveles_listos:
+            self.niveles_listos = listos
+            self.pedir_redibujo()
+        if not piramide.completa:
+            self.canvas.after(INTERVALO_SONDEO_MS, self.revisar_piramide, piramide)
+
+    def tesela_o_pedir(self, piramide, nivel, fila, columna):
+        """La tesela si está en memoria; si no, la pide al hilo lector y devuelve None"""
+        imagen = piramide.tesela_en_memoria(nivel, fila, columna)
+        if imagen is not None:
+            return imagen
+        clave = (piramide, nivel, fila, columna)
+        with self.cerrojo_pedidas:
+            if clave in self.pedidas or clave in self.fallidas:
+                return None
+            self.pedidas.add(clave)
+        self.cola_teselas.put(clave)
+        if not self.sondeo_teselas:
+            self.sondeo_teselas = True
+            self.canvas.after(INTERVALO_SONDEO_MS, self.revisar_teselas)
+        return None
+
+    def leer_teselas(self):
+        # Hilo lector: decodifica las teselas pedidas en la cache de la pirámide, fuera del hilo de Tk
+        while True:
+            clave = self.cola_teselas.get()
+            piramide, nivel, fila, columna = clave
+            if piramide is self.piramide and not piramide.cancelada:
+                try:
+                    piramide.tesela(nivel, fila, columna)
+                except OSError as e:
+                    print(f"Error leyendo la tesela {nivel}_{fila}_{columna}: {e}")
+                    with self.cerrojo_pedidas:
+                        self.fallidas.add(clave)
+            with self.cerrojo_pedidas:
+                self.pedidas.discard(clave)
+            self.teselas_leidas = True
+
+    def revisar_teselas(self):
+        if self.teselas_leidas:
+            self.teselas_leidas = False
+            self.pedir_redibujo()
+        with self.cerrojo_pedidas:
+            quedan = bool(self.pedidas)
+        if quedan:
+            self.canvas.after(INTERVALO_SONDEO_MS, self.revisar_teselas)
+        else:
+            self.sondeo_teselas = False
+
+    def imagen_a_canvas(self, x, y):
+        return (x - self.origen[0]) * self.escala, (y - self.origen[1]) * self.escala
+
+    def canvas_a_imagen(self, x, y):
+        return self.origen[0] + x / self.escala, self.origen[1] + y / self.escala
+
+    def ajustar(self):
+        """Zoom para ver la foto completa, centrada"""
+        if self.tamano is None:
+            return
+        ancho, alto = self.dimensiones_canvas()
+        self.escala = min(ancho / self.tamano[0], alto / self.tamano[1])
+        self.limitar()
+        self.pedir_redibujo()
+
+    def limitar(self):
+        # Centrada en el eje donde entra completa; si no, sin dejar ver fuera de la foto
+        origen = []
+        for lado_canvas, lado_imagen, valor in zip(self.dimensiones_canvas(), self.tamano, self.origen):
+            visible = lado_canvas / self.escala
+            if visible >= lado_imagen:
+                origen.append((lado_imagen - visible) / 2)
+            else:
+                origen.append(min(max(valor, 0.0), lado_imagen - visible))
+        self.origen = tuple(origen)
+
+    def zoom(self, factor, x, y):
+        """Multiplica el zoom manteniendo fijo el punto del canvas (x, y)"""
+        if self.tamano is None:
+            return
+        ancho, alto = self.dimensiones_canvas()
+        minima = min(ancho / self.tamano[0], alto / self.tamano[1])
+        escala = min(max(self.escala * factor, minima), ZOOM_MAXIMO)
+        ix, iy = self.canvas_a_imagen(x, y)
+        self.escala = escala
+        self.origen = (ix - x / escala, iy - y / escala)
+        self.limitar()
+        self.pedir_redibujo()
+
+    def rueda(self, event):
+        acercar = event.num == 4 or getattr(event, "delta", 0) > 0
+        self.zoom(PASO_ZOOM if acercar else 1 / PASO_ZOOM, event.x, event.y)
+
+    def empezar_arrastre(self, event):
+        self.arrastre = (event.x, event.y)
+
+    def arrastrar(self, event):
+        if self.arrastre is None or self.tamano is None:
+            return
+        dx, dy = event.x - self.arrastre[0], event.y - self.arrastre[1]
+        self.arrastre = (event.x, event.y)
+        self.origen = (self.origen[0] - dx / self.escala, self.origen[1] - dy / self.escala)
+        self.limitar()
+        self.pedir_redibujo()
+
+    def pedir_redibujo(self):
+        # Varios eventos de rueda o de arrastre seguidos producen un solo redibujo
+        if not self.redibujo_pendiente:
+            self.redibujo_pendiente = True
+            self.canvas.after_idle(self.redibujar)
+
+    def nivel_visible(self):
+        """Nivel más chico que no se ve pixelado con el zoom actual, entre los ya generados; None si no hay"""
+        piramide = self.piramide
+        listos = piramide.niveles_listos() if piramide is not None else set()
+        if not listos:
+            return None
+        deseado = 0 if self.escala >= 1 else min(int(math.log2(1 / self.escala)), len(piramide.tamanos) - 1)
+        suficientes = [nivel for nivel in listos if nivel >= deseado]
+        if suficientes:
+            return min(suficientes)
+        # Los niveles se generan del más grande al más chico: uno más detallado que el
+        # deseado serían demasiadas teselas para la vista completa, mejor la vista previa
+        return None if self.previa is not None else max(listos)
+
+    def redibujar(self):
+        self.redibujo_pendiente = False
+        if self.tamano is None:
+            return
+        nivel = self.nivel_visible()
+        visibles = self.teselas_visibles(nivel) if nivel is not None else self.previa_visible()
+
+        nuevos = {}
+        faltan = self.colocar(visibles, nuevos)
+        if faltan and nivel is not None:
+            # Mientras el hilo lee las teselas que faltan se ve la vista previa debajo
+            previa = self.previa_visible()
+            self.colocar(previa, nuevos)
+            for clave in previa:
+                if clave in nuevos:
+                    self.canvas.tag_lower(nuevos[clave][0])
+        # Las teselas que dejaron de verse se borran, con su PhotoImage
+        for item, _ in self.items.values():
+            self.canvas.delete(item)
+        self.items = nuevos
+        self.canvas.tag_lower("visor")
+        if self.al_cambiar is not None:
+            self.al_cambiar()
+
+    def colocar(self, visibles, nuevos):
+        """Mueve o crea en el canvas los ítems de `visibles` y los anota en `nuevos`; devuelve si faltó alguna imagen"""
+        faltan = False
+        for clave, (x, y, ancho, alto, obtener) in visibles.items():
+            if clave in self.items:
+                item, foto = self.items.pop(clave)
+                self.canvas.coords(item, x, y)
+            else:
+                imagen = obtener()
+                if imagen is None:
+                    faltan = True
+                    continue
+                filtro = Image.Resampling.NEAREST if ancho > imagen.width * 2 else Image.Resampling.BILINEAR
+                foto = ImageTk.PhotoImage(imagen.resize((ancho, alto), filtro))
+                item = self.canvas.create_image(x, y, anchor="nw", image=foto, tags="visor")
+            nuevos[clave] = (item, foto)
+        return faltan
+
+    def teselas_visibles(self, nivel):
+        """{(nivel, fila, columna, ancho, alto): (x, y, ancho, alto, obtener)} de las teselas en pantalla"""
+        piramide = self.piramide
+        ancho_nivel, alto_nivel = piramide.tamanos[nivel]
+        fx, fy = self.tamano[0] / ancho_nivel, self.tamano[1] / alto_nivel
+        ancho_canvas, alto_canvas = self.dimensiones_canvas()
+        x0, y0 = self.canvas_a_imagen(0, 0)
+        x1, y1 = self.canvas_a_imagen(ancho_canvas, alto_canvas)
+        filas, columnas = piramide.grilla(nivel)
+        desde_c, hasta_c = max(0, int(x0 / fx // TAMANO_TESELA)), min(columnas, int(x1 / fx // TAMANO_TESELA) + 1)
+        desde_f, hasta_f = max(0, int(y0 / fy // TAMANO_TESELA)), min(filas, int(y1 / fy // TAMANO_TESELA) + 1)
+
+        visibles = {}
+        for fila in range(desde_f, hasta_f):
+            for columna in range(desde_c, hasta_c):
+                izquierda, arriba = columna * TAMANO_TESELA, fila * TAMANO_TESELA
+                lado_x = min(TAMANO_TESELA, ancho_nivel - izquierda)
+                lado_y = min(TAMANO_TESELA, alto_nivel - arriba)
+                x, y = self.imagen_a_canvas(izquierda * fx, arriba * fy)
+                # El tamaño no depende del desplazamiento: al mover la vista sólo cambian las coordenadas
+                ancho = max(1, math.ceil(lado_x * fx * self.escala))
+                alto = max(1, math.ceil(lado_y * fy * self.escala))
+                visibles[(nivel, fila, columna, ancho, alto)] = (
+                    round(x), round(y), ancho, alto,
+                    lambda f=fila, c=columna: self.tesela_o_pedir(piramide, nivel, f, c))
+        return visibles
+
+    def previa_visible(self):
+        """La parte visible de la vista previa como un solo ítem, mientras no haya ningún nivel de la pirámide"""
+        if self.previa is None:
+            return {}
+        ancho_canvas, alto_canvas = self.dimensiones_canvas()
+        x0, y0 = self.canvas_a_imagen(0, 0)
+        x1, y1 = self.canvas_a_imagen(ancho_canvas, alto_canvas)
+        x0, y0 = max(0.0, x0), max(0.0, y0)
+        x1, y1 = min(float(self.tamano[0]), x1), min(float(self.tamano[1]), y1)
+        if x1 <= x0 or y1 <= y0:
+            return {}
+        # Con zoom se recorta la previa antes de agrandarla, para no escalarla completa
+        previa = self.previa
+        px, py = previa.width / self.tamano[0], previa.height / self.tamano[1]
+        caja = (int(x0 * px), int(y0 * py), max(int(x0 * px) + 1, math.ceil(x1 * px)),
+                max(int(y0 * py) + 1, math.ceil(y1 * py)))
+        x, y = self.imagen_a_canvas(caja[0] / px, caja[1] / py)
+        ancho = max(1, math.ceil((caja[2] - caja[0]) / px * self.escala))
+        alto = max(1, math.ceil((caja[3] - caja[1]) / py * self.escala))
+        return {("previa", id(previa), caja, ancho, alto): (round(x), round(y), ancho, alto,
+                                                            lambda: previa.crop(caja))}
+
+def main():
+    parser = argparse.ArgumentParser(description="Visor con zoom para fotos grandes")
+    parser.add_argument("fotos", nargs="+")
+    parser.add_argument("--precalcular", action="store_true", help="Generar las pirámides sin abrir el visor")
+    args = parser.parse_args()
+
+    if args.precalcular:
+        for ruta in args.fotos:
+            piramide = PiramideTeselas(ruta)
+            piramide.construir()
+            print(f"{ruta}: {len(piramide.tamanos)} niveles en {piramide.directorio}")
+        return
+
+    import tkinter as tk
+
+    raiz = tk.Tk()
+    raiz.title("Visor")
+    canvas = tk.Canvas(raiz, width=900, height=700, highlightthickness=0)
+    canvas.pack(fill=tk.BOTH, expand=True)
+    visor = VisorPiramide(canvas)
+    visor.cargar(args.fotos[0])
+    raiz.mainloop()
+
+
+if __name__ == "__main__":
+    main()